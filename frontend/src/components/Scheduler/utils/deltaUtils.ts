@@ -0,0 +1,30 @@
+import { Cita, SchedulerResponse, SchedulerDelta } from "../../../types/scheduler";
+
+const porHoraInicio = (a: Cita, b: Cita) => a.hora_inicio.localeCompare(b.hora_inicio);
+
+/**
+ * Aplica un delta de /scheduler/?since= sobre el tablero actual.
+ * Las citas cambiadas se quitan de donde estaban y se vuelven a colocar
+ * en su consultorio actual (o en huérfanos si no tienen consultorio).
+ */
+export const aplicarDelta = (data: SchedulerResponse, delta: SchedulerDelta): SchedulerResponse => {
+    const quitar = new Set<number>([...delta.eliminadas, ...delta.citas.map(c => c.id)]);
+
+    const consultorios = data.consultorios.map(consultorio => {
+        const nuevas = delta.citas.filter(c => c.id_consultorio === consultorio.id);
+        const tocado = nuevas.length > 0 || consultorio.citas.some(c => quitar.has(c.id));
+        if (!tocado) return consultorio;
+
+        return {
+            ...consultorio,
+            citas: [...consultorio.citas.filter(c => !quitar.has(c.id)), ...nuevas].sort(porHoraInicio)
+        };
+    });
+
+    const huerfanos = [
+        ...(data.huerfanos ?? []).filter(c => !quitar.has(c.id)),
+        ...delta.citas.filter(c => c.id_consultorio === null)
+    ];
+
+    return { ...data, cursor: delta.cursor, consultorios, huerfanos };
+};
@@ -1,5 +1,5 @@
-import { useState, useEffect } from "react";
-import { getSchedulerData, reprogramarCita } from "../services/api";
+import { useState, useEffect, useRef } from "react";
+import { getSchedulerData, reprogramarCita, suscribirCambios } from "../services/api";
 import { SchedulerResponse, Cita } from "../types/scheduler";
 import {
     DndContext,
@@ -18,6 +18,10 @@ import TimeRuler from "./Scheduler/TimeRuler";
 import TimelineRow from "./Scheduler/TimelineRow";
 import CitaBlock from "./Scheduler/CitaBlock";
 import { percentToTime, checkOverlap } from "./Scheduler/utils/timeUtils";
+import { aplicarDelta } from "./Scheduler/utils/deltaUtils";
+
+// Respaldo por sondeo (solo el delta desde el último cursor) cuando el canal en tiempo real no está conectado
+const POLL_MS = 5000;
 
 const dropAnimation: DropAnimation = {
     sideEffects: defaultDropAnimationSideEffects({
@@ -35,6 +39,10 @@ export default function SchedulerBoard() {
     const [fecha, setFecha] = useState(new Date().toISOString().split('T')[0]);
     const [activeCita, setActiveCita] = useState<Cita | null>(null);
     const [totalCitas, setTotalCitas] = useState(0);
+    // Cursor del último estado recibido y fecha a la que pertenece
+    const cursorRef = useRef<number | null>(null);
+    const fechaRef = useRef(fecha);
+    const canalActivoRef = useRef(false);
 
     // Sensor de puntero universal para máxima compatibilidad
     const sensors = useSensors(
@@ -46,7 +54,29 @@ export default function SchedulerBoard() {
     );
 
     useEffect(() => {
+        fechaRef.current = fecha;
+        cursorRef.current = null;
         cargarDatos();
+
+        // El servidor empuja un aviso por cada cambio; al (re)conectar se pide el delta por si se perdió algo
+        const canal = suscribirCambios(fecha, sincronizar);
+        canal.onopen = () => {
+            canalActivoRef.current = true;
+            sincronizar();
+        };
+        canal.onerror = () => {
+            canalActivoRef.current = false;
+        };
+
+        const intervalo = setInterval(() => {
+            if (!canalActivoRef.current) sincronizar();
+        }, POLL_MS);
+
+        return () => {
+            canal.close();
+            canalActivoRef.current = false;
+            clearInterval(intervalo);
+        };
     }, [fecha]);
 
     useEffect(() => {
@@ -60,6 +90,8 @@ export default function SchedulerBoard() {
         try {
             setLoading(true);
             const response = await getSchedulerData(fecha);
+            if (response.data.delta || fecha !== fechaRef.current) return;
+            cursorRef.current = response.data.cursor;
             setData(response.data);
         } catch (error) {
             console.error("Error cargando datos: ", error);
@@ -68,6 +100,29 @@ export default function SchedulerBoard() {
         }
     };
 
+    // Trae solo lo que cambió desde el último cursor y lo aplica sobre el tablero
+    const sincronizar = async () => {
+        const fechaSolicitada = fechaRef.current;
+        const since = cursorRef.current;
+        if (since === null) return;
+
+        try {
+            const response = await getSchedulerData(fechaSolicitada, since);
+            // Si el usuario cambió de fecha mientras tanto, la respuesta ya no aplica
+            if (fechaSolicitada !== fechaRef.current) return;
+
+            const res = response.data;
+            cursorRef.current = res.cursor;
+            if (!res.delta) {
+                setData(res); // Cursor inválido en el servidor: llegó el tablero completo
+            } else if (res.citas.length > 0 || res.eliminadas.length > 0) {
+                setData(prev => prev && aplicarDelta(prev, res));
+            }
+        } catch (error) {
+            console.error("Error sincronizando cambios: ", error);
+        }
+    };
+
     const handleDragStart = (event: DragStartEvent) => {
         const { active } = event;
         if (active.data.current && active.data.current.type === 'CITA') {
@@ -138,8 +193,9 @@ export default function SchedulerBoard() {
                 const msg = err.response?.data?.error || "Error al actualizar la cita.";
                 alert(`⚠️ No se pudo mover la cita:\n\n${msg}`);
             } finally {
-                // Siempre recargar para asegurar que el tablero sea igual a la DB
-                await cargarDatos();
+                // Siempre sincronizar para asegurar que el tablero sea igual a la DB
+                await sincronizar();
+                setLoading(false);
             }
         }
     };
@@ -1,5 +1,5 @@
 import axios from "axios";
-import { Cita, Consultorio, SchedulerResponse, ReprogramarDatos } from "../types/scheduler";
+import { Cita, Consultorio, SchedulerResponse, SchedulerDelta, ReprogramarDatos, MovimientoLote } from "../types/scheduler";
 
 //1. configurar la instancia base
 const api = axios.create({
@@ -7,10 +7,13 @@ const api = axios.create({
 });
 
 //2. Funcion para obtener datos (Tipada)
-export const getSchedulerData = (fecha: string) => {
-    return api.get<SchedulerResponse>('/scheduler/', {
+// Sin `since` devuelve el tablero completo; con `since` solo los cambios posteriores al cursor
+// (o el tablero completo si el cursor ya no es válido: revisar `delta`).
+export const getSchedulerData = (fecha: string, since?: number) => {
+    return api.get<SchedulerResponse | SchedulerDelta>('/scheduler/', {
         params: {
             fecha,
+            since,
             _t: Date.now() // Cache busting automático
         }
     });
@@ -21,4 +24,16 @@ export const reprogramarCita = (id: number, datos: ReprogramarDatos) => {
     return api.put(`/citas/${id}/reprogramar/`, datos);
 };
 
+//3.1 Reprogramar varias citas a la vez: se aplican todas o ninguna
+export const reprogramarLote = (movimientos: MovimientoLote[]) => {
+    return api.post('/citas/reprogramar/', { movimientos });
+};
+
+//4. Canal en tiempo real (SSE): avisa cada vez que cambia una cita de la fecha
+export const suscribirCambios = (fecha: string, alCambiar: () => void) => {
+    const fuente = new EventSource(`/api/scheduler/stream/?fecha=${encodeURIComponent(fecha)}`);
+    fuente.addEventListener('cambio', alCambiar);
+    return fuente;
+};
+
 export default api;
\ No newline at end of file
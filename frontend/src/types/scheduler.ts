@@ -1,6 +1,7 @@
 // Define la forma de una Cita
 export interface Cita {
     id: number;
+    id_consultorio: number | null; // null = cita huérfana (sin consultorio)
     fecha: string;       // "YYYY-MM-DD"
     hora_inicio: string; // "HH:MM:SS"
     hora_fin: string;
@@ -30,14 +31,29 @@ export interface HorarioMedico {
 
 // Define la respuesta completa del Scheduler (SchedulerDataView)
 export interface SchedulerResponse {
+    delta: false;
+    cursor: number; // Cursor para pedir solo los cambios posteriores (since)
     consultorios: Consultorio[];
     horarios_disponibles: HorarioMedico[]; // Por ahora ponle any o define la interfaz Horario si quieres
     huerfanos?: Cita[]; // Citas sin consultorio asignado
 }
 
+// Respuesta de /scheduler/?since=<cursor>: solo las citas que cambiaron
+export interface SchedulerDelta {
+    delta: true;
+    cursor: number;
+    citas: Cita[];        // Citas creadas o movidas a esta fecha (estado actual)
+    eliminadas: number[]; // Ids que ya no están en esta fecha (borradas o movidas a otro día)
+}
+
 export interface ReprogramarDatos {
     consultorio_id?: number;
     fecha?: string;
     hora_inicio?: string;
     hora_fin?: string;
-}
\ No newline at end of file
+}
+
+// Un movimiento dentro de /citas/reprogramar/ (lote validado y guardado en una transacción)
+export interface MovimientoLote extends ReprogramarDatos {
+    id: number;
+}
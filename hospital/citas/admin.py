@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.db.models import Q
+from login import busqueda
 from .models import Especialidad, Consultorio, Medico, Horario, Cita
+from .services import turnos
 
 
 @admin.register(Especialidad)
@@ -93,6 +96,15 @@ class CitaAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Paciente o médico por nombres, apellidos, cédula o email usando el índice FTS5
+        if not search_term.strip():
+            return queryset, False
+        ids = busqueda.ids_coincidentes(search_term)
+        if ids is None:
+            return queryset.none(), False
+        return queryset.filter(Q(paciente_id__in=ids) | Q(medico__usuario_id__in=ids)), False
+
     def save_model(self, request, obj, form, change):
         # Asignar especialidad automáticamente si no está definida
         if not obj.especialidad and obj.medico:
@@ -100,3 +112,4 @@ class CitaAdmin(admin.ModelAdmin):
         
         obj.full_clean()  # Ejecuta validaciones antes de guardar
         super().save_model(request, obj, form, change)
+        turnos.reclamar_turnos(obj, liberar=change)  # en la transacción del admin
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CitasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'citas'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receptores)
+        from hospital import db  # noqa: F401 (PRAGMA de SQLite en cada conexión)
@@ -0,0 +1,105 @@
+import http.cookiejar
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.management.base import CommandError
+
+# Piezas de las pruebas contra un servidor local (estres_reservas, prueba_carga):
+# un cliente HTTP con cookies sin dependencias y gunicorn ASGI como en
+# startup.sh, apuntando a la BD que se le pase con DATABASE_PATH.
+BLOQUEO = b'database is locked'
+
+
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    # La redirección es la respuesta: el destino dice cómo terminó la acción
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Cliente:
+    """Cliente HTTP con cookies (sesión firmada y csrftoken) que no sigue redirecciones."""
+
+    def __init__(self, base):
+        self.base = base
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedireccion
+        )
+
+    def pedir(self, metodo, ruta, formulario=None, datos_json=None):
+        """Devuelve (status, Location, cuerpo); status 0 si no hubo respuesta."""
+        cuerpo, encabezados = None, {}
+        if formulario is not None:
+            formulario = dict(formulario, csrfmiddlewaretoken=self.csrf())
+            cuerpo = urllib.parse.urlencode(formulario).encode()
+            encabezados['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif datos_json is not None:
+            cuerpo = json.dumps(datos_json).encode()
+            encabezados['Content-Type'] = 'application/json'
+        peticion = urllib.request.Request(self.base + ruta, data=cuerpo, headers=encabezados, method=metodo)
+        try:
+            with self.abridor.open(peticion, timeout=60) as respuesta:
+                return respuesta.status, respuesta.headers.get('Location'), respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Location'), e.read()
+        except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+            return 0, None, str(e).encode()
+
+    def csrf(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def servidor_local(ruta_bd, workers, extra, log, debug=False):
+    """
+    Arranca gunicorn sobre `ruta_bd`, espera a /readyz y entrega la URL base.
+    `debug` fija DEBUG en el servidor: con DEBUG=True un 500 trae la excepción en
+    el cuerpo (así se reconoce un "database is locked"), pero las latencias no
+    sirven para dimensionar. `extra` son variables de entorno para el servidor y
+    pisan a las de por defecto (--env DEBUG=...).
+    """
+    base = f'http://127.0.0.1:{puerto_libre()}'
+    por_defecto = {'DATABASE_PATH': ruta_bd, 'DEBUG': str(debug), 'ALLOWED_HOSTS': '127.0.0.1'}
+    entorno = {**os.environ, **por_defecto, **extra}
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'hospital.asgi:application', '-k', 'uvicorn_worker.UvicornWorker',
+         '--workers', str(workers), '--bind', base.removeprefix('http://'), '--log-file', '-'],
+        cwd=settings.BASE_DIR, env=entorno, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        limite = time.monotonic() + 60
+        while True:
+            if servidor.poll() is not None:
+                raise CommandError(f'Server exited with code {servidor.returncode}; see {log.name}')
+            if time.monotonic() > limite:
+                raise CommandError('Server did not become ready in 60 s')
+            try:
+                with urllib.request.urlopen(f'{base}/readyz', timeout=5):
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        yield base
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+
+def variables_entorno(pares):
+    """['CLAVE=VALOR', ...] de --env -> dict."""
+    if any('=' not in par for par in pares):
+        raise CommandError('--env takes CLAVE=VALOR')
+    return dict(par.split('=', 1) for par in pares)
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connection, transaction
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+# Cada petición imita una reserva: lee si el recurso está libre y luego inserta,
+# con la conexión 'default' de Django (OPTIONS, PRAGMA de hospital/db.py y
+# CONN_MAX_AGE) entre request_started y request_finished, como una vista.
+ESQUEMA = "CREATE TABLE reserva (id INTEGER PRIMARY KEY, recurso INTEGER, minuto INTEGER, proceso INTEGER)"
+LECTURA = "SELECT COUNT(*) FROM reserva WHERE recurso = %s AND minuto = %s"
+ESCRITURA = "INSERT INTO reserva (recurso, minuto, proceso) VALUES (%s, %s, %s)"
+
+PERFILES = {
+    # Lo que hacía settings.py antes: diario rollback, transacciones DEFERRED, una conexión por petición
+    'defecto': {'ajustes': {'OPTIONS': {}, 'CONN_MAX_AGE': 0}, 'pragmas': {}},
+    # settings.DATABASES y SQLITE_PRAGMAS tal cual: CONN_MAX_AGE 0 como en el servidor ASGI
+    # de startup.sh, y 60 como servido por WSGI (hospital/wsgi.py), el único que reutiliza conexiones
+    'produccion_0': {'ajustes': {'CONN_MAX_AGE': 0}, 'pragmas': None},
+    'produccion_60': {'ajustes': {'CONN_MAX_AGE': 60}, 'pragmas': None},
+}
+
+
+@contextmanager
+def _perfil(ruta, perfil):
+    """La conexión 'default' apunta a `ruta` con los ajustes del perfil mientras dura el bloque."""
+    connection.close()
+    originales = {clave: connection.settings_dict[clave] for clave in ('NAME', 'OPTIONS', 'CONN_MAX_AGE')}
+    connection.settings_dict.update(NAME=ruta, **perfil['ajustes'])
+    pragmas = settings.SQLITE_PRAGMAS if perfil['pragmas'] is None else perfil['pragmas']
+    try:
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            yield
+    finally:
+        connection.close()
+        connection.settings_dict.update(originales)
+
+
+def _trabajador(args):
+    ruta, nombre, proceso, peticiones = args
+    aperturas = []
+
+    def contar(**kwargs):
+        aperturas.append(1)
+    connection_created.connect(contar)
+
+    ok = bloqueos = 0
+    with _perfil(ruta, PERFILES[nombre]):
+        for n in range(peticiones):
+            request_started.send(sender=WSGIHandler)  # close_old_connections
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(LECTURA, [proceso, n])
+                    cursor.fetchone()
+                    cursor.execute(ESCRITURA, [proceso, n, proceso])
+                ok += 1
+            except OperationalError:
+                bloqueos += 1
+            finally:
+                request_finished.send(sender=WSGIHandler)  # con CONN_MAX_AGE=0 cierra la conexión
+    connection_created.disconnect(contar)
+    return ok, bloqueos, len(aperturas)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures concurrent write throughput on a scratch SQLite file through Django connections: '
+        'default profile vs production profile with CONN_MAX_AGE 0 and 60'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=8, help='Concurrent writer processes (default: 8)')
+        parser.add_argument('--transacciones', type=int, default=300, help='Requests per process, one transaction each (default: 300)')
+        parser.add_argument('--directorio', default=None, help='Where to create the scratch database (default: temp dir)')
+
+    def handle(self, *args, **options):
+        procesos, transacciones = options['procesos'], options['transacciones']
+        self.stdout.write(f'{procesos} processes x {transacciones} read-then-insert requests')
+
+        for nombre, perfil in PERFILES.items():
+            with tempfile.TemporaryDirectory(dir=options['directorio']) as directorio:
+                ruta = os.path.join(directorio, 'benchmark.sqlite3')
+                with _perfil(ruta, perfil), connection.cursor() as cursor:
+                    cursor.execute(ESQUEMA)  # y journal_mode, que queda en el archivo
+
+                tareas = [(ruta, nombre, p, transacciones) for p in range(procesos)]
+                inicio = time.perf_counter()
+                with Pool(procesos) as pool:
+                    resultados = pool.map(_trabajador, tareas)
+                segundos = time.perf_counter() - inicio
+
+            ok = sum(r[0] for r in resultados)
+            bloqueos = sum(r[1] for r in resultados)
+            aperturas = sum(r[2] for r in resultados)
+            self.stdout.write(
+                f'{nombre:<14} {ok / segundos:8.0f} commits/s   {ok:6d} ok   '
+                f'{bloqueos:6d} "database is locked"   {aperturas:6d} connections   {segundos:6.2f} s'
+            )
+
+        opciones = ', '.join(f'{k}={v}' for k, v in connection.settings_dict['OPTIONS'].items())
+        pragmas = ', '.join(f'{k}={v}' for k, v in settings.SQLITE_PRAGMAS.items())
+        self.stdout.write(self.style.SUCCESS(f'produccion = {opciones} + {pragmas}'))
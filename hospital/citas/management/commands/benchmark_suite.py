@@ -0,0 +1,248 @@
+import json
+import math
+import platform
+import random
+import sqlite3
+import statistics
+import time
+from datetime import date, datetime, timedelta
+import django
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from citas import sintetico
+from citas.models import Cita, Especialidad, Horario, Medico, Turno
+from citas.services import turnos
+from citas.services.factory import get_cita_service
+
+# Rutas calientes del agendamiento, medidas sobre un hospital sintético en una
+# BD SQLite temporal (migrada desde cero, con triggers y FTS). Cada objetivo se
+# ejecuta N veces con entradas al azar (misma semilla = mismas entradas) y se
+# informan p50/p95 en ms y consultas por llamada. El JSON se puede comparar
+# entre versiones con --comparar.
+TAMANOS = {
+    'pequeno': {'medicos': 10, 'pacientes': 200, 'dias': 30},
+    'mediano': {'medicos': 50, 'pacientes': 2000, 'dias': 60},
+    'grande': {'medicos': 200, 'pacientes': 20000, 'dias': 120},
+}
+
+
+def percentil(valores, p):
+    # Rango más cercano: con pocas muestras no interpola valores que no ocurrieron
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class Objetivos:
+    """Cada método ejecuta una llamada; `preparar_*` deja listo lo que no se mide."""
+
+    def __init__(self, azar, resumen):
+        self.azar = azar
+        self.hoy = timezone.localdate()
+        self.desde = date.fromisoformat(resumen['desde'])
+        self.fechas = [self.desde + timedelta(days=n) for n in range(resumen['dias'])]
+        self.especialidades = list(Especialidad.objects.all())
+        self.medicos = list(Medico.objects.select_related('especialidad'))
+        self.entradas = dict(Horario.objects.values_list('medico_id', 'hora_inicio'))
+        self.servicio = get_cita_service()
+        self.total_libres = Turno.objects.filter(cita__isnull=True, fecha__gt=self.hoy).count()
+        self.admin = Client()
+        self.admin.post('/login/', {'email': f'admin0@{sintetico.DOMINIO}', 'password': sintetico.PASSWORD})
+        self.api = Client()
+
+    def buscar_disponibilidad(self):
+        fecha = self.azar.choice([f for f in self.fechas if f >= self.hoy])
+        self.servicio.buscar_disponibilidad(fecha, self.azar.choice(self.especialidades))
+
+    def cita_full_clean(self):
+        medico = self.azar.choice(self.medicos)
+        inicio = self.entradas[medico.pk]
+        fin = (datetime.combine(self.hoy, inicio) + timedelta(minutes=medico.especialidad.duracion_cita)).time()
+        cita = Cita(
+            paciente_id=self.paciente_id, medico=medico, especialidad=medico.especialidad,
+            consultorio_id=medico.consultorio_id or self.externo_id, fecha=self.azar.choice(self.fechas),
+            hora_inicio=inicio, hora_fin=fin,
+        )
+        try:
+            cita.full_clean()
+        except ValidationError:
+            pass  # cita ya ocupada: se mide igual la validación completa
+
+    def preparar_cita_full_clean(self):
+        self.paciente_id = Cita.objects.values_list('paciente_id', flat=True).first()
+        self.externo_id = Cita.objects.filter(consultorio__tipo='externo').values_list('consultorio_id', flat=True).first()
+
+    def scheduler_get(self):
+        respuesta = self.api.get('/api/scheduler/', {'fecha': self.azar.choice(self.fechas).isoformat()})
+        assert respuesta.status_code == 200, respuesta.status_code
+
+    def reprogramar_put(self):
+        cita, turno = self.movimiento
+        respuesta = self.api.put(
+            f'/api/citas/{cita.pk}/reprogramar/',
+            json.dumps({'hora_inicio': turno.hora_inicio.isoformat(), 'hora_fin': turno.hora_fin.isoformat()}),
+            content_type='application/json',
+        )
+        assert respuesta.status_code == 200, respuesta.content
+
+    def preparar_reprogramar_put(self):
+        # Una cita futura y un turno libre del mismo médico ese día (no se mide)
+        if hasattr(self, 'movimiento'):
+            self.restaurar_reprogramar_put()
+        libres = Turno.objects.filter(cita__isnull=True, fecha__gt=self.hoy)
+        for _ in range(100):
+            turno = libres[self.azar.randrange(self.total_libres)]
+            cita = Cita.objects.filter(
+                medico_id=turno.medico_id, fecha=turno.fecha, especialidad_id=turno.especialidad_id
+            ).first()
+            if cita:
+                self.movimiento = (cita, turno)
+                return
+        raise CommandError('No future cita with a free slot to move it to; use a bigger hospital')
+
+    def restaurar_reprogramar_put(self):
+        cita, _ = self.movimiento
+        cita.save()  # vuelve a la hora original (la instancia no se tocó)
+        turnos.reclamar_turnos(cita)
+
+    def control_users(self):
+        respuesta = self.admin.get('/control_users/')
+        assert respuesta.status_code == 200, respuesta.status_code
+
+    def login_view(self):
+        respuesta = Client().post('/login/', {
+            'email': f'usuario{self.azar.randint(1 + len(self.medicos), len(self.medicos) + 10)}@{sintetico.DOMINIO}',
+            'password': sintetico.PASSWORD,
+        })
+        assert respuesta.status_code == 302, respuesta.status_code
+
+
+# nombre en el JSON -> método de Objetivos
+OBJETIVOS = {
+    'CitaService.buscar_disponibilidad': 'buscar_disponibilidad',
+    'Cita.full_clean': 'cita_full_clean',
+    'SchedulerDataView.get': 'scheduler_get',
+    'ReprogramarCitaView.put': 'reprogramar_put',
+    'control_users': 'control_users',
+    'login_view': 'login_view',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds a synthetic hospital in a throwaway SQLite file and reports p50/p95 latency and queries '
+        'for the scheduling hot paths; writes JSON that can be diffed between releases'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano', choices=TAMANOS, default='pequeno', help='Hospital size preset (default: pequeno)')
+        parser.add_argument('--medicos', type=int, help='Override the preset doctor count')
+        parser.add_argument('--pacientes', type=int, help='Override the preset patient count')
+        parser.add_argument('--dias', type=int, help='Override the preset number of days with citas')
+        parser.add_argument('--iteraciones', type=int, default=50, help='Timed calls per target (default: 50)')
+        parser.add_argument('--semilla', type=int, default=1, help='Random seed for data and inputs (default: 1)')
+        parser.add_argument('--solo', default=None, help='Comma-separated subset of targets')
+        parser.add_argument('--salida', default=None, help='Write the JSON results to this file')
+        parser.add_argument('--comparar', default=None, help='Previous JSON results to print deltas against')
+
+    def handle(self, *args, **options):
+        tamano = dict(TAMANOS[options['tamano']])
+        for campo in ('medicos', 'pacientes', 'dias'):
+            if options[campo]:
+                tamano[campo] = options[campo]
+        objetivos = list(OBJETIVOS)
+        if options['solo']:
+            objetivos = [o.strip() for o in options['solo'].split(',')]
+            desconocidos = set(objetivos) - set(OBJETIVOS)
+            if desconocidos:
+                raise CommandError(f'Unknown targets: {", ".join(sorted(desconocidos))}')
+
+        # 1) BD temporal migrada desde cero: los resultados no dependen de la BD local
+        with sintetico.bd_temporal('benchmark'):
+            inicio = time.perf_counter()
+            resumen = sintetico.construir_hospital(semilla=options['semilla'], **tamano)
+            resumen['segundos_construccion'] = round(time.perf_counter() - inicio, 2)
+            self.stdout.write(
+                f"Hospital: {resumen['medicos']} doctors, {resumen['pacientes']} patients, "
+                f"{resumen['citas']} citas, {resumen['turnos']} slots ({resumen['segundos_construccion']} s)"
+            )
+            resultados = self._medir_todo(objetivos, resumen, options)
+
+        salida = {
+            'meta': {
+                'fecha': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'tamano': options['tamano'],
+                'iteraciones': options['iteraciones'],
+                'hospital': resumen,
+            },
+            'resultados': resultados,
+        }
+        if options['salida']:
+            with open(options['salida'], 'w') as f:
+                json.dump(salida, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['salida']}"))
+        if options['comparar']:
+            self._comparar(resultados, options['comparar'])
+
+    def _medir_todo(self, objetivos, resumen, options):
+        azar = random.Random(options['semilla'])
+        banco = Objetivos(azar, resumen)
+        resultados = {}
+
+        self.stdout.write(f"{'target':<36} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+        for nombre in objetivos:
+            metodo = OBJETIVOS[nombre]
+            preparar = getattr(banco, f'preparar_{metodo}', None)
+            for alias in caches:
+                caches[alias].clear()
+
+            tiempos, consultas = [], []
+            for _ in range(options['iteraciones']):
+                if preparar:
+                    preparar()
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    getattr(banco, metodo)()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas))
+            if hasattr(banco, f'restaurar_{metodo}'):
+                getattr(banco, f'restaurar_{metodo}')()
+
+            resultados[nombre] = {
+                'p50_ms': round(percentil(tiempos, 50), 3),
+                'p95_ms': round(percentil(tiempos, 95), 3),
+                'media_ms': round(statistics.fmean(tiempos), 3),
+                'consultas_p50': percentil(consultas, 50),
+                'consultas_max': max(consultas),
+            }
+            r = resultados[nombre]
+            self.stdout.write(
+                f"{nombre:<36} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+                f"{r['consultas_p50']:>4}/{r['consultas_max']:<3}"
+            )
+        return resultados
+
+    def _comparar(self, resultados, ruta):
+        with open(ruta) as f:
+            anteriores = json.load(f)['resultados']
+        self.stdout.write(f"\nvs {ruta}")
+        self.stdout.write(f"{'target':<36} {'p50':>9} {'p95':>9} {'queries':>8}")
+        for nombre, actual in resultados.items():
+            previo = anteriores.get(nombre)
+            if not previo:
+                continue
+
+            def delta(campo):
+                return (actual[campo] - previo[campo]) / previo[campo] * 100 if previo[campo] else 0.0
+
+            self.stdout.write(
+                f"{nombre:<36} {delta('p50_ms'):>+8.1f}% {delta('p95_ms'):>+8.1f}% "
+                f"{actual['consultas_max'] - previo['consultas_max']:>+8d}"
+            )
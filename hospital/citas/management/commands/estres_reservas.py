@@ -0,0 +1,240 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from citas import sintetico
+from citas.carga import BLOQUEO, Cliente, servidor_local, variables_entorno
+from citas.management.commands.benchmark_suite import percentil
+from citas.models import Cita, Horario, Medico, Turno
+from login.models import Usuario
+
+# Reservas y movimientos a la vez contra un servidor de verdad: gunicorn ASGI
+# (el de startup.sh) sobre un hospital sintético en un archivo SQLite temporal.
+# Los pacientes piden confirmar_cita sobre unos pocos turnos disputados y el
+# personal mueve las citas de esos médicos con ReprogramarCitaView. Al final se
+# comprueba que no haya citas solapadas y que cada reserva aceptada sea una fila.
+TAMANO = {'medicos': 10, 'pacientes': 200, 'dias': 30}
+
+
+def _clasificar(operacion, status, destino):
+    if operacion == 'reservar':
+        if status == 302 and destino == '/dashboard_usuario/':
+            return 'ok'
+        if status == 302 and destino == '/create_cita/':
+            return 'rechazada'  # el turno ya estaba tomado (trigger o validación)
+        return 'error'
+    if status == 200:
+        return 'ok'
+    if status in (400, 409):
+        return 'rechazada'  # 400: full_clean vio el choque; 409: el trigger lo detuvo
+    return 'error'
+
+
+def _trabajador(args):
+    base, rol, n, email, plan, peticiones, semilla, reintentos = args
+    azar = random.Random(semilla * 1000 + n)
+    cliente = Cliente(base)
+    if rol == 'reservar':
+        cliente.pedir('GET', '/login/')  # deja la cookie csrftoken
+        status, _, _ = cliente.pedir('POST', '/login/', {'email': email, 'password': sintetico.PASSWORD})
+        if status != 302:
+            raise RuntimeError(f'login de {email}: HTTP {status}')
+
+    resultados = []  # (operación, resultado, ms, reintentos, bloqueos)
+    for _ in range(peticiones):
+        if rol == 'reservar':
+            medico_id, especialidad_id, consultorio_id, fecha, inicio, fin = azar.choice(plan['huecos'])
+            pedir = lambda: cliente.pedir('POST', '/confirmar_cita/', {
+                'medico_id': medico_id, 'especialidad_id': especialidad_id, 'consultorio_id': consultorio_id,
+                'fecha': fecha, 'hora_inicio': inicio, 'hora_fin': fin,
+            })
+        else:
+            cita_id, medico_id = azar.choice(plan['citas'])
+            inicio, fin = azar.choice(plan['horas'][str(medico_id)])
+            pedir = lambda: cliente.pedir(
+                'PUT', f'/api/citas/{cita_id}/reprogramar/', datos_json={'hora_inicio': inicio, 'hora_fin': fin}
+            )
+
+        inicio_peticion = time.perf_counter()
+        intentos = bloqueos = 0
+        while True:
+            status, destino, cuerpo = pedir()
+            bloqueos += BLOQUEO in cuerpo
+            # 5xx o sin respuesta: se reintenta con espera exponencial, como haría un cliente real
+            if (status == 0 or status >= 500) and intentos < reintentos:
+                intentos += 1
+                time.sleep(0.05 * 2 ** intentos * azar.uniform(0.5, 1.5))
+                continue
+            break
+        ms = (time.perf_counter() - inicio_peticion) * 1000
+        resultados.append((rol, _clasificar(rol, status, destino), ms, intentos, bloqueos))
+    return resultados
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress test for double booking: N processes book and move the same few slots through a local '
+        'gunicorn on a throwaway SQLite file, then the database is checked for overlapping citas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=8, help='Patient processes posting confirmar_cita (default: 8)')
+        parser.add_argument('--movedores', type=int, default=2, help='Staff processes calling ReprogramarCitaView (default: 2)')
+        parser.add_argument('--peticiones', type=int, default=50, help='Requests per process (default: 50)')
+        parser.add_argument('--medicos', type=int, default=2, help='Doctors whose slots are contested (default: 2)')
+        parser.add_argument('--workers', type=int, default=4, help='Gunicorn worker processes (default: 4)')
+        parser.add_argument('--reintentos', type=int, default=3, help='Client retries on 5xx or no response (default: 3)')
+        parser.add_argument('--semilla', type=int, default=1, help='Random seed (default: 1)')
+        parser.add_argument('--env', action='append', default=[], metavar='CLAVE=VALOR',
+                            help='Extra server environment, e.g. --env SQLITE_BUSY_TIMEOUT=100 (repeatable)')
+        parser.add_argument('--salida', default=None, help='Write the JSON results to this file')
+
+    def handle(self, *args, **options):
+        extra = variables_entorno(options['env'])
+        if options['procesos'] + options['movedores'] < 1:
+            raise CommandError('Need at least one process')
+
+        # 1) Hospital en un archivo temporal, que el servidor abrirá con DATABASE_PATH
+        with sintetico.bd_temporal('estres'), tempfile.TemporaryDirectory(prefix='estres-log-') as registros:
+            sintetico.construir_hospital(semilla=options['semilla'], **TAMANO)
+            plan = self._plan(options['medicos'])
+            emails = list(
+                Usuario.objects.filter(rol='usuario').order_by('pk').values_list('email', flat=True)[:options['procesos']]
+            )
+            citas_antes = Cita.objects.count()
+            self.stdout.write(
+                f"Contested: {len(plan['huecos'])} slots of {options['medicos']} doctors on {plan['fecha']}, "
+                f"{len(plan['citas'])} citas to move"
+            )
+
+            # 2) Servidor como en producción (startup.sh), con cada proceso su conexión al archivo;
+            #    DEBUG=True para reconocer "database is locked" en el cuerpo de los 500
+            with open(os.path.join(registros, 'servidor.log'), 'w+') as log:
+                with servidor_local(connection.settings_dict['NAME'], options['workers'], extra, log, debug=True) as base:
+                    self.stdout.write(f"Server ready at {base} ({options['workers']} workers)")
+                    tareas = [
+                        (base, 'reservar', n, email, plan, options['peticiones'], options['semilla'], options['reintentos'])
+                        for n, email in enumerate(emails)
+                    ] + [
+                        (base, 'mover', len(emails) + n, None, plan, options['peticiones'], options['semilla'], options['reintentos'])
+                        for n in range(options['movedores'])
+                    ]
+                    inicio = time.perf_counter()
+                    with Pool(len(tareas)) as pool:
+                        resultados = [r for lista in pool.map(_trabajador, tareas) for r in lista]
+                    segundos = time.perf_counter() - inicio
+                log.seek(0)
+                log_servidor = log.read()
+
+            # 3) Integridad después de la carga
+            connection.close()  # lo escrito por el servidor se lee con una conexión nueva
+            solapes = sintetico.contar_solapes()
+            filas_nuevas = Cita.objects.count() - citas_antes
+
+        reporte = self._reportar(resultados, segundos, solapes, filas_nuevas, options, extra)
+        if any(o['errores'] for o in reporte['operaciones'].values()):
+            # Errores que no se recuperaron reintentando: el final del log del servidor dice por qué
+            self.stdout.write('\nServer log (last 40 lines):')
+            self.stdout.write('\n'.join(log_servidor.splitlines()[-40:]))
+        if options['salida']:
+            with open(options['salida'], 'w') as f:
+                json.dump(reporte, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['salida']}"))
+        if any(solapes.values()) or reporte['integridad']['reservas_sin_fila']:
+            raise CommandError('Double booking detected')
+
+    def _plan(self, cuantos_medicos):
+        """Turnos disputados: todos los del primer día hábil futuro de unos pocos médicos."""
+        hoy = timezone.localdate()
+        fecha = Turno.objects.filter(fecha__gt=hoy).order_by('fecha').values_list('fecha', flat=True).first()
+        if fecha is None:
+            raise CommandError('No future slots in the synthetic hospital')
+        medicos = list(
+            Medico.objects.filter(pk__in=Horario.objects.filter(dia_semana=fecha.weekday()).values('medico_id'))
+            .order_by('pk')[:cuantos_medicos]
+        )
+
+        huecos, horas = [], {}
+        for medico in medicos:
+            # Los sintéticos atienden siempre en el mismo consultorio (propio o externo fijo)
+            consultorio_id = Cita.objects.filter(medico=medico).values_list('consultorio_id', flat=True).first()
+            turnos = Turno.objects.filter(medico=medico, fecha=fecha).order_by('hora_inicio')
+            horas[str(medico.pk)] = [(t.hora_inicio.isoformat(), t.hora_fin.isoformat()) for t in turnos]
+            # Mismo formato que los campos ocultos de citas/confirmar_cita.html
+            huecos += [
+                (medico.pk, medico.especialidad_id, consultorio_id or '', fecha.strftime('%b %d, %Y'),
+                 t.hora_inicio.strftime('%I:%M %p'), t.hora_fin.strftime('%I:%M %p'))
+                for t in turnos
+            ]
+        citas = list(Cita.objects.filter(medico__in=medicos, fecha=fecha).values_list('pk', 'medico_id'))
+        if not huecos or not citas:
+            raise CommandError('The contested doctors have no slots or citas on the chosen day')
+        return {'fecha': fecha.isoformat(), 'huecos': huecos, 'horas': horas, 'citas': citas}
+
+    def _reportar(self, resultados, segundos, solapes, filas_nuevas, options, extra):
+        operaciones = {}
+        self.stdout.write(
+            f"\n{'operation':<10} {'ok':>6} {'rejected':>9} {'errors':>7} {'locked':>7} {'retries':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for operacion in ('reservar', 'mover'):
+            filas = [r for r in resultados if r[0] == operacion]
+            if not filas:
+                continue
+            tiempos = [r[2] for r in filas]
+            o = operaciones[operacion] = {
+                'peticiones': len(filas),
+                'ok': sum(r[1] == 'ok' for r in filas),
+                'rechazadas': sum(r[1] == 'rechazada' for r in filas),
+                'errores': sum(r[1] == 'error' for r in filas),
+                'bloqueos': sum(r[4] for r in filas),
+                'reintentos': sum(r[3] for r in filas),
+                'p50_ms': round(percentil(tiempos, 50), 1),
+                'p95_ms': round(percentil(tiempos, 95), 1),
+                'p99_ms': round(percentil(tiempos, 99), 1),
+                'media_ms': round(statistics.fmean(tiempos), 1),
+            }
+            self.stdout.write(
+                f"{operacion:<10} {o['ok']:>6} {o['rechazadas']:>9} {o['errores']:>7} {o['bloqueos']:>7} "
+                f"{o['reintentos']:>8} {o['p50_ms']:>8.1f} {o['p95_ms']:>8.1f} {o['p99_ms']:>8.1f}"
+            )
+
+        reservas = operaciones.get('reservar', {}).get('ok', 0)
+        integridad = {
+            'solapes_medico': solapes['medico'],
+            'solapes_consultorio': solapes['consultorio'],
+            'reservas_aceptadas': reservas,
+            'filas_nuevas': filas_nuevas,
+            'reservas_sin_fila': reservas != filas_nuevas,
+        }
+        self.stdout.write(f'\n{len(resultados) / segundos:.1f} requests/s over {segundos:.1f} s')
+        resumen = (
+            f"Overlapping citas: {solapes['medico']} by doctor, {solapes['consultorio']} by consultorio. "
+            f"Accepted bookings: {reservas}, new cita rows: {filas_nuevas}."
+        )
+        if any(solapes.values()) or reservas != filas_nuevas:
+            self.stdout.write(self.style.ERROR(resumen))
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
+
+        return {
+            'meta': {
+                'fecha': timezone.now().isoformat(timespec='seconds'),
+                'procesos': options['procesos'],
+                'movedores': options['movedores'],
+                'peticiones': options['peticiones'],
+                'workers': options['workers'],
+                'reintentos': options['reintentos'],
+                'env': extra,
+            },
+            'peticiones_por_segundo': round(len(resultados) / segundos, 1),
+            'segundos': round(segundos, 2),
+            'operaciones': operaciones,
+            'integridad': integridad,
+        }
@@ -0,0 +1,52 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from citas import sintetico
+
+# Volumen de producción para pruebas de carga y de consultas: por defecto
+# 300 médicos, 100 000 pacientes y 1 000 000 de citas. Las filas salen de
+# citas/sintetico.py, el mismo generador que usa benchmark_suite.
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads a deterministic synthetic hospital (doctors, schedules, patients and non-overlapping citas) '
+        'into the configured database; use a scratch DATABASE_PATH'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medicos', type=int, default=300, help='Doctors (default: 300)')
+        parser.add_argument('--pacientes', type=int, default=100000, help='Patients (default: 100000)')
+        parser.add_argument('--citas', type=int, default=1000000, help='Exact number of citas (default: 1000000)')
+        parser.add_argument('--ocupacion', type=float, default=0.6, help='Share of schedule slots booked (default: 0.6)')
+        parser.add_argument('--semilla', type=int, default=1, help='Random seed (default: 1)')
+        parser.add_argument('--desde', default=None,
+                            help='First cita date, YYYY-MM-DD (default: centred on today; fix it for identical rows)')
+
+    def handle(self, *args, **options):
+        if not 0 < options['ocupacion'] <= 1:
+            raise CommandError('--ocupacion must be in (0, 1]')
+        if options['medicos'] < 1 or options['pacientes'] < 1:
+            raise CommandError('--medicos and --pacientes must be at least 1')
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else None
+        except ValueError:
+            raise CommandError('--desde must be YYYY-MM-DD')
+        if sintetico.existe():
+            raise CommandError(f'This database already has a synthetic hospital (@{sintetico.DOMINIO} users).')
+
+        inicio = time.perf_counter()
+
+        def aviso(texto):
+            self.stdout.write(f'{time.perf_counter() - inicio:7.1f} s  {texto}')
+
+        resumen = sintetico.construir_hospital(
+            medicos=options['medicos'], pacientes=options['pacientes'], citas=options['citas'],
+            ocupacion=options['ocupacion'], semilla=options['semilla'], desde=desde, aviso=aviso,
+        )
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {resumen['citas']} citas over {resumen['dias']} days from {resumen['desde']} in {segundos:.1f} s "
+            f"({resumen['citas'] / segundos:,.0f} citas/s). "
+            f"Users log in with password '{sintetico.PASSWORD}'."
+        ))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from citas.models import Turno
+from citas.services.turnos import generar_turnos
+
+class Command(BaseCommand):
+    help = 'Generates the slot inventory (citas.Turno) for the rolling horizon and drops past slots (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.TURNOS_HORIZONTE_DIAS,
+            help=f'Days ahead to generate (default: TURNOS_HORIZONTE_DIAS={settings.TURNOS_HORIZONTE_DIAS})'
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        pasados, _ = Turno.objects.filter(fecha__lt=hoy).delete()
+        creados, borrados, reenlazados = generar_turnos(desde=hoy, hasta=hoy + timedelta(days=options['dias']))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Slots created: {creados}, removed: {borrados}, relinked: {reenlazados}, past slots dropped: {pasados}.'
+        ))
@@ -0,0 +1,87 @@
+import fcntl
+import os
+import time
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.migrations.loader import MigrationLoader
+from hospital.salud import migraciones_pendientes
+
+# Trabajo de arranque que antes hacía cada réplica: migrate, seed y turnos.
+# Lo hace un solo proceso (el Job de Kubernetes o el primero que tome el
+# cerrojo) y deja una marca junto a la BD con las migraciones que aplicó;
+# los demás ven la marca y salen sin tocar la BD.
+
+
+def _ruta(nombre):
+    return os.path.join(os.path.dirname(str(settings.DATABASES['default']['NAME'])), nombre)
+
+
+def _firma():
+    # Cambia cuando el código trae migraciones nuevas
+    hojas = MigrationLoader(None, ignore_no_migrations=True).graph.leaf_nodes()
+    return ','.join(f'{app}.{nombre}' for app, nombre in sorted(hojas))
+
+
+def _leer_marca():
+    try:
+        with open(_ruta('.inicializado')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Runs migrations, demo seed and slot generation once per release, under a file lock next to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sin-seed', action='store_true', help='Skip seed_demo_data.py')
+        parser.add_argument('--espera', type=int, default=300, help='Seconds to wait for the lock (default: 300)')
+        parser.add_argument('--forzar', action='store_true', help='Run every step even if the marker is current')
+
+    def _paso(self, nombre, funcion):
+        inicio = time.perf_counter()
+        funcion()
+        self.stdout.write(f'{nombre:<16} {(time.perf_counter() - inicio) * 1000:8.0f} ms')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        firma = _firma()
+
+        # 1) Camino rápido: esta versión ya se inicializó
+        if not options['forzar'] and _leer_marca() == firma:
+            self.stdout.write(self.style.SUCCESS('Already initialized for this release, nothing to do.'))
+            return
+
+        # 2) Cerrojo: las demás réplicas esperan aquí en vez de migrar a la vez
+        with open(_ruta('.inicializar.lock'), 'w') as cerrojo:
+            espera = time.perf_counter()
+            limite = time.monotonic() + options['espera']
+            while True:
+                try:
+                    fcntl.flock(cerrojo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > limite:
+                        raise CommandError(f'Lock not acquired after {options["espera"]} s')
+                    time.sleep(0.5)
+            self.stdout.write(f'{"lock":<16} {(time.perf_counter() - espera) * 1000:8.0f} ms')
+
+            # 3) Quien tenía el cerrojo pudo haberlo hecho todo mientras esperábamos
+            if not options['forzar'] and _leer_marca() == firma:
+                self.stdout.write(self.style.SUCCESS('Initialized by another process while waiting.'))
+                return
+
+            # 4) Pasos
+            if migraciones_pendientes():
+                self._paso('migrate', lambda: call_command('migrate', interactive=False, verbosity=0))
+            if not options['sin_seed']:
+                from seed_demo_data import run_seed
+                self._paso('seed', run_seed)
+            self._paso('generar_turnos', lambda: call_command('generar_turnos', stdout=self.stdout))
+
+            with open(_ruta('.inicializado'), 'w') as marca:
+                marca.write(firma)
+
+        total = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(self.style.SUCCESS(f'Initialized in {total:.0f} ms.'))
@@ -0,0 +1,382 @@
+import json
+import re
+import time
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from citas import sintetico
+from citas.models import Cita, Especialidad, Medico, Turno
+from citas.services.factory import get_cita_service
+from login import views
+from login.models import Usuario
+
+# Presupuesto de consultas por URL con nombre. Cada vista se pide una vez con
+# las cachés vacías (el peor caso) sobre dos hospitales sintéticos de distinto
+# tamaño, cada uno en su BD temporal. Falla si una vista pasa de su presupuesto
+# o si hace más consultas en el hospital grande que en el pequeño (N+1), y
+# muestra el SQL agrupado por sentencia. Una URL nueva sin presupuesto también falla.
+TAMANOS = {
+    'pequeno': {'medicos': 8, 'pacientes': 200, 'dias': 20},
+    'grande': {'medicos': 40, 'pacientes': 2000, 'dias': 60},
+}
+
+# nombre de la URL -> máximo de consultas. Las que escriben van al final: las
+# anteriores miden el hospital tal como salió del generador.
+PRESUPUESTOS = {
+    'index': 0,
+    'inicio': 0,
+    'create_user': 0,
+    'login': 1,
+    'control_users': 3,
+    'control_users_usuarios': 2,
+    'buscar_usuarios': 2,
+    'update_user': 1,
+    'create_medico': 3,
+    'create_consultorio': 1,
+    'create_horario': 2,
+    'create_especialidad': 1,
+    'list_horarios': 3,
+    'dashboard_usuario': 3,
+    'dashboard_usuario_pasadas': 2,
+    'dashboard_medico': 4,
+    'dashboard_medico_historial': 3,
+    'scheduler_data': 5,
+    'disponibilidad': 29,  # 1 + 4 por día (AgendaDia con la caché vacía) x 7 días
+    'disponibilidad_cache': 0,
+    'create_cita': 3,
+    'confirmar_cita': 11,
+    'reprogramar_cita': 20,
+    'reprogramar_lote': 11,
+    'change_rol': 5,
+    'logout': 0,
+    'delete_user': 12,
+}
+
+# URLs con nombre que no se miden, con el motivo
+SIN_MEDIR = {
+    'admin': 'Django admin (usa django.contrib.auth, no la sesión del hospital)',
+    'scheduler_stream': 'SSE asíncrono: solo responde bajo ASGI; el cliente de pruebas recibe un 501',
+}
+
+
+def nombres_de_urls(patrones=None):
+    """Nombres de las URLs del URLconf; los include() como admin/ cuentan como su namespace."""
+    nombres = set()
+    for patron in get_resolver().url_patterns if patrones is None else patrones:
+        if isinstance(patron, URLResolver):
+            if patron.namespace:
+                nombres.add(patron.namespace)
+            else:
+                nombres |= nombres_de_urls(patron.url_patterns)
+        elif isinstance(patron, URLPattern) and patron.name:
+            nombres.add(patron.name)
+    return nombres
+
+
+def plantilla(sql):
+    # Mismo SQL con otros valores = misma sentencia (así se ve el N+1)
+    return re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", '?', sql)
+
+
+def agrupar(consultas):
+    """[(veces, ejemplo)] en el orden en que aparece cada sentencia."""
+    grupos = {}
+    for consulta in consultas:
+        clave = plantilla(consulta['sql'])
+        veces, ejemplo = grupos.get(clave, (0, consulta['sql']))
+        grupos[clave] = (veces + 1, ejemplo)
+    return list(grupos.values())
+
+
+class Casos:
+    """
+    Un método por URL con nombre que devuelve (respuesta, esperado): el código
+    HTTP o, para una redirección, la ruta a la que debe llevar. `preparar_*`
+    deja listo lo que no se mide.
+    """
+
+    def __init__(self):
+        self.hoy = timezone.localdate()
+        self.admin = self._sesion(f'admin0@{sintetico.DOMINIO}')
+
+        # El paciente, el médico y el día con más citas: si hay N+1, ahí se nota
+        self.paciente = Usuario.objects.get(pk=self._mas_citas('paciente_id'))
+        self.cliente_paciente = self._sesion(self.paciente.email)
+        self.medico = Medico.objects.select_related('usuario').get(pk=self._mas_citas('medico_id'))
+        self.cliente_medico = self._sesion(self.medico.usuario.email)
+        self.fecha = Cita.objects.values('fecha').annotate(n=Count('id')).order_by('-n')[0]['fecha']
+        self.especialidad = self.medico.especialidad
+        self.api = Client()
+
+    def _sesion(self, email):
+        cliente = Client()
+        respuesta = cliente.post('/login/', {'email': email, 'password': sintetico.PASSWORD})
+        if respuesta.status_code != 302:
+            raise CommandError(f'Could not log in as {email}')
+        return cliente
+
+    def _mas_citas(self, campo):
+        return Cita.objects.values(campo).annotate(n=Count('id')).order_by('-n', campo)[0][campo]
+
+    def _hueco_futuro(self):
+        # Primer día hábil con turnos libres a partir de mañana
+        for offset in range(1, 15):
+            fecha = self.hoy + timedelta(days=offset)
+            for especialidad in Especialidad.objects.order_by('pk'):
+                resultado = get_cita_service().buscar_disponibilidad(fecha, especialidad)
+                if resultado:
+                    return fecha, especialidad, resultado
+        raise CommandError('No free slot in the next two weeks; use a bigger hospital')
+
+    def _movimiento(self):
+        # Una cita futura y un turno libre del mismo médico ese día
+        for turno in Turno.objects.filter(cita__isnull=True, fecha__gt=self.hoy).order_by('fecha', 'pk')[:500]:
+            cita = Cita.objects.filter(
+                medico_id=turno.medico_id, fecha=turno.fecha, especialidad_id=turno.especialidad_id
+            ).first()
+            if cita:
+                return cita, turno
+        raise CommandError('No future cita with a free slot to move it to; use a bigger hospital')
+
+    # --- Páginas públicas ---
+    def index(self):
+        return Client().get('/'), 200
+
+    def inicio(self):
+        return Client().get('/inicio/'), 200
+
+    def create_user(self):
+        return Client().get('/create_user/'), 200
+
+    def login(self):
+        return Client().post('/login/', {'email': self.paciente.email, 'password': sintetico.PASSWORD}), '/dashboard_usuario/'
+
+    # --- Administración ---
+    def control_users(self):
+        return self.admin.get('/control_users/'), 200
+
+    def control_users_usuarios(self):
+        return self.admin.get('/control_users/usuarios/', {'rol': 'usuario', 'despues': self.despues}), 200
+
+    def preparar_control_users_usuarios(self):
+        _, self.despues = views._pagina_usuarios(rol='usuario')
+
+    def buscar_usuarios(self):
+        return self.admin.get('/api/usuarios/buscar/', {'q': 'Usuario 1'}), 200
+
+    def update_user(self):
+        return self.admin.get(f'/update_user/{self.paciente.pk}'), 200
+
+    def create_medico(self):
+        return self.admin.get('/create_medico/'), 200
+
+    def create_consultorio(self):
+        return self.admin.get('/create_consultorio/'), 200
+
+    def create_horario(self):
+        return self.admin.get('/create_horario/'), 200
+
+    def create_especialidad(self):
+        return self.admin.get('/create_especialidad/'), 200
+
+    def list_horarios(self):
+        return self.admin.get('/list_horarios/', {'medico_id': self.medico.pk}), 200
+
+    # --- Paneles ---
+    def dashboard_usuario(self):
+        return self.cliente_paciente.get('/dashboard_usuario/'), 200
+
+    def dashboard_usuario_pasadas(self):
+        return self.cliente_paciente.get('/dashboard_usuario/pasadas/', {'antes': self.antes}), 200
+
+    def preparar_dashboard_usuario_pasadas(self):
+        # Segunda página: lo anterior a la cita pasada más reciente
+        ultima = Cita.objects.filter(paciente=self.paciente, fecha__lt=self.hoy).order_by('-fecha', '-hora_inicio', '-id')[0]
+        self.antes = views._cursor_historial(ultima)
+
+    def dashboard_medico(self):
+        return self.cliente_medico.get('/dashboard_medico/'), 200
+
+    def dashboard_medico_historial(self):
+        return self.cliente_medico.get('/dashboard_medico/historial/', {'antes': self.antes}), 200
+
+    def preparar_dashboard_medico_historial(self):
+        ultima = Cita.objects.filter(medico=self.medico).order_by('-fecha', '-hora_inicio', '-id')[0]
+        self.antes = views._cursor_historial(ultima)
+
+    # --- API del tablero ---
+    def scheduler_data(self):
+        return self.api.get('/api/scheduler/', {'fecha': self.fecha.isoformat()}), 200
+
+    def disponibilidad(self):
+        return self.api.get('/api/disponibilidad/', {
+            'especialidad': self.especialidad.pk,
+            'desde': self.hoy.isoformat(),
+            'hasta': (self.hoy + timedelta(days=6)).isoformat(),
+        }), 200
+
+    def disponibilidad_cache(self):
+        return self.api.get('/api/disponibilidad/cache/'), 200
+
+    # --- Escrituras ---
+    def create_cita(self):
+        fecha, especialidad, _ = self.hueco
+        return self.cliente_paciente.post('/create_cita/', {
+            'fecha': fecha.isoformat(), 'especialidad': especialidad.pk,
+        }), 200
+
+    def preparar_create_cita(self):
+        self.hueco = self._hueco_futuro()
+
+    def confirmar_cita(self):
+        fecha, especialidad, hueco = self.hueco
+        medico, hora_inicio, hora_fin, consultorio = hueco
+        return self.cliente_paciente.post('/confirmar_cita/', {
+            'medico_id': medico.pk, 'especialidad_id': especialidad.pk,
+            # Mismo formato que los campos ocultos de citas/confirmar_cita.html
+            'consultorio_id': consultorio.pk if consultorio else '', 'fecha': fecha.strftime('%b %d, %Y'),
+            'hora_inicio': hora_inicio.strftime('%I:%M %p'), 'hora_fin': hora_fin.strftime('%I:%M %p'),
+        }), '/dashboard_usuario/'
+
+    def preparar_confirmar_cita(self):
+        self.hueco = self._hueco_futuro()
+
+    def reprogramar_cita(self):
+        cita, turno = self.movimiento
+        return self.api.put(
+            f'/api/citas/{cita.pk}/reprogramar/',
+            json.dumps({'hora_inicio': turno.hora_inicio.isoformat(), 'hora_fin': turno.hora_fin.isoformat()}),
+            content_type='application/json',
+        ), 200
+
+    def preparar_reprogramar_cita(self):
+        self.movimiento = self._movimiento()
+
+    def reprogramar_lote(self):
+        cita, turno = self.movimiento
+        return self.api.post('/api/citas/reprogramar/', {'movimientos': [{
+            'id': cita.pk, 'consultorio_id': cita.consultorio_id, 'fecha': turno.fecha.isoformat(),
+            'hora_inicio': turno.hora_inicio.isoformat(), 'hora_fin': turno.hora_fin.isoformat(),
+        }]}, content_type='application/json'), 200
+
+    def preparar_reprogramar_lote(self):
+        self.movimiento = self._movimiento()
+
+    def change_rol(self):
+        return self.admin.post(f'/change_rol/{self.paciente.pk}/', {'nuevo_rol': 'usuario'}), '/control_users/'
+
+    def logout(self):
+        return self.saliente.get('/logout/'), '/'
+
+    def preparar_logout(self):
+        self.saliente = self._sesion(self.paciente.email)
+
+    def delete_user(self):
+        return self.admin.post(f'/delete_user/{self.baja.pk}/'), '/control_users/'
+
+    def preparar_delete_user(self):
+        # Un paciente nuevo con una sola cita: el borrado en cascada pasa por las
+        # señales de cada cita (3 consultas por cita), así el conteo no depende del azar
+        self.baja = Usuario.objects.create(
+            nombres='Baja', apellidos='Presupuesto', cedula=sintetico.cedula(10 ** 7), telefono='0999999999',
+            email=f'baja@{sintetico.DOMINIO}', fecha_nacimiento=date(1990, 1, 1), genero='F',
+            password=make_password(sintetico.PASSWORD), rol='usuario',
+        )
+        Cita.objects.filter(pk__in=Cita.objects.filter(fecha__gt=self.hoy).values('pk')[:1]).update(paciente=self.baja)
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests every named URL once with cold caches on a small and a large synthetic hospital, '
+        'and fails if a view exceeds its query budget or its query count grows with the data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo', default=None, help='Comma-separated subset of URL names')
+        parser.add_argument('--sql', action='store_true', help='Print the SQL of every view, not only failures')
+        parser.add_argument('--semilla', type=int, default=1, help='Random seed for the hospitals (default: 1)')
+
+    def handle(self, *args, **options):
+        # 1) Toda URL con nombre tiene presupuesto o un motivo para no medirse
+        sin_presupuesto = nombres_de_urls() - set(PRESUPUESTOS) - set(SIN_MEDIR)
+        if sin_presupuesto:
+            raise CommandError(f'Named URLs without a query budget: {", ".join(sorted(sin_presupuesto))}')
+        nombres = list(PRESUPUESTOS)
+        if options['solo']:
+            pedidos = [n.strip() for n in options['solo'].split(',')]
+            desconocidos = set(pedidos) - set(PRESUPUESTOS)
+            if desconocidos:
+                raise CommandError(f'Unknown URL names: {", ".join(sorted(desconocidos))}')
+            nombres = [n for n in nombres if n in pedidos]
+
+        # 2) Medir en cada hospital, cada uno en su BD temporal
+        medidas = {}  # tamaño -> nombre -> consultas capturadas
+        for tamano, parametros in TAMANOS.items():
+            with sintetico.bd_temporal('presupuesto'):
+                inicio = time.perf_counter()
+                resumen = sintetico.construir_hospital(semilla=options['semilla'], **parametros)
+                self.stdout.write(
+                    f"Hospital {tamano}: {resumen['medicos']} doctors, {resumen['pacientes']} patients, "
+                    f"{resumen['citas']} citas ({time.perf_counter() - inicio:.1f} s)"
+                )
+                medidas[tamano] = self._medir(nombres)
+
+        # 3) Comparar con el presupuesto y entre tamaños
+        pequeno, grande = TAMANOS
+        fallos = []
+        self.stdout.write(f"\n{'url name':<28} {pequeno:>8} {grande:>8} {'budget':>7}")
+        for nombre in nombres:
+            antes, despues = len(medidas[pequeno][nombre]), len(medidas[grande][nombre])
+            motivos = []
+            if max(antes, despues) > PRESUPUESTOS[nombre]:
+                motivos.append('over budget')
+            if despues > antes:
+                motivos.append('grows with data')
+            linea = f'{nombre:<28} {antes:>8} {despues:>8} {PRESUPUESTOS[nombre]:>7}'
+            if motivos:
+                fallos.append(nombre)
+                self.stdout.write(self.style.ERROR(f'{linea}  FAIL: {", ".join(motivos)}'))
+            else:
+                self.stdout.write(f'{linea}  ok')
+
+        # 4) SQL del hospital grande, agrupado: "12x SELECT ..." es un N+1
+        for nombre in nombres if options['sql'] else fallos:
+            self.stdout.write(f'\n{nombre} ({grande}):')
+            for veces, sql in agrupar(medidas[grande][nombre]):
+                self.stdout.write(f'  {veces:>3}x  {sql}')
+
+        if fallos:
+            raise CommandError(f'{len(fallos)} of {len(nombres)} views failed their query budget')
+        self.stdout.write(self.style.SUCCESS(f'\nAll {len(nombres)} views within budget.'))
+
+    def _medir(self, nombres):
+        casos = Casos()
+        medidas = {}
+        for nombre in nombres:
+            preparar = getattr(casos, f'preparar_{nombre}', None)
+            if preparar:
+                preparar()
+            for alias in caches:
+                caches[alias].clear()
+
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta, esperado = getattr(casos, nombre)()
+                if respuesta.streaming:
+                    # El cuerpo se calcula al leerlo: sus consultas también son de la vista
+                    b''.join(respuesta.streaming_content)
+            obtenido = respuesta.get('Location') if isinstance(esperado, str) else respuesta.status_code
+            if obtenido != esperado:
+                # Una redirección al login o un 400 no mide la vista que se quería medir
+                raise CommandError(
+                    f'{nombre}: expected {esperado}, got HTTP {respuesta.status_code} '
+                    f'{respuesta.get("Location", "")}'.rstrip()
+                )
+            medidas[nombre] = capturadas.captured_queries
+        return medidas
@@ -0,0 +1,275 @@
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+from multiprocessing import Pool
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from citas import sintetico
+from citas.carga import Cliente, servidor_local, variables_entorno
+from citas.management.commands.benchmark_suite import TAMANOS, percentil
+from citas.models import Especialidad, Turno
+from login.models import Usuario
+
+# Recorridos de usuario de principio a fin contra gunicorn local (como en
+# startup.sh) sobre un hospital sintético temporal. Cada etapa lanza N usuarios
+# virtuales durante --duracion segundos; cada uno repite recorridos elegidos
+# según --mezcla, con --pausa segundos entre pasos. Por etapa y paso se informan
+# p50/p95/p99 y el porcentaje de errores, para dimensionar réplicas con datos.
+CAMPO_OCULTO = re.compile(r'<input type="hidden" name="(\w+)" value="([^"]*)">')
+SIGUIENTE = re.compile(r'data-siguiente="(\d+)"')
+
+
+class _Recorrido:
+    """Un recorrido de un usuario virtual; `paso` mide una petición y anota si fue un error."""
+
+    def __init__(self, base, azar, plan, pausa, resultados):
+        self.cliente = Cliente(base)
+        self.azar = azar
+        self.plan = plan
+        self.pausa = pausa
+        self.resultados = resultados
+
+    def paso(self, nombre, esperado, metodo, ruta, **kwargs):
+        # `esperado`: códigos HTTP o rutas de redirección que cuentan como éxito
+        inicio = time.perf_counter()
+        status, destino, cuerpo = self.cliente.pedir(metodo, ruta, **kwargs)
+        ms = (time.perf_counter() - inicio) * 1000
+        self.resultados.append((f'{type(self).__name__.lower()}.{nombre}', ms, status not in esperado and destino not in esperado))
+        time.sleep(self.pausa)
+        return status, destino, cuerpo
+
+    def entrar(self, email, destino):
+        self.paso('login_form', {200}, 'GET', '/login/')
+        _, llegada, _ = self.paso('login', {destino}, 'POST', '/login/', formulario={
+            'email': email, 'password': sintetico.PASSWORD,
+        })
+        return llegada == destino
+
+
+class Paciente(_Recorrido):
+    """login → create_cita → confirmar_cita → dashboard_usuario."""
+
+    def ejecutar(self):
+        if not self.entrar(self.azar.choice(self.plan['pacientes']), '/dashboard_usuario/'):
+            return
+        self.paso('create_cita_form', {200}, 'GET', '/create_cita/')
+        status, _, cuerpo = self.paso('create_cita', {200, '/create_cita/'}, 'POST', '/create_cita/', formulario={
+            'fecha': self.azar.choice(self.plan['fechas']), 'especialidad': self.azar.choice(self.plan['especialidades']),
+        })
+        if status == 200:
+            # Se confirma lo que propuso la página, con sus campos ocultos tal cual
+            campos = dict(CAMPO_OCULTO.findall(cuerpo.decode()))
+            campos.pop('csrfmiddlewaretoken', None)
+            # /create_cita/ = otro paciente tomó el turno entre la búsqueda y la confirmación
+            self.paso('confirmar_cita', {'/dashboard_usuario/', '/create_cita/'}, 'POST', '/confirmar_cita/',
+                      formulario=campos)
+        self.paso('dashboard_usuario', {200}, 'GET', '/dashboard_usuario/')
+
+
+class Admin(_Recorrido):
+    """login → control_users → segunda página de usuarios."""
+
+    def ejecutar(self):
+        if not self.entrar(self.plan['admin'], '/control_users/'):
+            return
+        _, _, cuerpo = self.paso('control_users', {200}, 'GET', '/control_users/')
+        siguiente = SIGUIENTE.search(cuerpo.decode())
+        if siguiente:
+            self.paso('control_users_usuarios', {200}, 'GET', f'/control_users/usuarios/?despues={siguiente[1]}')
+
+
+class Recepcion(_Recorrido):
+    """Tablero completo, tres sondeos por delta y arrastrar una cita al turno siguiente."""
+
+    SONDEOS = 3
+
+    def ejecutar(self):
+        fecha = self.plan['tablero']
+        status, _, cuerpo = self.paso('scheduler', {200}, 'GET', f'/api/scheduler/?fecha={fecha}')
+        if status != 200:
+            return
+        tablero = json.loads(cuerpo)
+        cursor = tablero['cursor']
+        for _ in range(self.SONDEOS):
+            status, _, cuerpo = self.paso('scheduler_delta', {200}, 'GET', f'/api/scheduler/?fecha={fecha}&since={cursor}')
+            if status == 200:
+                cursor = json.loads(cuerpo)['cursor']
+
+        citas = [cita for consultorio in tablero['consultorios'] for cita in consultorio['citas']]
+        if citas:
+            cita = self.azar.choice(citas)
+            duracion = _minutos(cita['hora_fin']) - _minutos(cita['hora_inicio'])
+            nuevo = _minutos(cita['hora_inicio']) + duracion
+            # 400/409: el turno siguiente ya estaba ocupado; el tablero lo rechaza igual que en la UI
+            self.paso('reprogramar', {200, 400, 409}, 'PUT', f"/api/citas/{cita['id']}/reprogramar/", datos_json={
+                'hora_inicio': _hhmm(nuevo), 'hora_fin': _hhmm(nuevo + duracion),
+            })
+
+
+RECORRIDOS = {'paciente': Paciente, 'admin': Admin, 'recepcion': Recepcion}
+
+
+def _minutos(hora):
+    horas, minutos = hora.split(':')[:2]
+    return int(horas) * 60 + int(minutos)
+
+
+def _hhmm(minutos):
+    return f'{minutos // 60:02d}:{minutos % 60:02d}'
+
+
+def _usuario_virtual(args):
+    base, n, plan, mezcla, duracion, pausa, semilla = args
+    azar = random.Random(semilla * 1000 + n)
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    resultados, completados = [], Counter()
+
+    limite = time.monotonic() + duracion
+    while time.monotonic() < limite:
+        nombre = azar.choices(nombres, pesos)[0]
+        RECORRIDOS[nombre](base, azar, plan, pausa, resultados).ejecutar()
+        completados[nombre] += 1
+    return resultados, completados
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs scripted patient, admin and receptionist journeys against a local gunicorn with ramping '
+        'concurrency and reports p50/p95/p99 latency and error rate per step'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etapas', default='1,4,8,16', help='Concurrent virtual users per stage (default: 1,4,8,16)')
+        parser.add_argument('--duracion', type=float, default=15, help='Seconds per stage (default: 15)')
+        parser.add_argument('--mezcla', default='paciente=6,admin=1,recepcion=3',
+                            help='Journey weights (default: paciente=6,admin=1,recepcion=3)')
+        parser.add_argument('--pausa', type=float, default=0.2, help='Think time between steps in seconds (default: 0.2)')
+        parser.add_argument('--workers', type=int, default=4, help='Gunicorn worker processes (default: 4)')
+        parser.add_argument('--tamano', choices=TAMANOS, default='mediano', help='Hospital size preset (default: mediano)')
+        parser.add_argument('--semilla', type=int, default=1, help='Random seed (default: 1)')
+        parser.add_argument('--env', action='append', default=[], metavar='CLAVE=VALOR',
+                            help='Extra server environment, e.g. --env SQLITE_SYNCHRONOUS=FULL or --env DEBUG=True (repeatable)')
+        parser.add_argument('--salida', default=None, help='Write the JSON results to this file')
+
+    def handle(self, *args, **options):
+        extra = variables_entorno(options['env'])
+        try:
+            etapas = [int(n) for n in options['etapas'].split(',')]
+            mezcla = {nombre: float(peso) for nombre, peso in (par.split('=') for par in options['mezcla'].split(','))}
+        except ValueError:
+            raise CommandError('--etapas takes N,N,... and --mezcla takes nombre=peso,...')
+        if set(mezcla) - set(RECORRIDOS) or min(etapas) < 1:
+            raise CommandError(f'Journeys are {", ".join(RECORRIDOS)}; stages must be at least 1 user')
+
+        with sintetico.bd_temporal('carga'), tempfile.TemporaryDirectory(prefix='carga-log-') as registros:
+            # 1) Hospital y lo que los recorridos necesitan saber de él
+            resumen = sintetico.construir_hospital(semilla=options['semilla'], **TAMANOS[options['tamano']])
+            plan = self._plan()
+            self.stdout.write(
+                f"Hospital {options['tamano']}: {resumen['medicos']} doctors, {resumen['pacientes']} patients, "
+                f"{resumen['citas']} citas"
+            )
+
+            # 2) Etapas de concurrencia creciente contra el mismo servidor, con DEBUG=False
+            #    como en producción salvo --env DEBUG=True
+            with open(os.path.join(registros, 'servidor.log'), 'w') as log, \
+                    servidor_local(connection.settings_dict['NAME'], options['workers'], extra, log) as base:
+                self.stdout.write(f"Server ready at {base} ({options['workers']} workers)")
+                informe = [self._etapa(base, usuarios, plan, mezcla, options) for usuarios in etapas]
+
+        self._resumen(informe)
+        if options['salida']:
+            with open(options['salida'], 'w') as f:
+                json.dump({
+                    'meta': {
+                        'fecha': timezone.now().isoformat(timespec='seconds'),
+                        'tamano': options['tamano'],
+                        'workers': options['workers'],
+                        'duracion': options['duracion'],
+                        'pausa': options['pausa'],
+                        'mezcla': mezcla,
+                        'env': extra,
+                    },
+                    'etapas': informe,
+                }, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['salida']}"))
+
+    def _plan(self):
+        hoy = timezone.localdate()
+        # Días hábiles con turnos a partir de mañana; el tablero, el primero de ellos
+        fechas = sorted({
+            f.isoformat() for f in Turno.objects.filter(fecha__gt=hoy, fecha__lte=hoy + timedelta(days=14))
+            .values_list('fecha', flat=True).distinct()
+        })
+        if not fechas:
+            raise CommandError('No future slots in the synthetic hospital')
+        return {
+            'pacientes': list(Usuario.objects.filter(rol='usuario').values_list('email', flat=True)),
+            'admin': f'admin0@{sintetico.DOMINIO}',
+            'especialidades': list(Especialidad.objects.values_list('pk', flat=True)),
+            'fechas': fechas,
+            'tablero': fechas[0],
+        }
+
+    def _etapa(self, base, usuarios, plan, mezcla, options):
+        tareas = [
+            (base, usuarios * 1000 + n, plan, mezcla, options['duracion'], options['pausa'], options['semilla'])
+            for n in range(usuarios)
+        ]
+        inicio = time.perf_counter()
+        with Pool(usuarios) as pool:
+            salidas = pool.map(_usuario_virtual, tareas)
+        segundos = time.perf_counter() - inicio
+
+        resultados = [r for lista, _ in salidas for r in lista]
+        completados = sum((c for _, c in salidas), Counter())
+        pasos = {}
+        for nombre in dict.fromkeys(r[0] for r in resultados):  # en orden de aparición
+            tiempos = [r[1] for r in resultados if r[0] == nombre]
+            errores = sum(r[2] for r in resultados if r[0] == nombre)
+            pasos[nombre] = {
+                'peticiones': len(tiempos),
+                'errores_pct': round(errores / len(tiempos) * 100, 2),
+                'p50_ms': round(percentil(tiempos, 50), 1),
+                'p95_ms': round(percentil(tiempos, 95), 1),
+                'p99_ms': round(percentil(tiempos, 99), 1),
+            }
+        etapa = {
+            'usuarios': usuarios,
+            'segundos': round(segundos, 2),
+            'peticiones_por_segundo': round(len(resultados) / segundos, 1),
+            'recorridos': dict(completados),
+            'pasos': pasos,
+        }
+
+        self.stdout.write(
+            f"\n{usuarios} users: {etapa['peticiones_por_segundo']} requests/s, journeys "
+            + ', '.join(f'{n}={c}' for n, c in sorted(completados.items()))
+        )
+        self.stdout.write(f"  {'step':<36} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for nombre, p in pasos.items():
+            linea = (
+                f"  {nombre:<36} {p['peticiones']:>8} {p['errores_pct']:>6.1f}% "
+                f"{p['p50_ms']:>8.1f} {p['p95_ms']:>8.1f} {p['p99_ms']:>8.1f}"
+            )
+            self.stdout.write(self.style.ERROR(linea) if p['errores_pct'] else linea)
+        return etapa
+
+    def _resumen(self, informe):
+        # Una línea por etapa: dónde empieza a degradarse el servidor
+        self.stdout.write(f"\n{'users':>5} {'req/s':>8} {'worst p95 ms':>13} {'worst p99 ms':>13} {'errors':>7}")
+        for etapa in informe:
+            pasos = etapa['pasos'].values()
+            peticiones = sum(p['peticiones'] for p in pasos)
+            errores = sum(p['errores_pct'] * p['peticiones'] / 100 for p in pasos)
+            self.stdout.write(
+                f"{etapa['usuarios']:>5} {etapa['peticiones_por_segundo']:>8.1f} "
+                f"{max(p['p95_ms'] for p in pasos):>13.1f} {max(p['p99_ms'] for p in pasos):>13.1f} "
+                f"{errores / max(peticiones, 1) * 100:>6.1f}%"
+            )
@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from citas.models import CambioCita
+
+class Command(BaseCommand):
+    help = 'Deletes scheduler change-log rows older than N days (clients with older cursors get a full board)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=7, help='Days of change log to keep (default: 7)')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        count, _ = CambioCita.objects.filter(registrado__lt=limite).delete()
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} change-log rows older than {limite:%Y-%m-%d %H:%M}.'))
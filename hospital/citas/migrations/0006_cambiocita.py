@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0005_remove_consultorio_descripcion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioCita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cita_id', models.BigIntegerField()),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('guardada', 'Guardada'), ('eliminada', 'Eliminada')], max_length=10)),
+                ('registrado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['fecha', 'id'], name='citas_cambi_fecha_589e1f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+# Garantía en la BD de que no hay dos citas solapadas del mismo médico ni del
+# mismo consultorio en una fecha. SQLite serializa las escrituras, así que la
+# verificación del trigger y la escritura son atómicas aunque varias réplicas
+# reserven a la vez. Las horas se guardan como texto 'HH:MM:SS', que se compara
+# correctamente como cadena.
+CONDICION_MEDICO = """
+    EXISTS (SELECT 1 FROM citas_cita c
+            WHERE c.medico_id = NEW.medico_id AND c.fecha = NEW.fecha
+              AND c.hora_inicio < NEW.hora_fin AND c.hora_fin > NEW.hora_inicio{excluir})
+"""
+CONDICION_CONSULTORIO = """
+    NEW.consultorio_id IS NOT NULL AND
+    EXISTS (SELECT 1 FROM citas_cita c
+            WHERE c.consultorio_id = NEW.consultorio_id AND c.fecha = NEW.fecha
+              AND c.hora_inicio < NEW.hora_fin AND c.hora_fin > NEW.hora_inicio{excluir})
+"""
+CUERPO = """
+BEGIN
+    SELECT RAISE(ABORT, 'cita_solapada_medico') WHERE {medico};
+    SELECT RAISE(ABORT, 'cita_solapada_consultorio') WHERE {consultorio};
+END;
+"""
+
+
+def _cuerpo(excluir=''):
+    return CUERPO.format(
+        medico=CONDICION_MEDICO.format(excluir=excluir),
+        consultorio=CONDICION_CONSULTORIO.format(excluir=excluir),
+    )
+
+
+TRIGGERS = [
+    "CREATE TRIGGER citas_cita_sin_solape_insert BEFORE INSERT ON citas_cita" + _cuerpo(),
+    "CREATE TRIGGER citas_cita_sin_solape_update "
+    "BEFORE UPDATE OF medico_id, consultorio_id, fecha, hora_inicio, hora_fin ON citas_cita"
+    + _cuerpo(excluir=' AND c.id <> NEW.id'),
+]
+
+
+def crear_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in TRIGGERS:
+        schema_editor.execute(sql)
+
+
+def borrar_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS citas_cita_sin_solape_insert")
+    schema_editor.execute("DROP TRIGGER IF EXISTS citas_cita_sin_solape_update")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0006_cambiocita'),
+        ('login', '0002_usuario_rol_alter_usuario_cedula_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['consultorio', 'fecha'], name='citas_cita_consult_1dbd3a_idx'),
+        ),
+        migrations.RunPython(crear_triggers, borrar_triggers),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0007_cita_sin_solapamiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Turno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('cita', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='turnos', to='citas.cita')),
+                ('especialidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='citas.especialidad')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='citas.medico')),
+            ],
+            options={
+                'ordering': ['fecha', 'hora_inicio'],
+                'indexes': [models.Index(condition=models.Q(('cita__isnull', True)), fields=['especialidad', 'fecha', 'hora_inicio'], name='citas_turno_libre_idx')],
+                'unique_together': {('medico', 'fecha', 'hora_inicio')},
+            },
+        ),
+    ]
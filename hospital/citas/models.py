@@ -7,6 +7,29 @@ from login.models import Usuario
 from .validators import validar_cedula_ecuador
 
 
+# ===== RASTREO DE CAMBIOS =====
+class RastreaCambios:
+    """
+    Recuerda los valores leídos de la BD para que las señales puedan saber
+    de dónde venía una fila (p. ej. la fecha anterior de una cita movida).
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Las señales post_save ya vieron el valor anterior; ahora el actual es el "original"
+        self._original = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields}
+
+    def valor_original(self, campo):
+        """Valor del campo (attname) tal como estaba en la BD, o None si la instancia es nueva."""
+        return getattr(self, '_original', {}).get(campo)
+
+
 # ===== ESPECIALIDADES =====
 class Especialidad(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
@@ -40,7 +63,7 @@ class Consultorio(models.Model):
 
 
 # ===== MÉDICOS =====
-class Medico(models.Model):
+class Medico(RastreaCambios, models.Model):
     TIPO_CHOICES = [
         ('interno', 'Médico Interno'),
         ('externo', 'Médico Externo'),
@@ -92,7 +115,7 @@ class Medico(models.Model):
 
 
 # ===== HORARIOS =====
-class Horario(models.Model):
+class Horario(RastreaCambios, models.Model):
     DIA_CHOICES = [
         (0, 'Lunes'),
         (1, 'Martes'),
@@ -121,7 +144,7 @@ class Horario(models.Model):
 
 
 # ===== CITAS =====
-class Cita(models.Model):
+class Cita(RastreaCambios, models.Model):
     paciente = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='citas')
     medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='citas')
     consultorio = models.ForeignKey(Consultorio, on_delete=models.SET_NULL, null=True, blank=True)
@@ -138,6 +161,7 @@ class Cita(models.Model):
         indexes = [
             models.Index(fields=['medico', 'fecha']),
             models.Index(fields=['paciente', 'fecha']),
+            models.Index(fields=['consultorio', 'fecha']),
         ]
 
     def clean(self):
@@ -216,5 +240,80 @@ class Cita(models.Model):
             if self.consultorio.tipo != 'externo':
                 raise ValidationError("Médico externo requiere consultorio tipo Externo.")
 
+    @staticmethod
+    def mensaje_integridad(error):
+        """
+        Traduce el IntegrityError de los triggers de no-solapamiento (migración
+        0007) o de turnos.reclamar_turnos a un mensaje para el usuario. Llega
+        cuando otra reserva ganó la carrera entre la validación y la escritura.
+        """
+        texto = str(error)
+        if 'cita_solapada_medico' in texto or 'UNIQUE' in texto:
+            return "El médico acaba de ocupar ese horario con otra cita. Elija otro horario."
+        if 'cita_solapada_consultorio' in texto:
+            return "El consultorio acaba de ocuparse en ese horario. Elija otro horario."
+        if 'turno_no_disponible' in texto:
+            return "Ese turno ya no está disponible. Elija otro horario."
+        return "No se pudo guardar la cita por un conflicto de datos."
+
     def __str__(self):
         return f"#{self.id} {self.paciente.nombres} ({self.fecha} {self.hora_inicio})"
+
+
+# ===== CAMBIOS DE CITAS (sincronización incremental del tablero) =====
+class CambioCita(models.Model):
+    """
+    Registro append-only de citas guardadas o eliminadas por fecha.
+    Su id es el cursor `since` de /api/scheduler/. No usa FK a Cita para
+    sobrevivir al borrado de la cita.
+    """
+    TIPO_CHOICES = [
+        ('guardada', 'Guardada'),
+        ('eliminada', 'Eliminada'),
+    ]
+
+    cita_id = models.BigIntegerField()
+    fecha = models.DateField()
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    registrado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['fecha', 'id']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} cita {self.cita_id} {self.tipo} ({self.fecha})"
+
+
+# ===== INVENTARIO DE TURNOS (búsqueda y reserva por fila) =====
+class Turno(models.Model):
+    """
+    Hueco de agenda precalculado desde Horario y Especialidad.duracion_cita
+    para los próximos TURNOS_HORIZONTE_DIAS días (services/turnos.py).
+    Un turno está libre mientras `cita` es NULL; reservar es un UPDATE
+    condicionado a que siga libre. Borrar la cita lo libera (SET_NULL).
+    """
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='turnos')
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.CASCADE, related_name='turnos')  # Desnormalización
+    fecha = models.DateField()
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    cita = models.ForeignKey(Cita, on_delete=models.SET_NULL, null=True, blank=True, related_name='turnos')
+
+    class Meta:
+        unique_together = ('medico', 'fecha', 'hora_inicio')
+        ordering = ['fecha', 'hora_inicio']
+        indexes = [
+            # Primer turno libre de una especialidad en una fecha
+            models.Index(
+                fields=['especialidad', 'fecha', 'hora_inicio'],
+                condition=Q(cita__isnull=True),
+                name='citas_turno_libre_idx',
+            ),
+        ]
+
+    def __str__(self):
+        estado = f"cita #{self.cita_id}" if self.cita_id else "libre"
+        return f"{self.medico} {self.fecha} {self.hora_inicio}-{self.hora_fin} ({estado})"
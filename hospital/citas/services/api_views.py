@@ -2,10 +2,20 @@ from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import Q
-from datetime import datetime, date
-from citas.models import Cita, Consultorio, Horario
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Prefetch
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, JsonResponse
+from django.utils import timezone
+from django.views import View
+from datetime import datetime, date, timedelta
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from citas.models import Cita, Consultorio, Horario, Especialidad, CambioCita
+from citas.services import cache_disponibilidad, turnos
+from citas.services.broker import obtener_broker
+from citas.services.reprogramacion import ReprogramacionLote
 from citas.services.serializers import *
 
 
@@ -19,27 +29,198 @@ class SchedulerDataView(APIView):
             fecha_str = fecha_str.split('?')[0].split('&')[0]
             fecha_obj = datetime.strptime(fecha_str,'%Y-%m-%d').date()
 
-        # 1. Consultorios (con citas anidadas)
-        consultorios = Consultorio.objects.all().order_by('numero')
+        # 0. Cursor ANTES de leer: un cambio concurrente se reenvía, nunca se pierde
+        cursor = CambioCita.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({'error': 'Cursor since inválido.'}, status=400)
+            if self.delta_disponible(since, cursor):
+                return Response(self.delta(fecha_obj, since, cursor))
+            # Cursor fuera del registro (purgado o de otra BD): se envía el tablero completo
+
+        # 1. Consultorios (con citas del día precargadas en una sola consulta)
+        citas_del_dia = Cita.objects.filter(fecha=fecha_obj).select_related(
+            'medico__usuario', 'paciente', 'especialidad'
+        )
+        consultorios = Consultorio.objects.all().order_by('numero').prefetch_related(
+            Prefetch('cita_set', queryset=citas_del_dia, to_attr='citas_del_dia')
+        )
         consultorios_serializer = ConsultorioSchedulerSerializer(
             consultorios, many=True, context={'fecha': fecha_str}
         )
 
         # 2. Horarios de Médicos
         dia_semana_num = fecha_obj.weekday()
-        horarios = Horario.objects.filter(dia_semana=dia_semana_num)
+        horarios = Horario.objects.filter(dia_semana=dia_semana_num).select_related('medico__usuario')
         horarios_serializer = HorarioMedicoSerializer(horarios, many=True)
 
         # 3. DETECCIÓN DE HUÉRFANOS (Citas invisibles)
-        huerfanos = Cita.objects.filter(fecha=fecha_str, consultorio__isnull=True)
+        huerfanos = citas_del_dia.filter(consultorio__isnull=True)
         huerfanos_data = CitaSchedulerSerializer(huerfanos, many=True).data
 
         return Response({
+            'delta': False,
+            'cursor': cursor,
             'consultorios': consultorios_serializer.data,
             'horarios_disponibles': horarios_serializer.data,
             'huerfanos': huerfanos_data
         })
 
+    def delta_disponible(self, since, cursor):
+        if since > cursor:
+            return False
+        primero = CambioCita.objects.order_by('id').values_list('id', flat=True).first()
+        # Si se purgaron cambios posteriores a `since`, el delta estaría incompleto
+        return primero is None or since >= primero - 1
+
+    def delta(self, fecha_obj, since, cursor):
+        # Último tipo de cambio por cita (el registro viene ordenado por id)
+        ultimo_cambio = dict(
+            CambioCita.objects.filter(fecha=fecha_obj, id__gt=since, id__lte=cursor)
+            .values_list('cita_id', 'tipo')
+        )
+
+        guardadas = [cita_id for cita_id, tipo in ultimo_cambio.items() if tipo == 'guardada']
+        citas = Cita.objects.filter(pk__in=guardadas, fecha=fecha_obj).select_related(
+            'medico__usuario', 'paciente', 'especialidad'
+        )
+        citas_data = CitaSchedulerSerializer(citas, many=True).data
+
+        enviadas = {c['id'] for c in citas_data}
+        return {
+            'delta': True,
+            'cursor': cursor,
+            'citas': citas_data,
+            'eliminadas': [cita_id for cita_id in ultimo_cambio if cita_id not in enviadas],
+        }
+
+class SchedulerStreamView(View):
+    """
+    Canal SSE (text/event-stream) con los cambios de citas de una fecha.
+    Cada evento `cambio` lleva como id el cursor del registro de cambios; el
+    tablero responde pidiendo el delta (/api/scheduler/?since=). Solo puede
+    servirse desde el ASGI (hospital.asgi): bajo WSGI cada conexión ocuparía
+    un worker.
+    """
+    KEEPALIVE = 15  # segundos entre comentarios ": ping" para proxies
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'error': 'El canal en tiempo real requiere el servidor ASGI.'}, status=501)
+
+        fecha_str = request.GET.get('fecha') or date.today().isoformat()
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'error': 'Formato de fecha inválido (YYYY-MM-DD).'}, status=400)
+
+        response = StreamingHttpResponse(self.eventos(fecha.isoformat()), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def eventos(self, fecha):
+        # El cliente reconecta solo; al desconectarse Django cancela este generador
+        with obtener_broker().suscribir(fecha) as cola:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), self.KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f"id: {evento['cursor']}\nevent: cambio\ndata: {json.dumps(evento)}\n\n"
+
+class DisponibilidadView(APIView):
+    """
+    Lista todos los huecos libres de una especialidad entre `desde` y `hasta`.
+
+    La respuesta se envía en streaming como NDJSON (un hueco por línea) a medida
+    que se calcula cada día, así un rango largo nunca vive completo en memoria:
+    en memoria hay a lo sumo las líneas de un día.
+    """
+    MAX_DIAS = 62
+
+    def get(self, request):
+        especialidad_id = request.query_params.get('especialidad')
+        desde_str = request.query_params.get('desde')
+        hasta_str = request.query_params.get('hasta') or desde_str
+
+        if not (especialidad_id and desde_str):
+            return Response({'error': 'Parámetros requeridos: especialidad, desde.'}, status=400)
+
+        try:
+            desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+            hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'Formato de fecha inválido (YYYY-MM-DD).'}, status=400)
+
+        if hasta < desde:
+            return Response({'error': 'La fecha hasta debe ser posterior a desde.'}, status=400)
+        if (hasta - desde).days >= self.MAX_DIAS:
+            return Response({'error': f'El rango máximo es de {self.MAX_DIAS} días.'}, status=400)
+
+        try:
+            especialidad = Especialidad.objects.get(pk=especialidad_id)
+        except (Especialidad.DoesNotExist, ValueError):
+            return Response({'error': 'La especialidad no existe.'}, status=404)
+
+        # No se ofrecen días pasados
+        desde = max(desde, timezone.localdate())
+
+        # Bajo ASGI Django lee un iterador síncrono entero antes de enviar nada
+        # (sync_to_async(list)); el generador asíncrono envía cada día al calcularlo
+        if isinstance(request._request, ASGIRequest):
+            huecos = self.generar_huecos_async(especialidad, desde, hasta)
+        else:
+            huecos = self.generar_huecos(especialidad, desde, hasta)
+        response = StreamingHttpResponse(huecos, content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def generar_huecos(self, especialidad, desde, hasta):
+        fecha = desde
+        while fecha <= hasta:
+            yield from self.lineas_del_dia(especialidad, fecha)
+            fecha += timedelta(days=1)
+
+    async def generar_huecos_async(self, especialidad, desde, hasta):
+        lineas_del_dia = sync_to_async(self.lineas_del_dia)
+        fecha = desde
+        while fecha <= hasta:
+            for linea in await lineas_del_dia(especialidad, fecha):
+                yield linea
+            fecha += timedelta(days=1)
+
+    def lineas_del_dia(self, especialidad, fecha):
+        # Una pasada por día: carga fija del día y recorrido en memoria
+        agenda = cache_disponibilidad.obtener_agenda(fecha, especialidad)
+        return [
+            json.dumps({
+                'fecha': fecha.isoformat(),
+                'id_medico': medico.id,
+                'nombre_medico': medico.nombre_completo(),
+                'id_consultorio': consultorio.id,
+                'numero_consultorio': consultorio.numero,
+                'hora_inicio': hora_inicio.strftime('%H:%M'),
+                'hora_fin': hora_fin.strftime('%H:%M'),
+            }) + '\n'
+            for medico, consultorio, hora_inicio, hora_fin in agenda.huecos()
+        ]
+
+class DisponibilidadCacheView(APIView):
+    """
+    Contadores del proceso que atiende la petición. Dentro de TURNOS_HORIZONTE_DIAS
+    la búsqueda lee el inventario de turnos y no pasa por la caché: aciertos y
+    fallos solo describen las fechas fuera del horizonte ("turnos.respaldo").
+    """
+    def get(self, request):
+        return Response({**cache_disponibilidad.estadisticas(), 'turnos': turnos.estadisticas()})
+
 class ReprogramarCitaView(APIView):
     def put(self, request, pk):
         try:
@@ -64,13 +245,53 @@ class ReprogramarCitaView(APIView):
                 # Ejecutar limpieza y validaciones
                 cita.full_clean()
                 cita.save()
+                turnos.reclamar_turnos(cita)
 
             return Response({'status': 'ok', 'mensaje': 'Éxito'})
 
         except ValidationError as e:
             msg = ". ".join(sum(e.message_dict.values(), [])) if hasattr(e, 'message_dict') else str(e)
             return Response({'error': msg}, status=400)
+        except IntegrityError as e:
+            # Otra escritura ganó la carrera: el trigger de la BD rechazó el solape
+            return Response({'error': Cita.mensaje_integridad(e)}, status=409)
         except Cita.DoesNotExist:
             return Response({'error': 'La cita no existe en la DB.'}, status=404)
         except Exception as e:
             return Response({'error': f"Error fatal: {str(e)}"}, status=500)
+
+class ReprogramarLoteView(APIView):
+    """
+    Mueve varias citas a la vez: {"movimientos": [{"id", "consultorio_id", "fecha",
+    "hora_inicio", "hora_fin"}, ...]}. Todo el lote se valida contra una sola foto
+    del día (incluidos choques entre movimientos del mismo lote) y se guarda en
+    una transacción: o se aplican todos o ninguno. Se admiten intercambios
+    (la cita A va al lugar de B y B al de A) y ciclos más largos.
+    Respuestas: 200 aplicado; 400 con "errores" [{id, error}] por cita inválida;
+    404 si falta una cita; 409 si otra escritura ocupó un destino mientras tanto.
+    """
+    MAX_MOVIMIENTOS = 200
+
+    def post(self, request):
+        movimientos = request.data.get('movimientos')
+        if not isinstance(movimientos, list) or not movimientos:
+            return Response({'error': 'Se requiere una lista "movimientos".'}, status=400)
+        if len(movimientos) > self.MAX_MOVIMIENTOS:
+            return Response({'error': f'Máximo {self.MAX_MOVIMIENTOS} movimientos por lote.'}, status=400)
+        if not all(isinstance(m, dict) and m.get('id') for m in movimientos):
+            return Response({'error': 'Cada movimiento requiere el id de la cita.'}, status=400)
+
+        lote = ReprogramacionLote(movimientos)
+        try:
+            citas = lote.ejecutar()
+            return Response({'status': 'ok', 'mensaje': f'{len(citas)} citas reprogramadas.'})
+
+        except ValidationError as e:
+            errores = [{'id': cita_id, 'error': mensaje} for cita_id, mensaje in lote.errores]
+            return Response({'error': " ".join(e.messages), 'errores': errores}, status=400)
+        except IntegrityError as e:
+            return Response({'error': Cita.mensaje_integridad(e)}, status=409)
+        except Cita.DoesNotExist as e:
+            return Response({'error': str(e)}, status=404)
+        except (ValueError, TypeError) as e:
+            return Response({'error': f"Datos inválidos: {str(e)}"}, status=400)
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils.module_loading import import_string
+
+# Reparto de eventos de citas (guardada/eliminada) a los tableros suscritos por
+# fecha. Un evento es un dict: {'cursor', 'cita_id', 'tipo', 'fecha'}; el cursor
+# es el id de CambioCita, el mismo que entiende /api/scheduler/?since=.
+
+
+class BrokerMemoria:
+    """
+    Reparte dentro del proceso. `publicar` puede llamarse desde código síncrono
+    (señales, hilos de vistas) y entrega en el loop de cada suscriptor.
+    Sirve con una sola réplica; con varias, cada pod solo ve sus propios cambios.
+    """
+
+    def __init__(self):
+        self._suscriptores = {}  # fecha iso -> {(loop, cola), ...}
+        self._lock = threading.Lock()
+
+    def publicar(self, evento):
+        self._repartir(evento)
+
+    def _repartir(self, evento):
+        with self._lock:
+            destinos = list(self._suscriptores.get(evento['fecha'], ()))
+        for loop, cola in destinos:
+            loop.call_soon_threadsafe(cola.put_nowait, evento)
+
+    def _hay_suscriptores(self):
+        with self._lock:
+            return bool(self._suscriptores)
+
+    @contextmanager
+    def suscribir(self, fecha):
+        """Uso: `with broker.suscribir(fecha) as cola: evento = await cola.get()`."""
+        suscripcion = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._suscriptores.setdefault(fecha, set()).add(suscripcion)
+        self._al_suscribir()
+        try:
+            yield suscripcion[1]
+        finally:
+            with self._lock:
+                suscritos = self._suscriptores.get(fecha, set())
+                suscritos.discard(suscripcion)
+                if not suscritos:
+                    self._suscriptores.pop(fecha, None)
+
+    def _al_suscribir(self):
+        pass
+
+
+class BrokerRegistroCambios(BrokerMemoria):
+    """
+    Reparte entre réplicas usando el registro CambioCita de la BD compartida:
+    una sola tarea por proceso lo consulta cada `SCHEDULER_BROKER_INTERVALO`
+    segundos (solo mientras haya tableros conectados) y reparte localmente.
+    El costo es una consulta por intervalo y por proceso, no por pestaña.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.intervalo = getattr(settings, 'SCHEDULER_BROKER_INTERVALO', 1.0)
+        self._tarea = None
+
+    def publicar(self, evento):
+        # Los cambios llegan por el registro, incluidos los de este mismo proceso
+        pass
+
+    def _al_suscribir(self):
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._vigilar())
+
+    async def _vigilar(self):
+        from citas.models import CambioCita
+
+        def ultimo_cursor():
+            return CambioCita.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        def cambios_desde(cursor):
+            return list(
+                CambioCita.objects.filter(id__gt=cursor).order_by('id')
+                .values_list('id', 'cita_id', 'tipo', 'fecha')
+            )
+
+        cursor = await sync_to_async(ultimo_cursor)()
+        while self._hay_suscriptores():
+            await asyncio.sleep(self.intervalo)
+            try:
+                cambios = await sync_to_async(cambios_desde)(cursor)
+            except DatabaseError:
+                continue  # BD bloqueada u ocupada: se reintenta en el siguiente intervalo
+            for cambio_id, cita_id, tipo, fecha in cambios:
+                cursor = cambio_id
+                self._repartir({'cursor': cambio_id, 'cita_id': cita_id, 'tipo': tipo, 'fecha': fecha.isoformat()})
+
+
+_broker = None
+
+
+def obtener_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.SCHEDULER_BROKER)()
+    return _broker
@@ -0,0 +1,98 @@
+import time
+from datetime import date
+from django.core.cache import caches
+from .disponibilidad import AgendaDia
+from .interfaces import ICitaService
+
+# Cada entrada (especialidad, fecha) guarda la "generación" de los datos con los
+# que se calculó. Invalidar es cambiar una generación: las entradas viejas dejan
+# de coincidir y la siguiente lectura recarga. Así se puede invalidar por
+# especialidad, por fecha o por día de la semana sin recorrer las claves.
+ALIAS_CACHE = 'disponibilidad'
+
+_estadisticas = {'aciertos': 0, 'fallos': 0, 'invalidaciones': 0}
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _como_fecha(fecha):
+    # Las vistas a veces asignan la fecha como texto 'YYYY-MM-DD'
+    if isinstance(fecha, str):
+        return date.fromisoformat(fecha)
+    return fecha
+
+
+def _clave_entrada(especialidad_id, fecha):
+    return f'disp:{especialidad_id}:{fecha.isoformat()}'
+
+
+def _claves_generacion(especialidad_id, fecha):
+    return [
+        'gen',
+        f'gen:esp:{especialidad_id}',
+        f'gen:fecha:{fecha.isoformat()}',
+        f'gen:esp:{especialidad_id}:dia:{fecha.weekday()}',
+        f'gen:esp:{especialidad_id}:fecha:{fecha.isoformat()}',
+    ]
+
+
+def obtener_agenda(fecha, especialidad):
+    """AgendaDia de la cache si sigue vigente; si no, la carga y la guarda."""
+    fecha = _como_fecha(fecha)
+    clave = _clave_entrada(especialidad.id, fecha)
+    claves_gen = _claves_generacion(especialidad.id, fecha)
+
+    valores = _cache().get_many([clave] + claves_gen)
+    generacion = tuple(valores.get(k) for k in claves_gen)
+
+    entrada = valores.get(clave)
+    if entrada is not None and entrada[0] == generacion:
+        _estadisticas['aciertos'] += 1
+        return entrada[1]
+
+    _estadisticas['fallos'] += 1
+    agenda = AgendaDia.cargar(fecha, especialidad)
+    _cache().set(clave, (generacion, agenda))
+    return agenda
+
+
+def _renovar(*claves):
+    # Valor nuevo (no incremental): si la clave fue desalojada no puede "volver" a un valor viejo
+    _estadisticas['invalidaciones'] += 1
+    _cache().set_many({clave: time.time_ns() for clave in claves}, timeout=None)
+
+
+def invalidar_todo():
+    _renovar('gen')
+
+
+def invalidar_especialidad(especialidad_id):
+    _renovar(f'gen:esp:{especialidad_id}')
+
+
+def invalidar_fecha(fecha):
+    _renovar(f'gen:fecha:{_como_fecha(fecha).isoformat()}')
+
+
+def invalidar_dia_semana(especialidad_id, dia_semana):
+    _renovar(f'gen:esp:{especialidad_id}:dia:{dia_semana}')
+
+
+def invalidar_especialidad_fecha(especialidad_id, fecha):
+    _renovar(f'gen:esp:{especialidad_id}:fecha:{_como_fecha(fecha).isoformat()}')
+
+
+def estadisticas():
+    total = _estadisticas['aciertos'] + _estadisticas['fallos']
+    return {
+        **_estadisticas,
+        'tasa_aciertos': round(_estadisticas['aciertos'] / total, 4) if total else None,
+    }
+
+
+class CitaServiceCacheado(ICitaService):
+
+    def buscar_disponibilidad(self, fecha, especialidad):
+        return obtener_agenda(fecha, especialidad).primer_hueco()
@@ -0,0 +1,113 @@
+from datetime import time
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Cita, Horario, Medico, Consultorio
+
+
+def a_minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def a_hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def hay_solape(inicio, fin, ocupados):
+    for ocupado_ini, ocupado_fin in ocupados:
+        if inicio < ocupado_fin and fin > ocupado_ini:
+            return True
+    return False
+
+
+class AgendaDia:
+    """
+    Foto en memoria de todo lo que decide la disponibilidad de una
+    especialidad en una fecha: médicos, horarios, citas de esos médicos y
+    ocupación de los consultorios externos.
+
+    `cargar` siempre ejecuta 4 consultas, sin importar cuántos médicos o
+    consultorios existan; la búsqueda de huecos se resuelve en memoria.
+    Los intervalos se guardan en minutos desde medianoche.
+    """
+
+    def __init__(self, fecha, especialidad, medicos, horarios, citas_medico, externos, citas_consultorio):
+        self.fecha = fecha
+        self.especialidad = especialidad
+        self.medicos = medicos
+        self.horarios = horarios                    # medico_id -> [(ini, fin), ...]
+        self.citas_medico = citas_medico            # medico_id -> [(ini, fin), ...]
+        self.externos = externos                    # [Consultorio externo, ...] por número
+        self.citas_consultorio = citas_consultorio  # consultorio_id -> [(ini, fin), ...]
+
+    @classmethod
+    def cargar(cls, fecha, especialidad):
+        # 1) Médicos de la especialidad (orden del modelo: por nombre)
+        medicos = list(
+            Medico.objects.filter(especialidad=especialidad).select_related('usuario', 'consultorio')
+        )
+        ids_medicos = [m.id for m in medicos]
+
+        # 2) Horarios de esos médicos para el día de la semana
+        horarios = {}
+        for medico_id, h_ini, h_fin in Horario.objects.filter(
+            medico_id__in=ids_medicos, dia_semana=fecha.weekday()
+        ).order_by('hora_inicio').values_list('medico_id', 'hora_inicio', 'hora_fin'):
+            horarios.setdefault(medico_id, []).append((a_minutos(h_ini), a_minutos(h_fin)))
+
+        # 3) Consultorios externos (compartidos por todos los médicos externos)
+        externos = list(Consultorio.objects.filter(tipo='externo').order_by('numero'))
+        ids_externos = [c.id for c in externos]
+
+        # 4) Citas del día que bloquean: de los médicos o en consultorios externos
+        citas_medico, citas_consultorio = {}, {}
+        for medico_id, consultorio_id, c_ini, c_fin in Cita.objects.filter(fecha=fecha).filter(
+            Q(medico_id__in=ids_medicos) | Q(consultorio_id__in=ids_externos)
+        ).values_list('medico_id', 'consultorio_id', 'hora_inicio', 'hora_fin'):
+            intervalo = (a_minutos(c_ini), a_minutos(c_fin))
+            citas_medico.setdefault(medico_id, []).append(intervalo)
+            if consultorio_id is not None:
+                citas_consultorio.setdefault(consultorio_id, []).append(intervalo)
+
+        return cls(fecha, especialidad, medicos, horarios, citas_medico, externos, citas_consultorio)
+
+    def consultorio_libre(self, medico, inicio, fin):
+        if medico.tipo != 'externo':
+            return medico.consultorio
+
+        for consultorio in self.externos:
+            if not hay_solape(inicio, fin, self.citas_consultorio.get(consultorio.id, ())):
+                return consultorio
+        return None
+
+    def huecos(self):
+        """
+        Genera todos los huecos libres como (medico, consultorio, hora_inicio, hora_fin),
+        en el mismo orden en que los recorre la búsqueda del primer hueco.
+        """
+        duracion = self.especialidad.duracion_cita
+
+        # Hoy no se ofrecen huecos que ya empezaron
+        minimo = 0
+        if self.fecha == timezone.localdate():
+            ahora = timezone.localtime().time()
+            minimo = a_minutos(ahora) + (1 if ahora.second or ahora.microsecond else 0)
+
+        for medico in self.medicos:
+            ocupados = self.citas_medico.get(medico.id, ())
+            for h_ini, h_fin in self.horarios.get(medico.id, ()):
+                inicio = h_ini
+                while inicio < minimo:
+                    inicio += duracion
+
+                while inicio + duracion <= h_fin:
+                    fin = inicio + duracion
+                    if not hay_solape(inicio, fin, ocupados):
+                        consultorio = self.consultorio_libre(medico, inicio, fin)
+                        if consultorio:
+                            yield medico, consultorio, a_hora(inicio), a_hora(fin)
+                    inicio = fin
+
+    def primer_hueco(self):
+        for medico, consultorio, hora_inicio, hora_fin in self.huecos():
+            return medico, hora_inicio, hora_fin, consultorio
+        return None
@@ -1,4 +1,4 @@
-from .cita_service import CitaService
+from .turnos import CitaServiceTurnos
 
 def get_cita_service():
-    return CitaService()
\ No newline at end of file
+    return CitaServiceTurnos()
\ No newline at end of file
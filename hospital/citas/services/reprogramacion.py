@@ -0,0 +1,226 @@
+from datetime import datetime, date, time
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from ..models import Cita, Consultorio, Horario, Turno
+from . import turnos
+from .disponibilidad import a_minutos
+
+
+def _hhmm(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def _se_solapan(a, b):
+    return a[0] < b[1] and a[1] > b[0]
+
+
+class ReprogramacionLote:
+    """
+    Valida y aplica varios movimientos de citas contra UNA foto de los días
+    afectados (consultas fijas, sin importar cuántos movimientos haya).
+
+    Aplica las mismas reglas que Cita.clean, pero sobre el estado final del
+    lote: una cita movida choca con las que se quedan y con las demás movidas
+    en su nueva posición, nunca con su propia posición anterior.
+
+    Cada movimiento: {'id', 'consultorio_id'?, 'fecha'?, 'hora_inicio'?, 'hora_fin'?}
+    con la misma semántica que ReprogramarCitaView (lo que no viene, no cambia).
+    Las citas que intercambian posiciones entre sí se aplican igual (ver _estacionar).
+    """
+
+    def __init__(self, movimientos):
+        self.movimientos = movimientos
+        self.errores = []  # [(cita_id, mensaje), ...]
+
+    def ejecutar(self):
+        """Valida y guarda en una sola transacción. Lanza ValidationError o Cita.DoesNotExist."""
+        with transaction.atomic():
+            citas = self._cargar_citas()
+            self._cargar_foto(citas)
+            self._validar(citas)
+            if self.errores:
+                raise ValidationError([f"Cita #{cita_id}: {mensaje}" for cita_id, mensaje in self.errores])
+
+            orden, ciclos = self._orden_seguro(citas)
+            for cita in orden:
+                cita.save(update_fields=['consultorio', 'fecha', 'hora_inicio', 'hora_fin'])
+            self._estacionar(ciclos)
+            for cita in ciclos:
+                cita.save(update_fields=['consultorio', 'fecha', 'hora_inicio', 'hora_fin'])
+
+            # Turnos: se sueltan todos antes de reservar (una cita puede ir al turno de otra del lote)
+            Turno.objects.filter(cita__in=citas).update(cita=None)
+            for cita in citas:
+                turnos.reclamar_turnos(cita, liberar=False)
+        return citas
+
+    # ----- carga -----
+    def _cargar_citas(self):
+        ids = [int(m['id']) for m in self.movimientos]
+        if len(set(ids)) != len(ids):
+            raise ValidationError("Una cita aparece más de una vez en el lote.")
+
+        citas = Cita.objects.select_related(
+            'medico__usuario', 'medico__especialidad', 'especialidad'
+        ).in_bulk(ids)
+        faltantes = [i for i in ids if i not in citas]
+        if faltantes:
+            raise Cita.DoesNotExist(f"No existen las citas: {', '.join(map(str, faltantes))}.")
+
+        resultado = []
+        for mov in self.movimientos:
+            cita = citas[int(mov['id'])]
+            # Posición de partida, para ordenar la escritura
+            cita._desde = (cita.fecha, a_minutos(cita.hora_inicio), a_minutos(cita.hora_fin), cita.consultorio_id)
+
+            if mov.get('consultorio_id'):
+                cita.consultorio_id = int(mov['consultorio_id'])
+            if mov.get('fecha'):
+                cita.fecha = date.fromisoformat(str(mov['fecha']))
+            if mov.get('hora_inicio'):
+                cita.hora_inicio = datetime.strptime(mov['hora_inicio'][:5], "%H:%M").time()
+            if mov.get('hora_fin'):
+                cita.hora_fin = datetime.strptime(mov['hora_fin'][:5], "%H:%M").time()
+            resultado.append(cita)
+        return resultado
+
+    def _cargar_foto(self, citas):
+        ids_movidas = [c.pk for c in citas]
+        fechas = {c.fecha for c in citas}
+        medicos = {c.medico_id for c in citas}
+        consultorios = {c.consultorio_id for c in citas} - {None}
+
+        # 1) Citas que se quedan en los días afectados (de esos médicos o consultorios)
+        self.fijas = list(
+            Cita.objects.filter(fecha__in=fechas)
+            .filter(Q(medico_id__in=medicos) | Q(consultorio_id__in=consultorios))
+            .exclude(pk__in=ids_movidas)
+            .values_list('pk', 'medico_id', 'consultorio_id', 'fecha', 'hora_inicio', 'hora_fin',
+                         'medico__usuario__nombres')
+        )
+
+        # 2) Horarios de los médicos
+        self.horarios = {
+            (h.medico_id, h.dia_semana): h
+            for h in Horario.objects.filter(medico_id__in=medicos)
+        }
+
+        # 3) Consultorios destino y consultorios fijos de los médicos internos
+        self.consultorios = Consultorio.objects.in_bulk(
+            consultorios | {c.medico.consultorio_id for c in citas if c.medico.consultorio_id}
+        )
+
+    # ----- validación (mismas reglas y mensajes que Cita.clean) -----
+    def _validar(self, citas):
+        ocupacion = [
+            (pk, medico_id, consultorio_id, fecha, (a_minutos(h_ini), a_minutos(h_fin)), nombres)
+            for pk, medico_id, consultorio_id, fecha, h_ini, h_fin, nombres in self.fijas
+        ] + [
+            (c.pk, c.medico_id, c.consultorio_id, c.fecha, (a_minutos(c.hora_inicio), a_minutos(c.hora_fin)),
+             c.medico.usuario.nombres)
+            for c in citas
+        ]
+
+        for cita in citas:
+            try:
+                self._validar_cita(cita, ocupacion)
+            except ValidationError as e:
+                self.errores.extend((cita.pk, mensaje) for mensaje in e.messages)
+
+    def _validar_cita(self, cita, ocupacion):
+        # 0) Normalización de precisión
+        cita.hora_inicio = cita.hora_inicio.replace(second=0, microsecond=0)
+        cita.hora_fin = cita.hora_fin.replace(second=0, microsecond=0)
+        intervalo = (a_minutos(cita.hora_inicio), a_minutos(cita.hora_fin))
+
+        # 1) hora_fin > hora_inicio
+        if intervalo[1] <= intervalo[0]:
+            raise ValidationError("La hora de fin debe ser posterior a la hora de inicio.")
+
+        # 2) Consultorio obligatorio y existente
+        consultorio = self.consultorios.get(cita.consultorio_id)
+        if consultorio is None:
+            raise ValidationError("No se puede agendar sin un consultorio asignado. Contacte a soporte.")
+
+        # 3) Duración de la especialidad
+        especialidad = cita.especialidad or cita.medico.especialidad
+        dur_min = intervalo[1] - intervalo[0]
+        if dur_min != especialidad.duracion_cita:
+            raise ValidationError(f"Duración incorrecta: {dur_min} min. Debe ser {especialidad.duracion_cita} min.")
+
+        # 4) Solapamiento del médico y 4.1) del consultorio (fijas + resto del lote)
+        choques = [
+            (pk, medico_id, consultorio_id, otro, nombres)
+            for pk, medico_id, consultorio_id, fecha, otro, nombres in ocupacion
+            if pk != cita.pk and fecha == cita.fecha and _se_solapan(intervalo, otro)
+        ]
+        for pk, medico_id, consultorio_id, otro, nombres in choques:
+            if medico_id == cita.medico_id:
+                raise ValidationError(
+                    f"El médico ya tiene la cita #{pk} en el horario {_hhmm(otro[0])}-{_hhmm(otro[1])}."
+                )
+        for pk, medico_id, consultorio_id, otro, nombres in choques:
+            if consultorio_id == cita.consultorio_id:
+                raise ValidationError(
+                    f"Consultorio {consultorio.numero} ocupado por {nombres} "
+                    f"en el rango {_hhmm(otro[0])}-{_hhmm(otro[1])}."
+                )
+
+        # 5) Horario del médico
+        horario = self.horarios.get((cita.medico_id, cita.fecha.weekday()))
+        if not horario:
+            raise ValidationError(f"El médico no atiende los {cita.fecha.strftime('%A')}.")
+        if not (horario.hora_inicio <= cita.hora_inicio and cita.hora_fin <= horario.hora_fin):
+            h1, h2 = horario.hora_inicio.strftime('%H:%M'), horario.hora_fin.strftime('%H:%M')
+            raise ValidationError(f"Fuera de rango laboral ({h1} a {h2}).")
+
+        # 6) Interno / Externo
+        if cita.medico.tipo == 'interno':
+            if cita.consultorio_id != cita.medico.consultorio_id:
+                raise ValidationError(
+                    f"Médico interno restringido a consultorio {self.consultorios.get(cita.medico.consultorio_id)}."
+                )
+        elif consultorio.tipo != 'externo':
+            raise ValidationError("Médico externo requiere consultorio tipo Externo.")
+
+    # ----- escritura -----
+    def _orden_seguro(self, citas):
+        """
+        Orden de guardado en el que ningún paso intermedio choca: una cita se
+        escribe cuando su destino ya no lo ocupa ninguna cita pendiente en su
+        posición de partida. Devuelve (orden, ciclos): `ciclos` son las que no
+        tienen orden posible (p. ej. dos citas que intercambian posiciones, o
+        las que esperan a una de ellas) y se escriben después de estacionarlas.
+        """
+        pendientes = list(citas)
+        orden = []
+        while pendientes:
+            for cita in pendientes:
+                destino = (a_minutos(cita.hora_inicio), a_minutos(cita.hora_fin))
+                bloqueada = any(
+                    otra is not cita
+                    and otra._desde[0] == cita.fecha
+                    and (otra.medico_id == cita.medico_id or otra._desde[3] == cita.consultorio_id)
+                    and _se_solapan(destino, otra._desde[1:3])
+                    for otra in pendientes
+                )
+                if not bloqueada:
+                    orden.append(cita)
+                    pendientes.remove(cita)
+                    break
+            else:
+                break
+        return orden, pendientes
+
+    def _estacionar(self, citas):
+        """
+        Saca las citas de un ciclo de sus posiciones de partida: cada una pasa a
+        un intervalo vacío de madrugada (00:00:01, 00:00:02, ...), que los
+        triggers de solapamiento no ven chocar con nada y que no repite
+        (medico, fecha, hora_inicio). Es un UPDATE sin señales; el save()
+        siguiente deja la posición final y avisa el cambio desde la de partida.
+        """
+        for n, cita in enumerate(citas, start=1):
+            hora = time(0, n // 60, n % 60)
+            Cita.objects.filter(pk=cita.pk).update(hora_inicio=hora, hora_fin=hora)
@@ -7,11 +7,13 @@ class CitaSchedulerSerializer(serializers.ModelSerializer):
     tipo_medico = serializers.CharField(source='medico.tipo')
     nombre_paciente = serializers.CharField(source='paciente.__str__')
     nombre_especialidad = serializers.CharField(source='especialidad.nombre')
+    id_consultorio = serializers.IntegerField(source='consultorio_id', read_only=True)
     
     class Meta:
         model = Cita
         fields = [
             'id',
+            'id_consultorio',
             'fecha',
             'hora_inicio',
             'hora_fin',
@@ -35,9 +37,14 @@ class ConsultorioSchedulerSerializer(serializers.ModelSerializer):
         ]
     
     def get_citas(self, obj):
+        # Citas precargadas por la vista (Prefetch con to_attr): sin consultas extra
+        citas_precargadas = getattr(obj, 'citas_del_dia', None)
+        if citas_precargadas is not None:
+            return CitaSchedulerSerializer(citas_precargadas, many=True).data
+
         # Filtramos citas de este consultorio
         fecha = self.context.get('fecha')
-        citas_query = obj.cita_set.all()
+        citas_query = obj.cita_set.select_related('medico__usuario', 'paciente', 'especialidad')
 
         if fecha:
             citas_query = citas_query.filter(fecha=fecha)
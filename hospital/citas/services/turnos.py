@@ -0,0 +1,212 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, OuterRef, Q, Subquery, When
+from django.utils import timezone
+from ..models import Cita, Consultorio, Horario, Medico, Turno
+from .cache_disponibilidad import CitaServiceCacheado, _como_fecha
+from .disponibilidad import a_hora, a_minutos
+from .interfaces import ICitaService
+
+# Inventario de turnos: los huecos de Horario + duracion_cita quedan escritos en
+# citas.Turno para el horizonte [hoy, hoy + TURNOS_HORIZONTE_DIAS). Buscar es
+# leer el primer turno libre (una consulta indexada) y reservar es marcar la
+# fila con la cita (UPDATE ... WHERE cita_id IS NULL).
+
+# Búsquedas del proceso resueltas en el inventario y las que pasaron al respaldo
+# (AgendaDia con su caché, cuyos aciertos y fallos cuenta cache_disponibilidad)
+_estadisticas = {'inventario': 0, 'respaldo': 0}
+
+
+def horizonte():
+    desde = timezone.localdate()
+    return desde, desde + timedelta(days=settings.TURNOS_HORIZONTE_DIAS)
+
+
+def generar_turnos(medicos=None, dias_semana=None, desde=None, hasta=None):
+    """
+    Deja el inventario de [desde, hasta) igual a lo que dictan los horarios:
+    crea los turnos que faltan, borra los libres que ya no corresponden y
+    vuelve a enlazar cada turno con la cita que lo ocupa (o ninguna).
+    `medicos` (ids) y `dias_semana` acotan el trabajo a lo que cambió.
+    Devuelve (creados, borrados, reenlazados).
+    """
+    inicio, fin = horizonte()
+    desde, hasta = desde or inicio, hasta or fin
+    fechas = [desde + timedelta(days=n) for n in range((hasta - desde).days)]
+    if dias_semana is not None:
+        fechas = [f for f in fechas if f.weekday() in dias_semana]
+
+    # 1) Médicos con especialidad (solo ellos tienen turnos)
+    lista_medicos = Medico.objects.filter(especialidad__isnull=False).select_related('especialidad')
+    if medicos is not None:
+        lista_medicos = lista_medicos.filter(pk__in=medicos)
+    lista_medicos = list(lista_medicos)
+
+    # 2) Horarios de esos médicos
+    horarios = {}
+    for medico_id, dia, h_ini, h_fin in Horario.objects.filter(
+        medico__in=lista_medicos
+    ).values_list('medico_id', 'dia_semana', 'hora_inicio', 'hora_fin'):
+        horarios.setdefault((medico_id, dia), []).append((a_minutos(h_ini), a_minutos(h_fin)))
+
+    # 3) Citas de esas fechas, para saber qué turnos nacen ocupados
+    citas = Cita.objects.filter(fecha__in=fechas)
+    if medicos is not None:
+        citas = citas.filter(medico_id__in=medicos)
+    ocupacion = {}
+    for cita_id, medico_id, fecha, c_ini, c_fin in citas.values_list(
+        'id', 'medico_id', 'fecha', 'hora_inicio', 'hora_fin'
+    ):
+        ocupacion.setdefault((medico_id, fecha), []).append((cita_id, a_minutos(c_ini), a_minutos(c_fin)))
+
+    def cita_que_ocupa(medico_id, fecha, inicio, fin):
+        for cita_id, c_ini, c_fin in ocupacion.get((medico_id, fecha), ()):
+            if inicio < c_fin and fin > c_ini:
+                return cita_id
+        return None
+
+    # Turnos esperados: (medico, fecha, inicio) -> (especialidad, fin)
+    esperados = {}
+    for medico in lista_medicos:
+        duracion = medico.especialidad.duracion_cita
+        for fecha in fechas:
+            for h_ini, h_fin in horarios.get((medico.id, fecha.weekday()), ()):
+                inicio = h_ini
+                while inicio + duracion <= h_fin:
+                    esperados[(medico.id, fecha, inicio)] = (medico.especialidad_id, inicio + duracion)
+                    inicio += duracion
+
+    # 4) Turnos existentes
+    existentes = Turno.objects.filter(fecha__in=fechas)
+    if medicos is not None:
+        existentes = existentes.filter(medico_id__in=medicos)
+
+    borrar, reenlazar, conservados = [], [], set()
+    for turno in existentes.only('id', 'medico_id', 'especialidad_id', 'fecha', 'hora_inicio', 'hora_fin', 'cita_id'):
+        inicio, fin = a_minutos(turno.hora_inicio), a_minutos(turno.hora_fin)
+        clave = (turno.medico_id, turno.fecha, inicio)
+        cita_id = cita_que_ocupa(turno.medico_id, turno.fecha, inicio, fin)
+
+        if cita_id is None and esperados.get(clave) != (turno.especialidad_id, fin):
+            borrar.append(turno.id)
+            continue
+        conservados.add(clave)
+        if turno.cita_id != cita_id:
+            turno.cita_id = cita_id
+            reenlazar.append(turno)
+
+    nuevos = [
+        Turno(
+            medico_id=medico_id, especialidad_id=especialidad_id, fecha=fecha,
+            hora_inicio=a_hora(inicio), hora_fin=a_hora(fin),
+            cita_id=cita_que_ocupa(medico_id, fecha, inicio, fin),
+        )
+        for (medico_id, fecha, inicio), (especialidad_id, fin) in esperados.items()
+        if (medico_id, fecha, inicio) not in conservados
+    ]
+
+    with transaction.atomic():
+        Turno.objects.filter(pk__in=borrar).delete()
+        Turno.objects.bulk_update(reenlazar, ['cita'], batch_size=500)
+        # ignore_conflicts: un turno reservado con otra duración conserva su hora de inicio
+        Turno.objects.bulk_create(nuevos, batch_size=500, ignore_conflicts=True)
+
+    return len(nuevos), len(borrar), len(reenlazar)
+
+
+def reclamar_turnos(cita, liberar=True):
+    """
+    Reserva para la cita los turnos libres que su horario cubre; se llama en la
+    misma transacción que crea o mueve la cita. El UPDATE solo toca filas con
+    cita_id NULL, así que dos reservas no pueden quedarse con el mismo turno.
+    Con `liberar`, antes suelta los que ocupaba (cita movida).
+
+    Si el médico tiene inventario ese día y no se reservó ningún turno (ya
+    tomado, o el hueco dejó de existir tras un cambio de horario), lanza
+    IntegrityError('turno_no_disponible') para deshacer la reserva. Sin
+    inventario (fuera del horizonte) no reserva nada: generar_turnos enlazará
+    la cita al crear los turnos. Devuelve cuántos turnos reservó.
+    """
+    fecha = _como_fecha(cita.fecha)
+    if liberar:
+        Turno.objects.filter(cita=cita).update(cita=None)
+    reservados = Turno.objects.filter(
+        medico_id=cita.medico_id,
+        fecha=fecha,
+        hora_inicio__lt=cita.hora_fin,
+        hora_fin__gt=cita.hora_inicio,
+        cita__isnull=True,
+    ).update(cita=cita)
+    if not reservados and Turno.objects.filter(medico_id=cita.medico_id, fecha=fecha).exists():
+        raise IntegrityError('turno_no_disponible')
+    return reservados
+
+
+def primer_turno(fecha, especialidad):
+    """
+    Primer hueco libre en el mismo orden que AgendaDia.huecos (médico por nombre,
+    luego hora), en una sola consulta. Para médicos externos el consultorio es el
+    primer externo libre en ese rango. Devuelve (medico, hora_inicio, hora_fin,
+    consultorio) o None.
+    """
+    libres = Turno.objects.filter(especialidad=especialidad, fecha=fecha, cita__isnull=True)
+
+    # Hoy no se ofrecen turnos que ya empezaron
+    if fecha == timezone.localdate():
+        libres = libres.filter(hora_inicio__gte=timezone.localtime().time())
+
+    ocupado = Cita.objects.filter(
+        consultorio=OuterRef('pk'),
+        fecha=fecha,
+        hora_inicio__lt=OuterRef(OuterRef('hora_fin')),
+        hora_fin__gt=OuterRef(OuterRef('hora_inicio')),
+    )
+    externo_libre = Consultorio.objects.filter(tipo='externo').exclude(Exists(ocupado)).order_by('numero')
+
+    turno = (
+        libres.annotate(
+            externo_id=Case(When(medico__tipo='externo', then=Subquery(externo_libre.values('pk')[:1]))),
+            externo_numero=Case(When(medico__tipo='externo', then=Subquery(externo_libre.values('numero')[:1]))),
+        )
+        .filter(
+            (~Q(medico__tipo='externo') & Q(medico__consultorio__isnull=False))
+            | Q(medico__tipo='externo', externo_id__isnull=False)
+        )
+        .select_related('medico__usuario', 'medico__consultorio')
+        .order_by('medico__usuario__nombres', 'medico_id', 'hora_inicio')
+        .first()
+    )
+    if turno is None:
+        return None
+
+    medico = turno.medico
+    if medico.tipo == 'externo':
+        consultorio = Consultorio(pk=turno.externo_id, numero=turno.externo_numero, tipo='externo')
+    else:
+        consultorio = medico.consultorio
+    return medico, turno.hora_inicio, turno.hora_fin, consultorio
+
+
+def estadisticas():
+    return dict(_estadisticas)
+
+
+class CitaServiceTurnos(ICitaService):
+    """
+    Busca en el inventario de turnos. Fuera del horizonte, o si el inventario
+    de esa fecha aún no se generó, calcula la agenda del día como antes.
+    """
+
+    def __init__(self, respaldo=None):
+        self.respaldo = respaldo or CitaServiceCacheado()
+
+    def buscar_disponibilidad(self, fecha, especialidad):
+        desde, hasta = horizonte()
+        if desde <= fecha < hasta:
+            resultado = primer_turno(fecha, especialidad)
+            if resultado or Turno.objects.filter(fecha=fecha).exists():
+                _estadisticas['inventario'] += 1
+                return resultado
+        _estadisticas['respaldo'] += 1
+        return self.respaldo.buscar_disponibilidad(fecha, especialidad)
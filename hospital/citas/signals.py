@@ -0,0 +1,121 @@
+from datetime import date
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Cita, Horario, Medico, Consultorio, Especialidad, CambioCita
+from .services import cache_disponibilidad, turnos
+from .services.broker import obtener_broker
+
+
+def _al_confirmar(funcion, *args):
+    # Invalidar después del COMMIT: antes, otra petición podría recargar datos viejos
+    transaction.on_commit(lambda: funcion(*args))
+
+
+def _especialidad_de_medico(medico_id):
+    if medico_id is None:
+        return None
+    return Medico.objects.filter(pk=medico_id).values_list('especialidad_id', flat=True).first()
+
+
+def _como_fecha(fecha):
+    if isinstance(fecha, str):
+        return date.fromisoformat(fecha)
+    return fecha
+
+
+# ===== REGISTRO DE CAMBIOS (delta y tiempo real del tablero) =====
+def _registrar_cambio(cita_id, fecha, tipo):
+    cambio = CambioCita.objects.create(cita_id=cita_id, fecha=fecha, tipo=tipo)
+    evento = {'cursor': cambio.id, 'cita_id': cita_id, 'tipo': tipo, 'fecha': cambio.fecha.isoformat()}
+    transaction.on_commit(lambda: obtener_broker().publicar(evento))
+
+
+@receiver(post_save, sender=Cita)
+def registrar_cita_guardada(sender, instance, **kwargs):
+    fecha = _como_fecha(instance.fecha)
+    fecha_original = instance.valor_original('fecha')
+
+    # Si la cita cambió de día, el tablero del día anterior debe quitarla
+    if fecha_original and fecha_original != fecha:
+        _registrar_cambio(instance.pk, fecha_original, 'eliminada')
+    _registrar_cambio(instance.pk, fecha, 'guardada')
+
+
+@receiver(post_delete, sender=Cita)
+def registrar_cita_eliminada(sender, instance, **kwargs):
+    _registrar_cambio(instance.pk, _como_fecha(instance.fecha), 'eliminada')
+
+
+# ===== DISPONIBILIDAD =====
+@receiver([post_save, post_delete], sender=Cita)
+def invalidar_disponibilidad_cita(sender, instance, **kwargs):
+    especialidad_id = instance.especialidad_id or _especialidad_de_medico(instance.medico_id)
+    externos = set(
+        Consultorio.objects.filter(
+            pk__in=[instance.consultorio_id, instance.valor_original('consultorio_id')],
+            tipo='externo'
+        ).values_list('pk', flat=True)
+    )
+
+    # Fecha actual y, si la cita se movió, la fecha de donde salió
+    fechas = {instance.fecha, instance.valor_original('fecha')} - {None}
+    for fecha in fechas:
+        _al_confirmar(cache_disponibilidad.invalidar_especialidad_fecha, especialidad_id, fecha)
+        # Un consultorio externo es compartido: afecta a todas las especialidades ese día
+        if externos:
+            _al_confirmar(cache_disponibilidad.invalidar_fecha, fecha)
+
+
+@receiver([post_save, post_delete], sender=Horario)
+def invalidar_disponibilidad_horario(sender, instance, **kwargs):
+    actual = (_especialidad_de_medico(instance.medico_id), instance.dia_semana)
+    original = (
+        _especialidad_de_medico(instance.valor_original('medico_id')),
+        instance.valor_original('dia_semana'),
+    )
+    for especialidad_id, dia_semana in {actual, original}:
+        if dia_semana is not None:
+            _al_confirmar(cache_disponibilidad.invalidar_dia_semana, especialidad_id, dia_semana)
+
+
+@receiver([post_save, post_delete], sender=Medico)
+def invalidar_disponibilidad_medico(sender, instance, **kwargs):
+    for especialidad_id in {instance.especialidad_id, instance.valor_original('especialidad_id')} - {None}:
+        _al_confirmar(cache_disponibilidad.invalidar_especialidad, especialidad_id)
+
+
+@receiver([post_save, post_delete], sender=Especialidad)
+def invalidar_disponibilidad_especialidad(sender, instance, **kwargs):
+    _al_confirmar(cache_disponibilidad.invalidar_especialidad, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Consultorio)
+def invalidar_disponibilidad_consultorio(sender, instance, **kwargs):
+    # Cambia el conjunto de consultorios externos de todo el hospital
+    _al_confirmar(cache_disponibilidad.invalidar_todo)
+
+
+# ===== INVENTARIO DE TURNOS =====
+# Los turnos de una cita los reserva quien la crea o la mueve, en su transacción
+# (turnos.reclamar_turnos); borrarla los libera solo (on_delete=SET_NULL). Las
+# cargas masivas (seed, sintetico) quedan enlazadas con generar_turnos.
+@receiver([post_save, post_delete], sender=Horario)
+def regenerar_turnos_horario(sender, instance, **kwargs):
+    medicos = {instance.medico_id, instance.valor_original('medico_id')} - {None}
+    dias = {instance.dia_semana, instance.valor_original('dia_semana')} - {None}
+    _al_confirmar(turnos.generar_turnos, medicos, dias)
+
+
+@receiver(post_save, sender=Medico)
+def regenerar_turnos_medico(sender, instance, **kwargs):
+    # Cambio de especialidad: los turnos libres se rehacen con la nueva duración
+    if instance.valor_original('especialidad_id') != instance.especialidad_id:
+        _al_confirmar(turnos.generar_turnos, [instance.pk])
+
+
+@receiver(post_save, sender=Especialidad)
+def regenerar_turnos_especialidad(sender, instance, created, **kwargs):
+    if not created:
+        medicos = list(Medico.objects.filter(especialidad=instance).values_list('pk', flat=True))
+        _al_confirmar(turnos.generar_turnos, medicos)
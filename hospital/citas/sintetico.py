@@ -0,0 +1,295 @@
+import math
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+from itertools import count, islice
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from login import contadores
+from login.models import Usuario
+from .models import Cita, Consultorio, Especialidad, Horario, Medico, Turno
+from .services.turnos import generar_turnos, horizonte
+
+# Hospital sintético para benchmarks y pruebas de volumen: médicos internos con
+# consultorio propio y externos que atienden en un consultorio externo fijo,
+# horarios de lunes a viernes y citas dentro del horario sin solaparse. Con la
+# misma semilla y la misma fecha `desde` se obtienen exactamente las mismas filas.
+# Pacientes, citas y turnos se insertan con INSERT por lotes sin instanciar
+# modelos, así que no pasan por señales: al final se recalculan los contadores.
+PASSWORD = 'sintetico'
+DOMINIO = 'sintetico.local'
+LOTE = 10000
+
+
+CEDULAS = 24 * 6 * 10 ** 6  # provincia 01-24, tercer dígito 0-5 (persona natural), 6 dígitos
+
+
+def cedula(n):
+    """Cédula ecuatoriana válida y única para cada n < CEDULAS (144 000 000)."""
+    if not 0 <= n < CEDULAS:
+        raise ValueError(f'Solo hay {CEDULAS} cédulas de personas naturales')
+    provincia, secuencia = n % 24 + 1, n // 24
+    base = f'{provincia:02d}{secuencia // 10 ** 6}{secuencia % 10 ** 6:06d}'
+    suma = 0
+    for i, digito in enumerate(base):
+        valor = int(digito) * (2 if i % 2 == 0 else 1)
+        suma += valor - 9 if valor > 9 else valor
+    return base + str((10 - suma % 10) % 10)
+
+
+def _hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def _insertar(modelo, campos, filas):
+    """INSERT ... VALUES por lotes de LOTE filas (tuplas ya en formato de BD). Devuelve cuántas."""
+    qn = connection.ops.quote_name
+    columnas = ', '.join(qn(modelo._meta.get_field(campo).column) for campo in campos)
+    marcas = ', '.join(['%s'] * len(campos))
+    sql = f'INSERT INTO {qn(modelo._meta.db_table)} ({columnas}) VALUES ({marcas})'
+
+    total = 0
+    filas = iter(filas)
+    with connection.cursor() as cursor:
+        while lote := list(islice(filas, LOTE)):
+            cursor.executemany(sql, lote)
+            total += len(lote)
+    return total
+
+
+@contextmanager
+def _carga_masiva(modelo):
+    """
+    En SQLite quita los índices y triggers de la tabla mientras dura la carga y
+    los vuelve a crear al salir, dentro de la misma transacción (si algo falla,
+    el ROLLBACK los restaura). Recrear los índices únicos valida lo cargado.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE type IN ('index', 'trigger') AND sql IS NOT NULL AND tbl_name = %s",
+            [modelo._meta.db_table],
+        )
+        objetos = cursor.fetchall()
+        for tipo, nombre, _ in objetos:
+            cursor.execute(f'DROP {tipo.upper()} {qn(nombre)}')
+    yield
+    with connection.cursor() as cursor:
+        for tipo, nombre, sql in sorted(objetos, key=lambda objeto: objeto[0] != 'index'):
+            cursor.execute(sql)
+
+
+def contar_solapes():
+    """Pares de citas seguidas que se solapan, por médico y por consultorio (deberían ser 0)."""
+    tabla = connection.ops.quote_name(Cita._meta.db_table)
+    resultado = {}
+    with connection.cursor() as cursor:
+        for columna in ('medico_id', 'consultorio_id'):
+            cursor.execute(
+                f"SELECT COUNT(*) FROM (SELECT hora_inicio, LAG(hora_fin) OVER "
+                f"(PARTITION BY {columna}, fecha ORDER BY hora_inicio) AS fin_anterior "
+                f"FROM {tabla} WHERE {columna} IS NOT NULL) WHERE hora_inicio < fin_anterior"
+            )
+            resultado[columna.removesuffix('_id')] = cursor.fetchone()[0]
+    return resultado
+
+
+@contextmanager
+def bd_temporal(prefijo):
+    """
+    Cambia la conexión a una BD SQLite temporal migrada desde cero (con triggers
+    y FTS) mientras dura el bloque, para que las mediciones no dependan de la BD local.
+    """
+    directorio = tempfile.mkdtemp(prefix=f'{prefijo}-')
+    connection.settings_dict['TEST']['NAME'] = os.path.join(directorio, f'{prefijo}.sqlite3')
+    nombre_original = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        teardown_test_environment()
+        os.rmdir(directorio)
+
+
+def existe():
+    """True si la BD ya tiene un hospital sintético (las claves únicas chocarían)."""
+    return Usuario.objects.filter(email__endswith=f'@{DOMINIO}').exists()
+
+
+def construir_hospital(medicos=20, pacientes=500, dias=30, ocupacion=0.6, semilla=1, desde=None,
+                       citas=None, aviso=None):
+    """
+    Crea el hospital y devuelve un resumen con los totales. Las citas empiezan
+    en `desde` (por defecto hoy - dias // 2) y ocupan `dias` días; con `citas`
+    se generan exactamente esas citas y los días salen de la capacidad de los
+    horarios. `aviso` recibe una línea de progreso por etapa.
+    """
+    azar = random.Random(semilla)
+    aviso = aviso or (lambda texto: None)
+    clave = make_password(PASSWORD)  # un solo hash para todos los usuarios
+    registro = connection.ops.adapt_datetimefield_value(timezone.now().replace(microsecond=0))
+
+    with transaction.atomic():
+        # 1) Especialidades
+        especialidades = Especialidad.objects.bulk_create([
+            Especialidad(nombre=f'Especialidad {n:03d}', duracion_cita=azar.choice([15, 30]))
+            for n in range(max(1, medicos // 5))
+        ])
+
+        # 2) Admin y médicos con el ORM (hacen falta sus ids); pacientes con INSERT por lotes
+        def usuario(n, rol):
+            return Usuario(
+                nombres=f'{rol.capitalize()} {n}', apellidos=f'Sintetico {semilla}', cedula=cedula(n),
+                telefono=f'09{n % 10 ** 8:08d}', email=f'{rol}{n}@{DOMINIO}',
+                fecha_nacimiento=date(1960 + n % 40, 1 + n % 12, 1 + n % 28), genero='MF'[n % 2],
+                password=clave, rol=rol,
+            )
+
+        Usuario.objects.bulk_create([usuario(0, 'admin')])
+        usuarios_medicos = Usuario.objects.bulk_create([usuario(1 + n, 'medico') for n in range(medicos)])
+        _insertar(
+            Usuario,
+            ['nombres', 'apellidos', 'cedula', 'telefono', 'email', 'fecha_nacimiento', 'genero', 'password',
+             'rol', 'fecha_registro'],
+            (
+                (f'Usuario {n}', f'Sintetico {semilla}', cedula(n), f'09{n % 10 ** 8:08d}',
+                 f'usuario{n}@{DOMINIO}', f'{1960 + n % 40}-{1 + n % 12:02d}-{1 + n % 28:02d}',
+                 'MF'[n % 2], clave, 'usuario', registro)
+                for n in range(1 + medicos, 1 + medicos + pacientes)
+            ),
+        )
+        ids_pacientes = list(
+            Usuario.objects.filter(rol='usuario', email__endswith=f'@{DOMINIO}')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        aviso(f'{1 + medicos + pacientes} usuarios')
+
+        # 3) Médicos: 3 de cada 4 internos con consultorio propio; cada externo usa un externo fijo
+        tipos = ['externo' if n % 4 == 3 else 'interno' for n in range(medicos)]
+        internos = Consultorio.objects.bulk_create([
+            Consultorio(numero=10000 + n, tipo='interno') for n in range(tipos.count('interno'))
+        ])
+        externos = Consultorio.objects.bulk_create([
+            Consultorio(numero=20000 + n, tipo='externo') for n in range(tipos.count('externo'))
+        ])
+        lista_medicos = Medico.objects.bulk_create([
+            Medico(
+                usuario=usuario_medico, especialidad=especialidades[n % len(especialidades)], tipo=tipo,
+                consultorio=internos.pop() if tipo == 'interno' else None,
+            )
+            for n, (usuario_medico, tipo) in enumerate(zip(usuarios_medicos, tipos))
+        ])
+
+        # 4) Horarios: lunes a viernes, entrada entre 7 y 9, de 6 a 10 horas
+        horarios = []
+        plan = []  # (medico, consultorio de sus citas, especialidad, duración, inicio, fin); horas en minutos
+        for medico in lista_medicos:
+            entrada = azar.randint(7, 9)
+            salida = min(entrada + azar.randint(6, 10), 20)
+            horarios += [
+                Horario(medico=medico, dia_semana=dia, hora_inicio=time(entrada), hora_fin=time(salida))
+                for dia in range(5)
+            ]
+            consultorio_id = medico.consultorio_id if medico.tipo == 'interno' else externos.pop().pk
+            plan.append((
+                medico.pk, consultorio_id, medico.especialidad_id, medico.especialidad.duracion_cita,
+                entrada * 60, salida * 60,
+            ))
+        Horario.objects.bulk_create(horarios)
+        aviso(f'{medicos} médicos, {len(horarios)} horarios')
+
+        # 5) Citas: cada hueco del horario se ocupa con probabilidad `ocupacion`
+        if citas is not None:
+            por_dia_habil = sum((fin - inicio) // duracion for _, _, _, duracion, inicio, fin in plan) * ocupacion
+            dias = math.ceil(citas / max(por_dia_habil, 1) * 7 / 5) + 7
+        desde = desde or timezone.localdate() - timedelta(days=dias // 2)
+        horas = {minuto: _hora(minuto).isoformat() for minuto in range(21 * 60 + 1)}
+        ultima = {'fecha': desde}
+
+        def filas_citas():
+            for offset in count():
+                if citas is None and offset >= dias:
+                    return
+                fecha = desde + timedelta(days=offset)
+                if fecha.weekday() >= 5:
+                    continue
+                ultima['fecha'] = fecha
+                texto_fecha = fecha.isoformat()
+                for medico_id, consultorio_id, especialidad_id, duracion, inicio, fin in plan:
+                    for minuto in range(inicio, fin - duracion + 1, duracion):
+                        if azar.random() >= ocupacion:
+                            continue
+                        yield (
+                            ids_pacientes[int(azar.random() * len(ids_pacientes))], medico_id, consultorio_id,
+                            especialidad_id, texto_fecha, horas[minuto], horas[minuto + duracion], registro,
+                        )
+
+        with _carga_masiva(Cita):
+            total_citas = _insertar(
+                Cita,
+                ['paciente', 'medico', 'consultorio', 'especialidad', 'fecha', 'hora_inicio', 'hora_fin',
+                 'fecha_creacion'],
+                filas_citas() if citas is None else islice(filas_citas(), citas),
+            )
+        dias = (ultima['fecha'] - desde).days + 1
+        aviso(f'{total_citas} citas del {desde.isoformat()} al {ultima["fecha"].isoformat()}')
+
+        # 6) Turnos del horizonte: la misma rejilla que generar_turnos, enlazada a la cita que empieza ahí
+        inicio_horizonte, fin_horizonte = horizonte()
+        fechas_horizonte = [
+            inicio_horizonte + timedelta(days=n) for n in range((fin_horizonte - inicio_horizonte).days)
+            if (inicio_horizonte + timedelta(days=n)).weekday() < 5
+        ]
+        primer_id = Turno.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        with _carga_masiva(Turno):
+            total_turnos = _insertar(
+                Turno,
+                ['medico', 'especialidad', 'fecha', 'hora_inicio', 'hora_fin'],
+                (
+                    (medico_id, especialidad_id, fecha.isoformat(), horas[minuto], horas[minuto + duracion])
+                    for fecha in fechas_horizonte
+                    for medico_id, _, especialidad_id, duracion, inicio, fin in plan
+                    for minuto in range(inicio, fin - duracion + 1, duracion)
+                ),
+            )
+            qn = connection.ops.quote_name
+            turno, cita = qn(Turno._meta.db_table), qn(Cita._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {turno} SET cita_id = (SELECT c.id FROM {cita} c "
+                    f"WHERE c.medico_id = {turno}.medico_id AND c.fecha = {turno}.fecha "
+                    f"AND c.hora_inicio = {turno}.hora_inicio) WHERE id > %s",
+                    [primer_id],
+                )
+        aviso(f'{total_turnos} turnos')
+
+        # 7) Lo que harían las señales: contadores; el resto del hospital, si lo hay, pasa por generar_turnos
+        contadores.recontar()
+    generar_turnos(medicos=list(
+        Medico.objects.exclude(usuario__email__endswith=f'@{DOMINIO}').values_list('pk', flat=True)
+    ))
+
+    # Estadísticas para el planificador de SQLite con las tablas ya llenas
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return {
+        'especialidades': len(especialidades),
+        'medicos': medicos,
+        'pacientes': pacientes,
+        'citas': total_citas,
+        'turnos': total_turnos,
+        'desde': desde.isoformat(),
+        'dias': dias,
+        'semilla': semilla,
+    }
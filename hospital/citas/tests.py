@@ -0,0 +1,547 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import nullcontext
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from login.models import Usuario
+from citas import sintetico
+from citas.management.commands.benchmark_suite import OBJETIVOS
+from citas.models import CambioCita, Cita, Consultorio, Especialidad, Horario, Medico, Turno
+from citas.services import cache_disponibilidad, turnos
+from citas.services.api_views import ReprogramarLoteView
+from citas.services.cita_service import CitaService
+from citas.services.factory import get_cita_service
+from citas.validators import validar_cedula_ecuador
+
+
+def dia_habil(fecha):
+    while fecha.weekday() >= 5:
+        fecha += timedelta(days=1)
+    return fecha
+
+
+def nueva_cita(medico, fecha, hora=time(10), consultorio=None):
+    """Cita de `medico` a `hora` (dentro de cualquier horario sintético), sin validar."""
+    fin = (datetime.combine(fecha, hora) + timedelta(minutes=medico.especialidad.duracion_cita)).time()
+    return Cita.objects.create(
+        paciente=Usuario.objects.filter(rol='usuario').first(), medico=medico,
+        consultorio=consultorio or medico.consultorio, especialidad=medico.especialidad,
+        fecha=fecha, hora_inicio=hora, hora_fin=fin,
+    )
+
+
+class HospitalSintetico(TestCase):
+    """Hospital de citas.sintetico del tamaño TAMANO; las consultas no deben crecer con él."""
+
+    TAMANO = {'medicos': 5, 'pacientes': 30, 'dias': 20}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.resumen = sintetico.construir_hospital(semilla=1, **cls.TAMANO)
+        cls.especialidades = list(Especialidad.objects.all())
+        hoy = timezone.localdate()
+        cls.manana = dia_habil(hoy + timedelta(days=1))
+        cls.fuera_del_horizonte = dia_habil(hoy + timedelta(days=settings.TURNOS_HORIZONTE_DIAS + 1))
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+
+
+class BuscarDisponibilidadPequeno(HospitalSintetico):
+
+    def test_agenda_dia_en_cuatro_consultas(self):
+        for especialidad in self.especialidades:
+            with self.assertNumQueries(4):
+                resultado = CitaService().buscar_disponibilidad(self.manana, especialidad)
+            self.assertIsNotNone(resultado)
+
+    def test_inventario_en_una_consulta(self):
+        for especialidad in self.especialidades:
+            with self.assertNumQueries(1):
+                resultado = get_cita_service().buscar_disponibilidad(self.manana, especialidad)
+            self.assertIsNotNone(resultado)
+
+    def test_fuera_del_horizonte_agenda_y_luego_cache(self):
+        especialidad = self.especialidades[0]
+        with self.assertNumQueries(4):
+            get_cita_service().buscar_disponibilidad(self.fuera_del_horizonte, especialidad)
+        with self.assertNumQueries(0):
+            get_cita_service().buscar_disponibilidad(self.fuera_del_horizonte, especialidad)
+
+
+    def test_contadores_del_camino_usado(self):
+        especialidad = self.especialidades[0]
+        antes = self.client.get('/api/disponibilidad/cache/').json()
+        get_cita_service().buscar_disponibilidad(self.manana, especialidad)
+        get_cita_service().buscar_disponibilidad(self.fuera_del_horizonte, especialidad)
+        despues = self.client.get('/api/disponibilidad/cache/').json()
+
+        self.assertEqual(despues['turnos']['inventario'] - antes['turnos']['inventario'], 1)
+        self.assertEqual(despues['turnos']['respaldo'] - antes['turnos']['respaldo'], 1)
+        # Solo la fecha fuera del horizonte pasó por la caché
+        self.assertEqual(despues['fallos'] - antes['fallos'], 1)
+        self.assertEqual(despues['aciertos'], antes['aciertos'])
+
+
+class BuscarDisponibilidadGrande(BuscarDisponibilidadPequeno):
+    TAMANO = {'medicos': 40, 'pacientes': 300, 'dias': 20}
+
+
+class TableroScheduler(HospitalSintetico):
+
+    def test_tablero_completo_en_cinco_consultas(self):
+        # cursor, consultorios, citas del día (prefetch), horarios y huérfanos
+        for fecha in (self.manana, dia_habil(self.manana + timedelta(days=1))):
+            with self.assertNumQueries(5):
+                respuesta = self.client.get('/api/scheduler/', {'fecha': fecha.isoformat()})
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertTrue(any(c['citas'] for c in respuesta.json()['consultorios']))
+
+
+class TableroSchedulerGrande(TableroScheduler):
+    TAMANO = BuscarDisponibilidadGrande.TAMANO
+
+
+class HospitalVacio(HospitalSintetico):
+    """Médicos, horarios y turnos, sin citas: cada prueba crea las que necesita."""
+
+    TAMANO = {'medicos': 10, 'pacientes': 5, 'dias': 1, 'ocupacion': 0}
+
+    def setUp(self):
+        super().setUp()
+        self.medico = Medico.objects.filter(tipo='interno').first()
+        self.otro_dia = dia_habil(self.manana + timedelta(days=1))
+
+    def confirmar_cita(self, medico, fecha, hora):
+        """POST /confirmar_cita/ como paciente, con los formatos de confirmar_cita.html."""
+        paciente = Usuario.objects.filter(rol='usuario').first()
+        self.client.post('/login/', {'email': paciente.email, 'password': sintetico.PASSWORD})
+        fin = datetime.combine(fecha, hora) + timedelta(minutes=medico.especialidad.duracion_cita)
+        return self.client.post('/confirmar_cita/', {
+            'medico_id': medico.pk,
+            'especialidad_id': medico.especialidad_id,
+            'consultorio_id': medico.consultorio_id,
+            'fecha': fecha.strftime('%b %d, %Y'),
+            'hora_inicio': hora.strftime('%I:%M %p'),
+            'hora_fin': fin.strftime('%I:%M %p'),
+        })
+
+    def ultimo_mensaje(self, respuesta):
+        return [m.message for m in get_messages(respuesta.wsgi_request)][-1]
+
+
+class InvalidacionDisponibilidad(HospitalVacio):
+    """Cada cambio recarga solo las entradas (especialidad, fecha) a las que afecta."""
+
+    def setUp(self):
+        super().setUp()
+        self.a, self.b = self.especialidades
+        self.misma_semana = self.manana + timedelta(days=7)  # mismo día de la semana
+        self.entradas = [
+            (especialidad, fecha)
+            for especialidad in (self.a, self.b)
+            for fecha in (self.manana, self.misma_semana, self.otro_dia)
+        ]
+        self.recargadas()
+        self.medico = Medico.objects.filter(especialidad=self.a, tipo='interno').first()
+
+    def recargadas(self):
+        """Lee todas las entradas y devuelve las que fueron un fallo de la caché."""
+        fallos = set()
+        for especialidad, fecha in self.entradas:
+            antes = cache_disponibilidad.estadisticas()['fallos']
+            cache_disponibilidad.obtener_agenda(fecha, especialidad)
+            if cache_disponibilidad.estadisticas()['fallos'] > antes:
+                fallos.add((especialidad, fecha))
+        return fallos
+
+    def test_sin_cambios_todo_acierta(self):
+        antes = cache_disponibilidad.estadisticas()
+        self.assertEqual(self.recargadas(), set())
+        despues = cache_disponibilidad.estadisticas()
+        self.assertEqual(despues['aciertos'] - antes['aciertos'], len(self.entradas))
+        self.assertEqual(despues['fallos'], antes['fallos'])
+
+    def test_cita_nueva_movida_y_borrada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cita = nueva_cita(self.medico, self.manana)
+        self.assertEqual(self.recargadas(), {(self.a, self.manana)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.fecha = self.otro_dia
+            cita.save()
+        self.assertEqual(self.recargadas(), {(self.a, self.manana), (self.a, self.otro_dia)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.delete()
+        self.assertEqual(self.recargadas(), {(self.a, self.otro_dia)})
+
+    def test_cita_en_consultorio_externo_afecta_a_toda_la_fecha(self):
+        externo = Medico.objects.filter(tipo='externo').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            nueva_cita(externo, self.manana, consultorio=Consultorio.objects.filter(tipo='externo').first())
+        self.assertEqual(self.recargadas(), {(self.a, self.manana), (self.b, self.manana)})
+
+    def test_horario_afecta_a_su_dia_de_la_semana(self):
+        horario = Horario.objects.get(medico=self.medico, dia_semana=self.manana.weekday())
+        with self.captureOnCommitCallbacks(execute=True):
+            horario.hora_fin = time(21)
+            horario.save()
+        self.assertEqual(self.recargadas(), {(self.a, self.manana), (self.a, self.misma_semana)})
+
+    def test_medico_afecta_a_su_especialidad(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medico.save()
+        self.assertEqual(self.recargadas(), {(self.a, fecha) for fecha in (self.manana, self.misma_semana, self.otro_dia)})
+
+    def test_consultorio_afecta_a_todo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Consultorio.objects.create(numero=1, tipo='externo')
+        self.assertEqual(self.recargadas(), set(self.entradas))
+
+
+class DeltaScheduler(HospitalVacio):
+    """/api/scheduler/?since=: solo lo que cambió después del cursor."""
+
+    def tablero(self, fecha, since=None):
+        parametros = {'fecha': fecha.isoformat()}
+        if since is not None:
+            parametros['since'] = since
+        respuesta = self.client.get('/api/scheduler/', parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_solo_cambios_posteriores_al_cursor(self):
+        quieta = nueva_cita(self.medico, self.manana, time(10))
+        movida = nueva_cita(self.medico, self.manana, time(11))
+        borrada = nueva_cita(self.medico, self.manana, time(12))
+        cursor = self.tablero(self.manana)['cursor']
+
+        movida.hora_inicio, movida.hora_fin = time(13), time(13, self.medico.especialidad.duracion_cita)
+        movida.save()
+        nueva = nueva_cita(self.medico, self.manana, time(14))
+        borrada_id = borrada.pk
+        borrada.delete()
+
+        delta = self.tablero(self.manana, since=cursor)
+        self.assertTrue(delta['delta'])
+        self.assertGreater(delta['cursor'], cursor)
+        self.assertEqual({c['id'] for c in delta['citas']}, {movida.pk, nueva.pk})
+        self.assertEqual(delta['eliminadas'], [borrada_id])
+        self.assertNotIn(quieta.pk, {c['id'] for c in delta['citas']} | set(delta['eliminadas']))
+
+        # Con el cursor nuevo no hay nada pendiente
+        vacio = self.tablero(self.manana, since=delta['cursor'])
+        self.assertEqual((vacio['citas'], vacio['eliminadas']), ([], []))
+
+    def test_cita_movida_de_fecha_se_elimina_de_la_anterior(self):
+        cita = nueva_cita(self.medico, self.manana)
+        cursor = self.tablero(self.manana)['cursor']
+        cita.fecha = self.otro_dia
+        cita.save()
+
+        anterior = self.tablero(self.manana, since=cursor)
+        self.assertEqual((anterior['citas'], anterior['eliminadas']), ([], [cita.pk]))
+        nueva = self.tablero(self.otro_dia, since=cursor)
+        self.assertEqual([c['id'] for c in nueva['citas']], [cita.pk])
+
+    def test_cursor_purgado_recibe_el_tablero_completo(self):
+        nueva_cita(self.medico, self.manana, time(10))
+        viejo = self.tablero(self.manana)['cursor']
+        nueva_cita(self.medico, self.manana, time(11))
+        reciente = self.tablero(self.manana)['cursor']
+        CambioCita.objects.update(registrado=timezone.now() - timedelta(days=30))
+        nueva_cita(self.medico, self.manana, time(12))
+
+        # Se borra el cambio de la cita de las 11, que `viejo` no vio
+        call_command('purge_cambios_citas', dias=7, stdout=StringIO())
+
+        completo = self.tablero(self.manana, since=viejo)
+        self.assertFalse(completo['delta'])
+        self.assertIn('consultorios', completo)
+        # Un cursor que sigue dentro del registro aún recibe delta
+        self.assertTrue(self.tablero(self.manana, since=reciente)['delta'])
+
+
+class SinSolapamiento(HospitalVacio):
+    """Triggers de la migración 0007: la BD rechaza el solape aunque se salte Cita.clean."""
+
+    def setUp(self):
+        super().setUp()
+        self.mitad = self.medico.especialidad.duracion_cita // 2
+        self.cita = nueva_cita(self.medico, self.manana, time(10))
+        self.otro_medico = Medico.objects.filter(tipo='interno', especialidad=self.medico.especialidad) \
+            .exclude(pk=self.medico.pk).first()
+
+    def test_mismo_medico(self):
+        with self.assertRaisesMessage(IntegrityError, 'cita_solapada_medico'), transaction.atomic():
+            nueva_cita(self.medico, self.manana, time(10, self.mitad))
+
+    def test_mismo_consultorio(self):
+        with self.assertRaisesMessage(IntegrityError, 'cita_solapada_consultorio'), transaction.atomic():
+            nueva_cita(self.otro_medico, self.manana, time(10, self.mitad), consultorio=self.medico.consultorio)
+
+    def test_mover_sobre_su_propia_posicion(self):
+        self.cita.save()
+        self.cita.hora_inicio = time(10, self.mitad)
+        self.cita.hora_fin = time(10, self.mitad + self.medico.especialidad.duracion_cita)
+        self.cita.save()
+
+    def test_mover_sobre_otra_cita(self):
+        otra = nueva_cita(self.medico, self.manana, time(11))
+        otra.hora_inicio, otra.hora_fin = self.cita.hora_inicio, self.cita.hora_fin
+        with self.assertRaisesMessage(IntegrityError, 'cita_solapada_medico'), transaction.atomic():
+            otra.save()
+
+    def test_reprogramar_cita_carrera_perdida_es_409(self):
+        # Otra escritura ocupó el destino después de la validación
+        otra = nueva_cita(self.medico, self.manana, time(11))
+        with mock.patch.object(Cita, 'full_clean'):
+            respuesta = self.client.put(
+                f'/api/citas/{otra.pk}/reprogramar/',
+                json.dumps({'hora_inicio': self.cita.hora_inicio.isoformat(), 'hora_fin': self.cita.hora_fin.isoformat()}),
+                content_type='application/json',
+            )
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['error'], Cita.mensaje_integridad(IntegrityError('cita_solapada_medico')))
+
+    def test_confirmar_cita_ocupada_es_un_mensaje(self):
+        citas = Cita.objects.count()
+        respuesta = self.confirmar_cita(self.medico, self.manana, self.cita.hora_inicio)
+        self.assertRedirects(respuesta, '/create_cita/', fetch_redirect_response=False)
+        self.assertEqual(
+            self.ultimo_mensaje(respuesta), Cita.mensaje_integridad(IntegrityError('cita_solapada_medico'))
+        )
+        self.assertEqual(Cita.objects.count(), citas)
+
+
+class InventarioTurnos(HospitalVacio):
+    """Reservar y mover reclaman su turno en la misma transacción; borrar y cambiar horarios lo mantienen al día."""
+
+    def turno(self, hora, fecha=None):
+        return Turno.objects.get(medico=self.medico, fecha=fecha or self.manana, hora_inicio=hora)
+
+    def test_reservar_reclama_el_turno(self):
+        respuesta = self.confirmar_cita(self.medico, self.manana, time(10))
+        self.assertRedirects(respuesta, '/dashboard_usuario/', fetch_redirect_response=False)
+        cita = Cita.objects.get(medico=self.medico, fecha=self.manana, hora_inicio=time(10))
+        self.assertEqual(self.turno(time(10)).cita_id, cita.pk)
+
+    def test_turno_que_ya_no_existe_no_se_reserva(self):
+        # El formulario ofreció un hueco que el inventario ya no tiene (horario cambiado)
+        self.turno(time(10)).delete()
+        respuesta = self.confirmar_cita(self.medico, self.manana, time(10))
+        self.assertRedirects(respuesta, '/create_cita/', fetch_redirect_response=False)
+        self.assertEqual(self.ultimo_mensaje(respuesta), Cita.mensaje_integridad(IntegrityError('turno_no_disponible')))
+        self.assertFalse(Cita.objects.filter(medico=self.medico, fecha=self.manana).exists())
+
+    def test_sin_inventario_reserva_y_generar_turnos_la_enlaza(self):
+        fecha = self.fuera_del_horizonte
+        respuesta = self.confirmar_cita(self.medico, fecha, time(10))
+        self.assertRedirects(respuesta, '/dashboard_usuario/', fetch_redirect_response=False)
+        cita = Cita.objects.get(medico=self.medico, fecha=fecha)
+
+        turnos.generar_turnos(medicos=[self.medico.pk], desde=fecha, hasta=fecha + timedelta(days=1))
+        self.assertEqual(self.turno(time(10), fecha).cita_id, cita.pk)
+
+    def test_mover_libera_y_reclama(self):
+        cita = nueva_cita(self.medico, self.manana, time(10))
+        turnos.reclamar_turnos(cita, liberar=False)
+        respuesta = self.client.put(
+            f'/api/citas/{cita.pk}/reprogramar/',
+            json.dumps({'hora_inicio': '11:00', 'hora_fin': cita.hora_fin.replace(hour=11).strftime('%H:%M')}),
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertIsNone(self.turno(time(10)).cita_id)
+        self.assertEqual(self.turno(time(11)).cita_id, cita.pk)
+
+    def test_borrar_libera(self):
+        cita = nueva_cita(self.medico, self.manana, time(10))
+        turnos.reclamar_turnos(cita, liberar=False)
+        cita.delete()
+        self.assertIsNone(self.turno(time(10)).cita_id)
+
+    def test_cambio_de_horario_regenera(self):
+        cita = nueva_cita(self.medico, self.manana, time(10))
+        turnos.reclamar_turnos(cita, liberar=False)
+        horario = Horario.objects.get(medico=self.medico, dia_semana=self.manana.weekday())
+        with self.captureOnCommitCallbacks(execute=True):
+            horario.hora_inicio, horario.hora_fin = time(10), time(21)
+            horario.save()
+
+        del_dia = Turno.objects.filter(medico=self.medico, fecha=self.manana)
+        self.assertEqual(del_dia.order_by('hora_inicio').first().hora_inicio, time(10))
+        self.assertEqual(del_dia.order_by('hora_inicio').last().hora_fin, time(21))
+        self.assertEqual(self.turno(time(10)).cita_id, cita.pk)
+
+
+class ReprogramarLote(HospitalVacio):
+    """POST /api/citas/reprogramar/: el lote se valida sobre su estado final y se aplica entero o nada."""
+
+    def setUp(self):
+        super().setUp()
+        self.duracion = self.medico.especialidad.duracion_cita
+
+    def hora(self, n, desfase=0):
+        """Inicio del turno n del médico a partir de las 10:00 (+ `desfase` minutos)."""
+        return (datetime.combine(self.manana, time(10)) + timedelta(minutes=n * self.duracion + desfase)).time()
+
+    def cita(self, n):
+        return nueva_cita(self.medico, self.manana, self.hora(n))
+
+    def movimiento(self, cita, n, desfase=0):
+        inicio = datetime.combine(self.manana, self.hora(n, desfase))
+        return {
+            'id': cita.pk,
+            'hora_inicio': inicio.strftime('%H:%M'),
+            'hora_fin': (inicio + timedelta(minutes=self.duracion)).strftime('%H:%M'),
+        }
+
+    def mover(self, *movimientos):
+        return self.client.post(
+            '/api/citas/reprogramar/', json.dumps({'movimientos': list(movimientos)}), content_type='application/json'
+        )
+
+    def posiciones(self, *citas):
+        return [Cita.objects.values_list('hora_inicio', flat=True).get(pk=c.pk) for c in citas]
+
+    def test_dos_movimientos_al_mismo_destino_chocan(self):
+        a, b = self.cita(0), self.cita(1)
+        respuesta = self.mover(self.movimiento(a, 3), self.movimiento(b, 3))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual({e['id'] for e in respuesta.json()['errores']}, {a.pk, b.pk})
+        self.assertEqual(self.posiciones(a, b), [self.hora(0), self.hora(1)])
+
+    def test_no_choca_con_su_propia_posicion_anterior(self):
+        a = self.cita(0)
+        respuesta = self.mover(self.movimiento(a, 0, desfase=self.duracion // 2))
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self.posiciones(a), [self.hora(0, desfase=self.duracion // 2)])
+
+    def test_cadena_se_escribe_en_orden(self):
+        # a va al lugar de b, que a su vez se corre al siguiente turno
+        a, b = self.cita(0), self.cita(1)
+        respuesta = self.mover(self.movimiento(a, 1), self.movimiento(b, 2))
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self.posiciones(a, b), [self.hora(1), self.hora(2)])
+
+    def test_un_movimiento_invalido_no_aplica_ninguno(self):
+        a, b = self.cita(0), self.cita(1)
+        fuera_de_horario = {'id': b.pk, 'hora_inicio': '22:00', 'hora_fin': f'22:{self.duracion}'}
+        respuesta = self.mover(self.movimiento(a, 3), fuera_de_horario)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['id'] for e in respuesta.json()['errores']], [b.pk])
+        self.assertEqual(self.posiciones(a, b), [self.hora(0), self.hora(1)])
+
+    def test_maximo_de_movimientos(self):
+        maximo = ReprogramarLoteView.MAX_MOVIMIENTOS
+        a = self.cita(0)
+        with self.assertNumQueries(0):
+            respuesta = self.mover(*[{'id': n} for n in range(1, maximo + 2)])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn(str(maximo), respuesta.json()['error'])
+        self.assertEqual(self.mover(self.movimiento(a, 3)).status_code, 200)
+
+    def test_intercambio_de_dos_citas(self):
+        a, b = self.cita(0), self.cita(1)
+        respuesta = self.mover(self.movimiento(a, 1), self.movimiento(b, 0))
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self.posiciones(a, b), [self.hora(1), self.hora(0)])
+        turnos_del_dia = Turno.objects.filter(medico=self.medico, fecha=self.manana)
+        self.assertEqual(turnos_del_dia.get(hora_inicio=self.hora(1)).cita_id, a.pk)
+        self.assertEqual(turnos_del_dia.get(hora_inicio=self.hora(0)).cita_id, b.pk)
+
+    def test_rotacion_de_tres_citas_con_otro_movimiento(self):
+        a, b, c, d = self.cita(0), self.cita(1), self.cita(2), self.cita(4)
+        respuesta = self.mover(
+            self.movimiento(a, 1), self.movimiento(b, 2), self.movimiento(c, 0),
+            self.movimiento(d, 3),
+        )
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self.posiciones(a, b, c, d), [self.hora(1), self.hora(2), self.hora(0), self.hora(3)])
+        self.assertEqual(sintetico.contar_solapes(), {'medico': 0, 'consultorio': 0})
+
+
+class BenchmarkSuite(TestCase):
+    """benchmark_suite de punta a punta, en la BD de pruebas en lugar de su BD temporal."""
+
+    def test_json_de_resultados(self):
+        with tempfile.TemporaryDirectory() as directorio, \
+                mock.patch.object(sintetico, 'bd_temporal', lambda prefijo: nullcontext()):
+            salida = os.path.join(directorio, 'bench.json')
+            call_command('benchmark_suite', tamano='pequeno', iteraciones=3, salida=salida, stdout=StringIO())
+            with open(salida) as f:
+                datos = json.load(f)
+
+        self.assertEqual(datos['meta']['tamano'], 'pequeno')
+        self.assertEqual(datos['meta']['iteraciones'], 3)
+        self.assertGreater(datos['meta']['hospital']['citas'], 0)
+        self.assertEqual(set(datos['resultados']), set(OBJETIVOS))
+        for nombre, resultado in datos['resultados'].items():
+            with self.subTest(nombre):
+                self.assertGreater(resultado['p50_ms'], 0)
+                self.assertLessEqual(resultado['p50_ms'], resultado['p95_ms'])
+                self.assertLessEqual(resultado['consultas_p50'], resultado['consultas_max'])
+
+
+class ConexionesPersistentes(SimpleTestCase):
+    """CONN_MAX_AGE según el servidor: 0 bajo ASGI (startup.sh) aunque el entorno pida más, 60 bajo WSGI."""
+
+    def conn_max_age(self, modulo, **entorno):
+        codigo = (
+            f'import {modulo}; from django.db import connection; '
+            f'print(connection.settings_dict["CONN_MAX_AGE"])'
+        )
+        base = {k: v for k, v in os.environ.items() if k != 'CONN_MAX_AGE'}
+        proceso = subprocess.run(
+            [sys.executable, '-c', codigo], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**base, **entorno},
+        )
+        self.assertEqual(proceso.returncode, 0, proceso.stderr)
+        return int(proceso.stdout)
+
+    def test_por_servidor(self):
+        self.assertEqual(self.conn_max_age('hospital.asgi'), 0)
+        self.assertEqual(self.conn_max_age('hospital.asgi', CONN_MAX_AGE='60'), 0)
+        self.assertEqual(self.conn_max_age('hospital.wsgi'), 60)
+        self.assertEqual(self.conn_max_age('hospital.wsgi', CONN_MAX_AGE='0'), 0)
+
+
+class CedulaSintetica(SimpleTestCase):
+
+    def test_validas_y_unicas_hasta_el_limite(self):
+        muestras = [*range(0, 2000), *range(sintetico.CEDULAS - 2000, sintetico.CEDULAS),
+                    *range(0, sintetico.CEDULAS, 999_983)]
+        cedulas = {sintetico.cedula(n) for n in muestras}
+        self.assertEqual(len(cedulas), len(set(muestras)))
+        for cedula in cedulas:
+            validar_cedula_ecuador(cedula)
+        with self.assertRaises(ValueError):
+            sintetico.cedula(sintetico.CEDULAS)
+
+
+class PresupuestoConsultas(SimpleTestCase):
+    """
+    presupuesto_consultas en otro proceso: crea sus propias BD temporales, y dentro
+    de la transacción de un TestCase los atomic() contarían SAVEPOINT de más.
+    """
+
+    def test_todas_las_vistas_dentro_del_presupuesto(self):
+        proceso = subprocess.run(
+            [sys.executable, 'manage.py', 'presupuesto_consultas'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(proceso.returncode, 0, proceso.stdout + proceso.stderr)
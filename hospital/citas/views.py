@@ -2,12 +2,13 @@ from django.shortcuts import render
 from datetime import datetime, timedelta
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.db import IntegrityError, transaction
 from datetime import datetime
 from django.utils import timezone
 from .forms import CitaCreateForm
 from .models import Cita, Horario, Medico, Especialidad, Consultorio
-from login.models import Usuario
 from login.decorators import login_required, rol_required
+from .services import turnos
 from .services.factory import get_cita_service
 from .services.normalizador import normalizar_fecha_hora
 
@@ -77,15 +78,23 @@ def confirmar_cita(request):
         else:
             consultorio = medico.consultorio
 
-        cita = Cita.objects.create(
-            paciente = Usuario.objects.get(id=request.session["usuario_id"]), # Obtiene el usuario de la sesión manual
-            medico=medico,
-            consultorio=consultorio,
-            especialidad=especialidad,
-            fecha=fecha,
-            hora_inicio=hora_inicio,
-            hora_fin=hora_fin,
-        )
+        try:
+            # El trigger de la BD rechaza el solape si otra reserva ganó el mismo horario,
+            # y reclamar_turnos si el turno ya no está libre en el inventario
+            with transaction.atomic():
+                cita = Cita.objects.create(
+                    paciente_id = request.identidad.id, # Usuario de la sesión (ya verificado por rol_required)
+                    medico=medico,
+                    consultorio=consultorio,
+                    especialidad=especialidad,
+                    fecha=fecha,
+                    hora_inicio=hora_inicio,
+                    hora_fin=hora_fin,
+                )
+                turnos.reclamar_turnos(cita, liberar=False)
+        except IntegrityError as e:
+            messages.error(request, Cita.mensaje_integridad(e))
+            return redirect("create_cita")
 
         messages.success(request, "Cita reservada correctamente.")
         return redirect("dashboard_usuario")
@@ -0,0 +1,7 @@
+# gunicorn lee este archivo solo al arrancar en este directorio (startup.sh, citas/carga.py)
+
+
+def post_worker_init(worker):
+    # Cada worker se calienta antes de aceptar conexiones (hospital/salud.py)
+    from hospital import salud
+    salud.calentar_proceso()
@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital.settings')
+# Bajo ASGI cada vista síncrona corre en un hilo creado para su petición: una
+# conexión persistente nunca se vuelve a usar y queda abierta. Como indica la
+# documentación de Django, aquí se desactivan aunque el entorno diga otra cosa
+# (se lee antes que settings.py).
+os.environ['CONN_MAX_AGE'] = '0'
 
 application = get_asgi_application()
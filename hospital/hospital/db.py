@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Perfil de SQLite para varias réplicas sobre el mismo archivo (/data/db.sqlite3).
+# Los PRAGMA de SQLITE_PRAGMAS se aplican a cada conexión nueva; journal_mode=WAL
+# queda guardado en el archivo, el resto es por conexión. WAL necesita que todos
+# los procesos estén en el mismo host (el PVC es ReadWriteOnce, así que lo están).
+
+
+def sentencias_pragma(pragmas=None):
+    pragmas = settings.SQLITE_PRAGMAS if pragmas is None else pragmas
+    return [f"PRAGMA {nombre} = {valor}" for nombre, valor in pragmas.items()]
+
+
+@receiver(connection_created)
+def aplicar_pragmas_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sentencia in sentencias_pragma():
+            cursor.execute(sentencia)
@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+from django.template.loader import get_template
+from django.urls import get_resolver
+from django.utils import timezone
+from login import agenda
+
+# Sondas de Kubernetes. SaludMiddleware va primero en MIDDLEWARE y responde
+# /healthz y /readyz antes de sesiones, CSRF, mensajes y redirección a HTTPS:
+# una sonda no crea sesión ni renderiza plantillas.
+# - /healthz (liveness): el proceso atiende peticiones. No toca la BD.
+# - /readyz (readiness): la BD responde, no hay migraciones pendientes y el
+#   proceso ya se calentó. Las dos últimas se comprueban una vez por proceso.
+# Cada worker se calienta al arrancar (calentar_proceso, desde gunicorn.conf.py),
+# antes de aceptar conexiones: la sonda la contesta un worker cualquiera, así que
+# no puede ser ella quien caliente a los demás.
+RUTA_VIDA = '/healthz'
+RUTA_LISTO = '/readyz'
+
+# Plantillas más pedidas: con DEBUG=False el cargador las deja compiladas en memoria
+PLANTILLAS = ('login.html', 'index.html', 'dashboard_usuario.html', 'dashboard_medico.html', 'control_users.html')
+
+_estado = {'migraciones': False, 'caliente': False, 'arranque_s': None}
+# startup.sh exporta el instante de arranque del contenedor; sin él, el de este proceso
+_inicio = int(os.environ.get('ARRANQUE_INICIO_MS', 0)) / 1000 or time.time()
+_cerrojo = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def comprobar_bd():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def migraciones_pendientes():
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def comprobar_migraciones():
+    if not _estado['migraciones']:
+        pendientes = migraciones_pendientes()
+        if pendientes:
+            raise RuntimeError(f'{len(pendientes)} migraciones pendientes')
+        _estado['migraciones'] = True
+
+
+def calentar():
+    """URLconf, plantillas y alias de caché: lo que cada proceso carga la primera vez."""
+    if _estado['caliente']:
+        return
+    with _cerrojo:
+        if _estado['caliente']:
+            return
+        get_resolver().url_patterns  # importa todas las vistas
+        for nombre in PLANTILLAS:
+            get_template(nombre)
+        for alias in settings.CACHES:
+            caches[alias].get('readyz')  # falla aquí si un backend compartido no responde
+        _estado['caliente'] = True
+
+
+def calentar_proceso():
+    """
+    calentar() y las agendas de hoy (login/agenda.py) en el worker que arranca.
+    Las agendas quedan fuera de la sonda: con muchos médicos tardarían más que
+    su timeoutSeconds.
+    """
+    try:
+        calentar()
+        agenda.precalentar(timezone.localdate())
+    except Exception:
+        # p. ej. modo serve antes de que el Job migre: la sonda repite calentar()
+        logger.warning('Worker warm-up failed; /readyz will retry it', exc_info=True)
+    finally:
+        connections.close_all()  # este hilo no atiende peticiones
+
+
+COMPROBACIONES = {
+    'bd': comprobar_bd,
+    'migraciones': comprobar_migraciones,
+    'cache': calentar,
+}
+
+
+def listo():
+    """Ejecuta las comprobaciones en orden y se detiene en la primera que falla."""
+    resultados = {}
+    for nombre, comprobar in COMPROBACIONES.items():
+        inicio = time.perf_counter()
+        try:
+            comprobar()
+        except Exception as e:
+            resultados[nombre] = f'error: {e}'
+            return False, resultados
+        resultados[nombre] = f'ok ({(time.perf_counter() - inicio) * 1000:.1f} ms)'
+
+    # Tiempo de arranque: desde que empezó el contenedor hasta la primera vez listo
+    if _estado['arranque_s'] is None:
+        _estado['arranque_s'] = round(time.time() - _inicio, 2)
+        logger.info('Ready to serve %s s after boot', _estado['arranque_s'])
+    resultados['arranque_s'] = _estado['arranque_s']
+    return True, resultados
+
+
+class SaludMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ruta = request.path_info.rstrip('/')
+        if ruta == RUTA_VIDA:
+            return JsonResponse({'status': 'ok'})
+        if ruta == RUTA_LISTO:
+            ok, resultados = listo()
+            return JsonResponse({'status': 'ok' if ok else 'error', 'checks': resultados}, status=200 if ok else 503)
+        return self.get_response(request)
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hospital.salud.SaludMiddleware',  # /healthz y /readyz, antes de sesión, CSRF y mensajes
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'login.middleware.IdentidadMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -82,13 +84,123 @@ WSGI_APPLICATION = 'hospital.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Las 5 réplicas de kubernetes/deployment.yaml escriben el mismo archivo SQLite:
+# - transaction_mode IMMEDIATE: las transacciones toman el lock de escritura al
+#   empezar, así esperan su turno (busy_timeout) en lugar de fallar con
+#   "database is locked" al pasar de lectura a escritura.
+# - SQLITE_PRAGMAS se aplica a cada conexión nueva (hospital/db.py).
+# - CONN_MAX_AGE es 0: el servidor de startup.sh es ASGI, donde cada vista síncrona
+#   corre en un hilo nuevo y una conexión persistente nunca se reutiliza (hospital/asgi.py
+#   lo fuerza). Servido por WSGI (hospital/wsgi.py) pasa a 60 y cada worker reutiliza
+#   su conexión y sus PRAGMA entre peticiones.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': config('DATABASE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': {
+            'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+        },
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=20000, cast=int),       # ms
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),                # seguro con WAL
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=134217728, cast=int),         # 128 MB
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-32000, cast=int),          # negativo = KiB (32 MB)
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'disponibilidad' guarda la AgendaDia por (especialidad, fecha). LocMem es por
+# proceso: con varias réplicas usar un backend compartido (p. ej. FileBasedCache
+# en /data) para que la invalidación por señales llegue a todos los pods.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'disponibilidad': {
+        'BACKEND': config('DISPONIBILIDAD_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DISPONIBILIDAD_CACHE_LOCATION', default='disponibilidad'),
+        'TIMEOUT': config('DISPONIBILIDAD_CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('DISPONIBILIDAD_CACHE_MAX_ENTRIES', default=2000, cast=int),
+        },
+    },
+    # Solo con SESSION_BACKEND=cached_db. Con varias réplicas, compartido entre pods.
+    'sesiones': {
+        'BACKEND': config('SESIONES_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('SESIONES_CACHE_LOCATION', default='sesiones'),
+        'TIMEOUT': None,  # la expiración la decide la sesión
+    },
+    # HTML de la agenda del día por (medico, fecha) (login/agenda.py). Para que
+    # precalentar_agendas sirva a los pods, el backend debe ser compartido.
+    'agenda_medico': {
+        'BACKEND': config('AGENDA_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('AGENDA_CACHE_LOCATION', default='agenda_medico'),
+        'TIMEOUT': config('AGENDA_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('AGENDA_CACHE_MAX_ENTRIES', default=2000, cast=int),
+        },
+    },
+    # Identidad de la sesión para rol_required (login/identidad.py). Por proceso y
+    # de vida corta: los cambios de rol en otra réplica se ven al caducar.
+    'identidad': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'identidad',
+        'TIMEOUT': config('IDENTIDAD_CACHE_TIMEOUT', default=60, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
+# Tiempo real del tablero (SSE servido por hospital.asgi)
+# BrokerRegistroCambios reparte entre réplicas leyendo el registro CambioCita;
+# BrokerMemoria solo dentro del proceso (desarrollo / una réplica).
+SCHEDULER_BROKER = config('SCHEDULER_BROKER', default='citas.services.broker.BrokerRegistroCambios')
+SCHEDULER_BROKER_INTERVALO = config('SCHEDULER_BROKER_INTERVALO', default=1.0, cast=float)
+
+# Inventario de turnos (citas.Turno): días hacia adelante que se mantienen generados.
+# Fechas fuera del horizonte se buscan calculando la agenda del día.
+TURNOS_HORIZONTE_DIAS = config('TURNOS_HORIZONTE_DIAS', default=60, cast=int)
+
+
+# Sesiones
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+# login_view solo guarda usuario_id, usuario_nombre y usuario_rol: cabe en una
+# cookie firmada y así ninguna petición lee ni escribe django_session.
+# - signed_cookies (por defecto): sin BD. Una sesión cerrada deja de valer al
+#   borrar la cookie, pero una copia robada vale hasta SESSION_COOKIE_AGE.
+# - cached_db: lee de la caché 'sesiones' y solo va a la BD en un fallo; cada
+#   escritura sigue guardándose en la BD (write-through).
+# - db: el comportamiento anterior.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + config('SESSION_BACKEND', default='signed_cookies')
+SESSION_CACHE_ALIAS = 'sesiones'
+SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=60 * 60 * 12, cast=int)  # 12 h
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# Los mensajes de hospital.* (arranque, sondas) salen por la consola del contenedor.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'hospital': {'handlers': ['console'], 'level': config('HOSPITAL_LOG_LEVEL', default='INFO')},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
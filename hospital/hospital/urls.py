@@ -28,7 +28,11 @@ urlpatterns = [
     # ... admin y api ...
     path('admin/', admin.site.urls),
     path('api/scheduler/', SchedulerDataView.as_view(), name='scheduler_data'),
+    path('api/scheduler/stream/', SchedulerStreamView.as_view(), name='scheduler_stream'),
+    path('api/disponibilidad/', DisponibilidadView.as_view(), name='disponibilidad'),
+    path('api/disponibilidad/cache/', DisponibilidadCacheView.as_view(), name='disponibilidad_cache'),
     path('api/citas/<int:pk>/reprogramar/', ReprogramarCitaView.as_view(), name='reprogramar_cita'),
+    path('api/citas/reprogramar/', ReprogramarLoteView.as_view(), name='reprogramar_lote'),
 
     # ... rutas django generales ...
     path('inicio/', views.index, name="inicio"),
@@ -36,12 +40,16 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('create_user/', views.create_user, name='create_user'),
     path('control_users/',views.control_users,name='control_users'),
+    path('control_users/usuarios/', views.control_users_usuarios, name='control_users_usuarios'),
+    path('api/usuarios/buscar/', views.buscar_usuarios, name='buscar_usuarios'),
     path('logout/', views.logout_view, name='logout'),
     path('delete_user/<int:user_id>/',views.delete_user, name='delete_user'),
     path('update_user/<int:user_id>', views.update_user, name='update_user'),
     path('change_rol/<int:user_id>/', views.change_rol, name='change_rol'),
     path('dashboard_medico/', views.dashboard_medico, name='dashboard_medico'),
+    path('dashboard_medico/historial/', views.dashboard_medico_historial, name='dashboard_medico_historial'),
     path('dashboard_usuario/', views.dashboard_usuario, name='dashboard_usuario'),
+    path('dashboard_usuario/pasadas/', views.dashboard_usuario_pasadas, name='dashboard_usuario_pasadas'),
     path('create_medico/', views.create_medico, name='create_medico'),
     path('create_consultorio/', views.create_consultorio, name='create_consultorio'),
     path('create_horario/', views.create_horario, name='create_horario'),
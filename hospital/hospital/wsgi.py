@@ -12,6 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital.settings')
+# Cada worker WSGI atiende sus peticiones en el mismo hilo: puede reutilizar la conexión
+os.environ.setdefault('CONN_MAX_AGE', '60')
 
 application = get_wsgi_application()
 
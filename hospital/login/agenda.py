@@ -0,0 +1,84 @@
+import time
+from datetime import date
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from citas.models import Cita, Horario
+
+# Agenda del día del médico ya renderizada (HTML de "Citas de Hoy") por
+# (medico, fecha). Igual que la caché de disponibilidad, cada entrada guarda la
+# generación con la que se renderizó: las señales de login/signals.py renuevan
+# la generación de ese (medico, fecha) y la siguiente lectura vuelve a renderizar.
+ALIAS_CACHE = 'agenda_medico'
+PLANTILLA = 'dashboard_medico_agenda.html'
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _como_fecha(fecha):
+    if isinstance(fecha, str):
+        return date.fromisoformat(fecha)
+    return fecha
+
+
+def _clave_entrada(medico_id, fecha):
+    return f'agenda:{medico_id}:{fecha.isoformat()}'
+
+
+def _claves_generacion(medico_id, fecha):
+    return ['gen', f'gen:{medico_id}:{fecha.isoformat()}']
+
+
+def renderizar(medico_id, fecha):
+    citas = Cita.objects.filter(
+        medico_id=medico_id,
+        fecha=fecha
+    ).select_related('paciente', 'especialidad', 'consultorio').order_by('hora_inicio')
+    return render_to_string(PLANTILLA, {'citas_hoy': citas})
+
+
+def obtener(medico_id, fecha):
+    """HTML de la agenda de la cache si sigue vigente; si no, la renderiza y la guarda."""
+    fecha = _como_fecha(fecha)
+    clave = _clave_entrada(medico_id, fecha)
+    claves_gen = _claves_generacion(medico_id, fecha)
+
+    valores = _cache().get_many([clave] + claves_gen)
+    generacion = tuple(valores.get(k) for k in claves_gen)
+
+    entrada = valores.get(clave)
+    if entrada is None or entrada[0] != generacion:
+        entrada = (generacion, renderizar(medico_id, fecha))
+        _cache().set(clave, entrada)
+    return mark_safe(entrada[1])
+
+
+def precalentar(fecha):
+    """Renderiza la agenda de cada médico que atiende o tiene citas ese día. Devuelve cuántas."""
+    medicos = set(Horario.objects.filter(dia_semana=fecha.weekday()).values_list('medico_id', flat=True))
+    medicos |= set(Cita.objects.filter(fecha=fecha).values_list('medico_id', flat=True))
+    for medico_id in sorted(medicos):
+        obtener(medico_id, fecha)
+    return len(medicos)
+
+
+def _renovar(*claves):
+    # Valor nuevo (no incremental): si la clave fue desalojada no puede "volver" a un valor viejo
+    _cache().set_many({clave: time.time_ns() for clave in claves}, timeout=None)
+
+
+def invalidar(pares):
+    """Invalida las agendas de los (medico_id, fecha) dados."""
+    claves = {
+        _claves_generacion(medico_id, _como_fecha(fecha))[1]
+        for medico_id, fecha in pares
+        if medico_id is not None and fecha is not None
+    }
+    if claves:
+        _renovar(*claves)
+
+
+def invalidar_todo():
+    _renovar('gen')
@@ -0,0 +1,72 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .models import Usuario
+
+# Búsqueda de usuarios por prefijo sobre el índice FTS5 login_usuario_fts
+# (migración 0004). Cada palabra escrita debe coincidir con el inicio de alguna
+# palabra de nombres, apellidos, cédula o email: "ga pér" encuentra a Galo Pérez.
+# En bases que no son SQLite se usa icontains.
+
+
+def _terminos(texto):
+    # Solo letras y dígitos: los operadores de FTS5 no llegan a la consulta
+    return [t for t in re.split(r'[^\w]+', texto.lower()) if t]
+
+
+def consulta_fts(texto):
+    """Expresión MATCH ('"galo"* "perez"*') o None si no hay nada que buscar."""
+    terminos = _terminos(texto)
+    if not terminos:
+        return None
+    return ' '.join(f'"{t}"*' for t in terminos)
+
+
+def ids_coincidentes(texto):
+    """Subconsulta con los ids de los usuarios que coinciden (para filtros __in)."""
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return None
+    if connection.vendor == 'sqlite':
+        return RawSQL("SELECT rowid FROM login_usuario_fts WHERE login_usuario_fts MATCH %s", (consulta,))
+
+    filtro = Q()
+    for termino in _terminos(texto):
+        filtro &= (Q(nombres__icontains=termino) | Q(apellidos__icontains=termino)
+                   | Q(cedula__icontains=termino) | Q(email__icontains=termino))
+    return Usuario.objects.filter(filtro).values('id')
+
+
+def buscar(texto, rol=None, despues=None, limite=20, campos=('id', 'nombres', 'apellidos', 'cedula', 'email', 'rol')):
+    """
+    Usuarios que coinciden, por id ascendente y desde `despues` (keyset). El
+    índice entrega los rowid ya ordenados, así que la consulta para en cuanto
+    junta `limite` filas en lugar de reunir todas las coincidencias.
+    """
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return []
+    if connection.vendor != 'sqlite':
+        usuarios = Usuario.objects.filter(id__in=ids_coincidentes(texto)).only(*campos).order_by('id')
+        if rol:
+            usuarios = usuarios.filter(rol=rol)
+        if despues:
+            usuarios = usuarios.filter(id__gt=despues)
+        return list(usuarios[:limite])
+
+    sql = [
+        "SELECT " + ", ".join(f"u.{c}" for c in campos),
+        "FROM login_usuario_fts f JOIN login_usuario u ON u.id = f.rowid",
+        "WHERE login_usuario_fts MATCH %s",
+    ]
+    params = [consulta]
+    if rol:
+        sql.append("AND u.rol = %s")
+        params.append(rol)
+    if despues:
+        sql.append("AND f.rowid > %s")
+        params.append(despues)
+    sql.append("ORDER BY f.rowid LIMIT %s")
+    params.append(limite)
+    return list(Usuario.objects.raw(" ".join(sql), params))
@@ -0,0 +1,65 @@
+from django.db.models import Count, F, Q
+from .models import Contador, Usuario
+
+# Claves de Contador y de dónde sale cada una. Cada grupo se recuenta con una
+# sola consulta de agregación condicional.
+ROLES = ('admin', 'medico', 'usuario')
+TIPOS = ('interno', 'externo')
+
+
+def _grupos():
+    from citas.models import Cita, Consultorio, Especialidad, Medico
+
+    return [
+        (Usuario, 'usuarios', 'rol', ROLES),
+        (Medico, 'medicos', 'tipo', TIPOS),
+        (Consultorio, 'consultorios', 'tipo', TIPOS),
+        (Cita, 'citas', None, ()),
+        (Especialidad, 'especialidades', None, ()),
+    ]
+
+
+def clave(prefijo, valor=None):
+    return f'{prefijo}:{valor}' if valor else f'{prefijo}:total'
+
+
+def recontar():
+    """Recalcula todos los contadores (una consulta por tabla) y los guarda."""
+    valores = {}
+    for modelo, prefijo, campo, opciones in _grupos():
+        agregados = {'total': Count('pk')}
+        for opcion in opciones:
+            agregados[opcion] = Count('pk', filter=Q(**{campo: opcion}))
+        for nombre, valor in modelo.objects.aggregate(**agregados).items():
+            valores[clave(prefijo, None if nombre == 'total' else nombre)] = valor
+
+    Contador.objects.bulk_create(
+        [Contador(clave=k, valor=v) for k, v in valores.items()],
+        update_conflicts=True, unique_fields=['clave'], update_fields=['valor'],
+    )
+    return valores
+
+
+def leer():
+    """Todos los contadores en una consulta (se generan la primera vez)."""
+    valores = dict(Contador.objects.values_list('clave', 'valor'))
+    return valores or recontar()
+
+
+def ajustar(prefijo, delta, valor=None):
+    """Suma `delta` al total del grupo y, si se indica, al subgrupo `valor`."""
+    claves = [clave(prefijo)] + ([clave(prefijo, valor)] if valor else [])
+    actualizados = Contador.objects.filter(clave__in=claves).update(valor=F('valor') + delta)
+    if actualizados < len(claves):
+        # Tabla aún vacía: el recuento ya incluye este cambio
+        recontar()
+
+
+def mover(prefijo, anterior, actual):
+    """Un registro pasó de un subgrupo a otro (p. ej. cambio de rol)."""
+    if anterior == actual:
+        return
+    if anterior:
+        Contador.objects.filter(clave=clave(prefijo, anterior)).update(valor=F('valor') - 1)
+    if actual:
+        Contador.objects.filter(clave=clave(prefijo, actual)).update(valor=F('valor') + 1)
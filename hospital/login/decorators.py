@@ -1,7 +1,6 @@
 # hospital/login/decorators.py
 from django.shortcuts import redirect
 from django.contrib import messages
-from .models import Usuario
 
 def login_required(view_func):
     """
@@ -28,14 +27,14 @@ def rol_required(rol_requerido):
                 messages.warning(request, 'Debes iniciar sesión')
                 return redirect('login')
             
-            try:
-                usuario = Usuario.objects.get(id=request.session['usuario_id'])
-                if usuario.rol != rol_requerido:
-                    messages.error(request, f'No tienes permisos. Se requiere rol: {rol_requerido}')
-                    return redirect('index')
-            except Usuario.DoesNotExist:
+            # Identidad cacheada: sin consultas en el caso común
+            identidad = request.identidad
+            if not identidad.existe:
                 messages.error(request, 'Usuario no encontrado')
                 return redirect('login')
+            if identidad.rol != rol_requerido:
+                messages.error(request, f'No tienes permisos. Se requiere rol: {rol_requerido}')
+                return redirect('index')
             
             return view_func(request, *args, **kwargs)
         
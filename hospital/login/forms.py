@@ -208,6 +208,11 @@ class CreateHorarioForm(forms.ModelForm):
             'dia_semana': forms.Select(attrs={'class': 'form-control'}),
         }
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Cada opción muestra str(medico): usuario y especialidad en la misma consulta
+        self.fields['medico'].queryset = Medico.objects.select_related('usuario', 'especialidad')
+    
     def clean(self):
         cleaned_data = super().clean()
         
@@ -0,0 +1,70 @@
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from .models import Usuario
+
+# Identidad del usuario de la sesión (id, rol, nombres, apellidos) guardada en una
+# caché por proceso de vida corta. Los cambios hechos en este proceso la invalidan
+# por señales (login/signals.py); los de otras réplicas caducan con el TIMEOUT.
+ALIAS_CACHE = 'identidad'
+CAMPOS = ('id', 'rol', 'nombres', 'apellidos')
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _clave(usuario_id):
+    return f'identidad:{usuario_id}'
+
+
+def obtener(usuario_id):
+    """Datos de identidad del usuario o None si ya no existe."""
+    datos = _cache().get(_clave(usuario_id))
+    if datos is None:
+        datos = Usuario.objects.filter(pk=usuario_id).values(*CAMPOS).first()
+        if datos is not None:
+            _cache().set(_clave(usuario_id), datos)
+    return datos
+
+
+def invalidar(usuario_id):
+    _cache().delete(_clave(usuario_id))
+
+
+class Identidad:
+    """
+    Se adjunta a cada petición como `request.identidad` (IdentidadMiddleware).
+    No consulta nada hasta que se lee un atributo; el rol sale de la caché y
+    `usuario` carga el modelo completo solo si la vista lo necesita.
+    """
+
+    def __init__(self, usuario_id):
+        self.id = usuario_id
+
+    @cached_property
+    def _datos(self):
+        return obtener(self.id) if self.id is not None else None
+
+    @property
+    def autenticado(self):
+        return self.id is not None
+
+    @property
+    def existe(self):
+        return self._datos is not None
+
+    @property
+    def rol(self):
+        return self._datos['rol'] if self._datos else None
+
+    @property
+    def nombres(self):
+        return self._datos['nombres'] if self._datos else ''
+
+    @property
+    def apellidos(self):
+        return self._datos['apellidos'] if self._datos else ''
+
+    @cached_property
+    def usuario(self):
+        return Usuario.objects.get(pk=self.id)
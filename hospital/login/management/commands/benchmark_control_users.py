@@ -0,0 +1,122 @@
+import statistics
+import time
+from datetime import date, time as hora, timedelta
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from citas.models import Cita, Consultorio, Especialidad, Medico
+from login import contadores
+from login.models import Usuario
+
+CLAVE = 'bench'
+
+
+class _Deshacer(Exception):
+    pass
+
+
+def estadisticas_por_conteo():
+    """Lo que hacía control_users antes: un COUNT por cifra del panel (mismas claves que contadores.leer)."""
+    usuarios, medicos = Usuario.objects.all(), Medico.objects.all()
+    return {
+        'usuarios:total': usuarios.count(),
+        'usuarios:admin': usuarios.filter(rol='admin').count(),
+        'usuarios:medico': usuarios.filter(rol='medico').count(),
+        'usuarios:usuario': usuarios.filter(rol='usuario').count(),
+        'medicos:interno': medicos.filter(tipo='interno').count(),
+        'medicos:externo': medicos.filter(tipo='externo').count(),
+        'medicos:total': medicos.count(),
+        'consultorios:interno': Consultorio.objects.filter(tipo='interno').count(),
+        'consultorios:externo': Consultorio.objects.filter(tipo='externo').count(),
+        'citas:total': Cita.objects.count(),
+        'especialidades:total': Especialidad.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Times GET /control_users/ as an admin while Usuario and Cita grow, with the counter table and with the '
+        'old per-figure COUNTs. Synthetic rows are inserted inside a transaction that is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000,100000,300000',
+                            help='Cumulative Usuario/Cita row counts to measure (default: 1000,10000,100000,300000)')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Timed runs per size (default: 20)')
+
+    def handle(self, *args, **options):
+        tamanos = sorted(int(t) for t in options['tamanos'].split(','))
+        medico = Medico.objects.first()
+        if medico is None:
+            raise CommandError('At least one Medico is required (run seed_demo_data.py first).')
+
+        self.stdout.write(f"{'rows':>8} {'page ms':>9} {'q':>3} {'with COUNTs ms':>15} {'q':>3}")
+        setup_test_environment()  # ALLOWED_HOSTS con 'testserver' para el cliente
+        try:
+            with transaction.atomic():
+                admin = self._admin()
+                actuales = 0
+                for tamano in tamanos:
+                    self._crecer(medico, actuales, tamano)
+                    actuales = tamano
+                    contadores.recontar()  # bulk_create no dispara señales
+
+                    ahora_ms, ahora_q = self._medir(admin, options['repeticiones'])
+                    with mock.patch.object(contadores, 'leer', estadisticas_por_conteo):
+                        antes_ms, antes_q = self._medir(admin, options['repeticiones'])
+                    self.stdout.write(f'{tamano:>8} {ahora_ms:>9.2f} {ahora_q:>3} {antes_ms:>15.2f} {antes_q:>3}')
+                raise _Deshacer
+        except _Deshacer:
+            pass
+        finally:
+            teardown_test_environment()
+        self.stdout.write(self.style.SUCCESS('Median per page load; synthetic rows rolled back.'))
+
+    def _admin(self):
+        Usuario.objects.create(
+            nombres='Bench', apellidos='Admin', cedula='B-admin', telefono='0999999999', email='admin@bench.local',
+            fecha_nacimiento=date(1990, 1, 1), genero='O', password=make_password(CLAVE), rol='admin',
+        )
+        cliente = Client()
+        if cliente.post('/login/', {'email': 'admin@bench.local', 'password': CLAVE}).status_code != 302:
+            raise CommandError('Could not log in as the benchmark admin')
+        return cliente
+
+    def _crecer(self, medico, desde, hasta):
+        Usuario.objects.bulk_create([
+            Usuario(
+                nombres=f'Bench {n}', apellidos='Sintetico', cedula=f'B{n:012d}', telefono='0999999999',
+                email=f'bench{n}@bench.local', fecha_nacimiento=date(1990, 1, 1), genero='O',
+                password='!', rol='usuario',
+            )
+            for n in range(desde, hasta)
+        ], batch_size=2000)
+        pacientes = list(Usuario.objects.filter(email__endswith='@bench.local').values_list('pk', flat=True)[:1000])
+
+        # Citas de 30 min sin solaparse: 20 por día desde el año 3000
+        base = date(3000, 1, 1)
+        Cita.objects.bulk_create([
+            Cita(
+                paciente_id=pacientes[n % len(pacientes)], medico=medico, especialidad_id=medico.especialidad_id,
+                fecha=base + timedelta(days=n // 20),
+                hora_inicio=hora(8 + (n % 20) // 2, 30 * (n % 2)),
+                hora_fin=hora(8 + (n % 20 + 1) // 2, 30 * ((n + 1) % 2)),
+            )
+            for n in range(desde, hasta)
+        ], batch_size=2000)
+
+    def _medir(self, admin, repeticiones):
+        caches['identidad'].clear()
+        tiempos = []
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                respuesta = admin.get('/control_users/')
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code != 200:
+                raise CommandError(f'/control_users/ returned HTTP {respuesta.status_code}')
+        return statistics.median(tiempos), len(consultas)
@@ -0,0 +1,22 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from login import agenda
+
+class Command(BaseCommand):
+    help = "Renders each doctor's agenda for a date into the agenda cache (default: tomorrow; run the evening before)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', default=None, help='Date to warm, YYYY-MM-DD (default: tomorrow)')
+
+    def handle(self, *args, **options):
+        if options['fecha']:
+            try:
+                fecha = date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('--fecha must be YYYY-MM-DD')
+        else:
+            fecha = timezone.localdate() + timedelta(days=1)
+
+        total = agenda.precalentar(fecha)
+        self.stdout.write(self.style.SUCCESS(f'Warmed {total} agendas for {fecha.isoformat()}.'))
@@ -0,0 +1,29 @@
+import time
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+class Command(BaseCommand):
+    help = 'Deletes expired rows from django_session in small chunks so other writers are not blocked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Rows deleted per transaction (default: 500)')
+        parser.add_argument('--pausa', type=float, default=0.05, help='Seconds to wait between chunks (default: 0.05)')
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        total = 0
+
+        while True:
+            # Cada lote es una transacción corta: el lock de escritura se suelta entre lotes
+            claves = list(
+                Session.objects.filter(expire_date__lt=ahora)
+                .values_list('session_key', flat=True)[:options['lote']]
+            )
+            if not claves:
+                break
+            borradas, _ = Session.objects.filter(session_key__in=claves).delete()
+            total += borradas
+            time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired sessions.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from login import contadores
+
+class Command(BaseCommand):
+    help = 'Recomputes the control_users counters (run after bulk imports or raw SQL changes)'
+
+    def handle(self, *args, **options):
+        valores = contadores.recontar()
+        for clave, valor in sorted(valores.items()):
+            self.stdout.write(f'{clave:<24} {valor}')
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(valores)} counters.'))
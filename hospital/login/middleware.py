@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+from .identidad import Identidad
+
+
+class IdentidadMiddleware:
+    """Adjunta `request.identidad` (perezosa: no lee la sesión hasta usarla)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.identidad = SimpleLazyObject(lambda: Identidad(request.session.get('usuario_id')))
+        return self.get_response(request)
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+
+# Índice de texto completo (FTS5) sobre nombres, apellidos, cédula y email de
+# login_usuario, como tabla de contenido externo: guarda solo el índice y los
+# triggers lo mantienen al día con cualquier INSERT/UPDATE/DELETE (incluidos
+# bulk_create y update(), que no disparan señales). Ver login/busqueda.py.
+CREAR = [
+    """
+    CREATE VIRTUAL TABLE login_usuario_fts USING fts5(
+        nombres, apellidos, cedula, email,
+        content='login_usuario', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER login_usuario_fts_insert AFTER INSERT ON login_usuario BEGIN
+        INSERT INTO login_usuario_fts(rowid, nombres, apellidos, cedula, email)
+        VALUES (NEW.id, NEW.nombres, NEW.apellidos, NEW.cedula, NEW.email);
+    END
+    """,
+    """
+    CREATE TRIGGER login_usuario_fts_delete AFTER DELETE ON login_usuario BEGIN
+        INSERT INTO login_usuario_fts(login_usuario_fts, rowid, nombres, apellidos, cedula, email)
+        VALUES ('delete', OLD.id, OLD.nombres, OLD.apellidos, OLD.cedula, OLD.email);
+    END
+    """,
+    """
+    CREATE TRIGGER login_usuario_fts_update AFTER UPDATE OF nombres, apellidos, cedula, email ON login_usuario BEGIN
+        INSERT INTO login_usuario_fts(login_usuario_fts, rowid, nombres, apellidos, cedula, email)
+        VALUES ('delete', OLD.id, OLD.nombres, OLD.apellidos, OLD.cedula, OLD.email);
+        INSERT INTO login_usuario_fts(rowid, nombres, apellidos, cedula, email)
+        VALUES (NEW.id, NEW.nombres, NEW.apellidos, NEW.cedula, NEW.email);
+    END
+    """,
+    # Indexa los usuarios que ya existen
+    "INSERT INTO login_usuario_fts(login_usuario_fts) VALUES ('rebuild')",
+]
+BORRAR = [
+    "DROP TRIGGER IF EXISTS login_usuario_fts_insert",
+    "DROP TRIGGER IF EXISTS login_usuario_fts_delete",
+    "DROP TRIGGER IF EXISTS login_usuario_fts_update",
+    "DROP TABLE IF EXISTS login_usuario_fts",
+]
+
+
+def crear_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREAR:
+        schema_editor.execute(sql)
+
+
+def borrar_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in BORRAR:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0003_contador'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_fts, borrar_fts),
+    ]
@@ -104,4 +104,14 @@ class Usuario(models.Model):
         return f"{self.telefono}"
 
     def __str__(self):
-        return f"{self.nombres} {self.apellidos}"
\ No newline at end of file
+        return f"{self.nombres} {self.apellidos}"
+
+# Contadores del panel de control_users (login/contadores.py). Las señales los
+# mantienen al día en la misma transacción que el cambio; `recontar_contadores`
+# los rehace si algo los modificó sin señales (bulk_create, update()).
+class Contador(models.Model):
+    clave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
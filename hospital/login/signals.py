@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from citas.models import Cita, Consultorio, Especialidad, Medico
+from .models import Usuario
+from . import agenda, contadores, identidad
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_identidad(sender, instance, **kwargs):
+    # change_rol, update_user y delete_user pasan por save()/delete()
+    usuario_id = instance.pk
+    transaction.on_commit(lambda: identidad.invalidar(usuario_id))
+
+
+# ===== CONTADORES DEL PANEL (misma transacción que el cambio) =====
+GRUPOS = {
+    # modelo: (prefijo, campo del subgrupo)
+    Usuario: ('usuarios', 'rol'),
+    Medico: ('medicos', 'tipo'),
+    Consultorio: ('consultorios', 'tipo'),
+    Cita: ('citas', None),
+    Especialidad: ('especialidades', None),
+}
+
+
+def _subgrupo_anterior(instance, campo):
+    if hasattr(instance, 'valor_original'):
+        return instance.valor_original(campo)
+    return getattr(instance, '_subgrupo_anterior', None)
+
+
+@receiver(pre_save, sender=Usuario)
+@receiver(pre_save, sender=Consultorio)
+def recordar_subgrupo(sender, instance, **kwargs):
+    # Usuario y Consultorio no rastrean cambios: se lee el valor guardado
+    campo = GRUPOS[sender][1]
+    instance._subgrupo_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list(campo, flat=True).first()
+        if instance.pk else None
+    )
+
+
+def contar_guardado(sender, instance, created, **kwargs):
+    prefijo, campo = GRUPOS[sender]
+    if created:
+        contadores.ajustar(prefijo, 1, getattr(instance, campo) if campo else None)
+    elif campo:
+        contadores.mover(prefijo, _subgrupo_anterior(instance, campo), getattr(instance, campo))
+
+
+def contar_eliminado(sender, instance, **kwargs):
+    prefijo, campo = GRUPOS[sender]
+    contadores.ajustar(prefijo, -1, getattr(instance, campo) if campo else None)
+
+
+for _modelo in GRUPOS:
+    post_save.connect(contar_guardado, sender=_modelo, dispatch_uid=f'contar_guardado_{_modelo.__name__}')
+    post_delete.connect(contar_eliminado, sender=_modelo, dispatch_uid=f'contar_eliminado_{_modelo.__name__}')
+
+
+# ===== AGENDA DEL MÉDICO (HTML en caché por medico y fecha) =====
+@receiver([post_save, post_delete], sender=Cita)
+def invalidar_agenda_cita(sender, instance, **kwargs):
+    # Incluye el (medico, fecha) de donde salió una cita reprogramada
+    pares = {
+        (instance.medico_id, instance.fecha),
+        (instance.valor_original('medico_id'), instance.valor_original('fecha')),
+    }
+    transaction.on_commit(lambda: agenda.invalidar(pares))
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_agenda_paciente(sender, instance, created, **kwargs):
+    # La agenda muestra nombre y teléfono del paciente: solo sus citas desde hoy
+    if created:
+        return
+    pares = set(
+        Cita.objects.filter(
+            paciente_id=instance.pk, fecha__gte=timezone.localdate()
+        ).values_list('medico_id', 'fecha')
+    )
+    if pares:
+        transaction.on_commit(lambda: agenda.invalidar(pares))
+
+
+@receiver([post_save, post_delete], sender=Especialidad)
+@receiver([post_save, post_delete], sender=Consultorio)
+def invalidar_agendas(sender, instance, **kwargs):
+    # Nombres de especialidad y consultorio aparecen en todas las agendas
+    transaction.on_commit(agenda.invalidar_todo)
@@ -0,0 +1,179 @@
+from datetime import date, time, timedelta
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from citas import sintetico
+from citas.models import Cita, Consultorio, Especialidad, Medico
+from .models import Usuario
+from . import agenda, busqueda, contadores
+
+
+def nuevo_usuario(n, rol='usuario', **campos):
+    return Usuario.objects.create(**{
+        'nombres': f'Prueba {n}', 'apellidos': 'Login', 'cedula': sintetico.cedula(10 ** 6 + n),
+        'telefono': '0999999999', 'email': f'prueba{n}@login.local', 'fecha_nacimiento': date(1990, 1, 1),
+        'genero': 'F', 'password': '-', 'rol': rol, **campos,
+    })
+
+
+class HospitalSintetico(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        sintetico.construir_hospital(medicos=8, pacientes=20, dias=10, semilla=1)
+
+
+class ContadoresDelPanel(HospitalSintetico):
+    """Los Contador que ajustan las señales valen lo mismo que un COUNT(*) de cada tabla."""
+
+    def assertCuadran(self):
+        leidos = contadores.leer()
+        self.assertEqual(leidos, contadores.recontar())
+
+    def test_usuarios_alta_cambio_de_rol_y_baja(self):
+        usuario = nuevo_usuario(1)
+        self.assertCuadran()
+        usuario.rol = 'admin'
+        usuario.save()
+        self.assertCuadran()
+        usuario.delete()
+        self.assertCuadran()
+
+    def test_consultorios_alta_cambio_de_tipo_y_baja(self):
+        consultorio = Consultorio.objects.create(numero=1, tipo='interno')
+        self.assertCuadran()
+        consultorio.tipo = 'externo'
+        consultorio.save()
+        self.assertCuadran()
+        consultorio.delete()
+        self.assertCuadran()
+
+    def test_medico_cambia_de_tipo_y_se_borra_en_cascada(self):
+        medico = Medico.objects.filter(tipo='interno').first()
+        medico.tipo, medico.consultorio = 'externo', None
+        medico.save()
+        self.assertCuadran()
+        # Borrar el usuario borra el médico y sus citas (CASCADE, una señal por fila)
+        medico.usuario.delete()
+        self.assertCuadran()
+
+    def test_citas_y_especialidades(self):
+        cita = Cita.objects.first()
+        Cita.objects.create(
+            paciente=cita.paciente, medico=cita.medico, consultorio=cita.consultorio,
+            especialidad=cita.especialidad, fecha=date(2000, 1, 3), hora_inicio=time(10), hora_fin=time(10, 15),
+        )
+        cita.delete()
+        self.assertCuadran()
+        especialidad = Especialidad.objects.create(nombre='Prueba', duracion_cita=15)
+        self.assertCuadran()
+        Especialidad.objects.exclude(pk=especialidad.pk).first().delete()
+        self.assertCuadran()
+
+
+class BusquedaFts(TestCase):
+    """login_usuario_fts sigue a login_usuario por sus triggers; busqueda arma consultas MATCH seguras."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.galo = nuevo_usuario(1, nombres='Galo', apellidos='Pérez Ortega')
+        cls.otro = nuevo_usuario(2, nombres='Mathias', apellidos='Reyes')
+
+    def ids(self, texto):
+        return [u.id for u in busqueda.buscar(texto)]
+
+    def test_prefijos_sin_tildes_y_en_cualquier_campo(self):
+        self.assertEqual(self.ids('ga pér'), [self.galo.pk])
+        self.assertEqual(self.ids('GALO perez'), [self.galo.pk])
+        self.assertEqual(self.ids(self.galo.cedula[:6]), [self.galo.pk])
+        self.assertEqual(self.ids('prueba'), [self.galo.pk, self.otro.pk])  # email
+        self.assertEqual(list(Usuario.objects.filter(id__in=busqueda.ids_coincidentes('orte'))), [self.galo])
+
+    def test_sigue_al_renombrar(self):
+        self.galo.nombres = 'Gabriel'
+        self.galo.save()
+        self.assertEqual(self.ids('galo'), [])
+        self.assertEqual(self.ids('gabr'), [self.galo.pk])
+
+        # update() no dispara señales, pero sí los triggers
+        Usuario.objects.filter(pk=self.otro.pk).update(apellidos='Zambrano')
+        self.assertEqual(self.ids('reyes'), [])
+        self.assertEqual(self.ids('zamb'), [self.otro.pk])
+
+    def test_sigue_al_borrar(self):
+        self.galo.delete()
+        self.assertEqual(self.ids('galo'), [])
+        self.assertEqual(self.ids('prueba'), [self.otro.pk])
+
+    def test_caracteres_especiales_de_fts(self):
+        for texto in ['"', '*', '-', '"*-', '^', ':', '()']:
+            with self.subTest(texto):
+                self.assertIsNone(busqueda.consulta_fts(texto))
+                self.assertEqual(self.ids(texto), [])
+        # Palabras de operadores de FTS5: se buscan como texto y no rompen la consulta
+        for texto in ['" OR *', 'NEAR(galo', 'galo AND', 'NOT']:
+            with self.subTest(texto):
+                busqueda.buscar(texto)
+        # Los operadores quedan como texto entre comillas, no como sintaxis
+        self.assertEqual(busqueda.consulta_fts('ga* -pérez "x'), '"ga"* "pérez"* "x"*')
+        self.assertEqual(self.ids('"galo"'), [self.galo.pk])
+        self.assertEqual(self.ids('galo -pérez'), [self.galo.pk])
+        self.assertEqual(self.ids('galo NOT pérez'), [])
+
+
+class AgendaEnCache(HospitalSintetico):
+    """Un cambio de cita vuelve a renderizar solo las agendas (medico, fecha) que toca."""
+
+    def setUp(self):
+        caches[agenda.ALIAS_CACHE].clear()
+        self.m1, self.m2 = Medico.objects.filter(tipo='interno')[:2]
+        self.d1 = timezone.localdate() + timedelta(days=1)
+        self.d2 = self.d1 + timedelta(days=1)
+        self.agendas = [(self.m1.pk, self.d1), (self.m1.pk, self.d2), (self.m2.pk, self.d1)]
+        self.cita = self.cita_a_las_6(self.m1, self.d1)
+        self.renderizadas()
+
+    def cita_a_las_6(self, medico, fecha):
+        # A las 6:00 no hay citas sintéticas (los horarios empiezan a las 7)
+        return Cita.objects.create(
+            paciente=Usuario.objects.filter(rol='usuario').first(), medico=medico, consultorio=medico.consultorio,
+            especialidad=medico.especialidad, fecha=fecha, hora_inicio=time(6),
+            hora_fin=time(6, medico.especialidad.duracion_cita),
+        )
+
+    def renderizadas(self):
+        """Lee todas las agendas y devuelve las que hubo que volver a renderizar."""
+        with mock.patch.object(agenda, 'renderizar', wraps=agenda.renderizar) as renderizar:
+            for medico_id, fecha in self.agendas:
+                agenda.obtener(medico_id, fecha)
+        return {llamada.args for llamada in renderizar.call_args_list}
+
+    def test_cita_nueva_solo_su_agenda(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cita_a_las_6(self.m2, self.d1)
+        self.assertEqual(self.renderizadas(), {(self.m2.pk, self.d1)})
+        self.assertEqual(self.renderizadas(), set())
+
+    def test_cita_movida_y_borrada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cita.fecha = self.d2
+            self.cita.save()
+        self.assertEqual(self.renderizadas(), {(self.m1.pk, self.d1), (self.m1.pk, self.d2)})
+        self.assertIn(self.cita.paciente.nombres, agenda.obtener(self.m1.pk, self.d2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cita.delete()
+        self.assertEqual(self.renderizadas(), {(self.m1.pk, self.d2)})
+
+    def test_paciente_renombrado(self):
+        paciente = self.cita.paciente
+        with self.captureOnCommitCallbacks(execute=True):
+            paciente.nombres = 'Renombrado'
+            paciente.save()
+        # Las agendas de todas sus citas desde hoy (también las sintéticas), y ninguna otra
+        suyas = set(
+            Cita.objects.filter(paciente=paciente, fecha__gte=timezone.localdate()).values_list('medico_id', 'fecha')
+        )
+        self.assertEqual(self.renderizadas(), suyas & set(self.agendas))
+        self.assertIn('Renombrado', agenda.obtener(self.m1.pk, self.d1))
@@ -1,12 +1,15 @@
 from django.shortcuts import render, HttpResponse, redirect
+from django.http import JsonResponse
+from django.db.models import Q
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
 from .models import Usuario
-from citas.models import Medico, Cita, Especialidad, Consultorio, Horario
+from citas.models import Medico, Cita, Horario
 from .forms import CreateMedicoForm, CreateConsultorioForm, CreateHorarioForm, CreateEspecialidadForm
 from .decorators import login_required, rol_required
+from . import agenda, busqueda, contadores
 
 # Redirect functions for nav ----------------------------
 def index(request):
@@ -103,62 +106,94 @@ def logout_view(request):
     messages.success(request, 'Has cerrado sesión correctamente')
     return redirect('index')
 
+# Tabla de usuarios de control_users: páginas por id (keyset), solo las columnas que se muestran
+USUARIOS_POR_PAGINA = 50
+USUARIOS_POR_PAGINA_MAX = 200
+
+
+def _pagina_usuarios(rol=None, buscar=None, despues=None, limite=USUARIOS_POR_PAGINA):
+    # Una fila de más dice si hay otra página sin contar la tabla
+    campos = ('id', 'nombres', 'apellidos', 'email', 'cedula', 'telefono', 'rol')
+    if buscar:
+        filas = busqueda.buscar(buscar, rol=rol, despues=despues, limite=limite + 1, campos=campos)
+    else:
+        usuarios = Usuario.objects.only(*campos).order_by('id')
+        if rol:
+            usuarios = usuarios.filter(rol=rol)
+        if despues:
+            usuarios = usuarios.filter(id__gt=despues)
+        filas = list(usuarios[:limite + 1])
+    siguiente = filas[limite - 1].id if len(filas) > limite else None
+    return filas[:limite], siguiente
+
+
 @rol_required('admin')
 def control_users(request):
-    usuarios = Usuario.objects.all()
-    medicos = Medico.objects.select_related('usuario', 'especialidad', 'consultorio')
-    citas = Cita.objects.select_related('medico', 'paciente', 'especialidad')
-    
-    # Estadísticas de usuarios
-    total_usuarios = usuarios.count()
-    total_admins = usuarios.filter(rol='admin').count()
-    total_medicos_usuarios = usuarios.filter(rol='medico').count()
-    total_usuarios_normales = usuarios.filter(rol='usuario').count()
-    
-    # Estadísticas de médicos
-    total_medicos_internos = medicos.filter(tipo='interno').count()
-    total_medicos_externos = medicos.filter(tipo='externo').count()
-    total_medicos_activos = medicos.count()
+    # Solo la primera página: el resto lo pide la tabla a control_users_usuarios
+    usuarios, siguiente = _pagina_usuarios()
     
-    # Estadísticas de consultorios
-    total_consultorios_internos = Consultorio.objects.filter(tipo='interno').count()
-    total_consultorios_externos = Consultorio.objects.filter(tipo='externo').count()
-    
-    # Estadísticas de citas
-    total_citas = citas.count()
-    
-    # Especialidades
-    especialidades = Especialidad.objects.all().count()
+    # Estadísticas: una consulta a la tabla de contadores (login/contadores.py)
+    stats = contadores.leer()
     
     context = {
         'usuarios': usuarios,
-        'medicos': medicos,
-        'citas': citas,
+        'siguiente': siguiente,
         
         # Stats usuarios
-        'total_usuarios': total_usuarios,
-        'total_admins': total_admins,
-        'total_medicos_usuarios': total_medicos_usuarios,
-        'total_usuarios_normales': total_usuarios_normales,
+        'total_usuarios': stats['usuarios:total'],
+        'total_admins': stats['usuarios:admin'],
+        'total_medicos_usuarios': stats['usuarios:medico'],
+        'total_usuarios_normales': stats['usuarios:usuario'],
         
         # Stats médicos
-        'total_medicos_internos': total_medicos_internos,
-        'total_medicos_externos': total_medicos_externos,
-        'total_medicos_activos': total_medicos_activos,
+        'total_medicos_internos': stats['medicos:interno'],
+        'total_medicos_externos': stats['medicos:externo'],
+        'total_medicos_activos': stats['medicos:total'],
         
         # Stats consultorios
-        'total_consultorios_internos': total_consultorios_internos,
-        'total_consultorios_externos': total_consultorios_externos,
+        'total_consultorios_internos': stats['consultorios:interno'],
+        'total_consultorios_externos': stats['consultorios:externo'],
         
         # Stats citas
-        'total_citas': total_citas,
+        'total_citas': stats['citas:total'],
         
         # Stats especialidades
-        'total_especialidades': especialidades,
+        'total_especialidades': stats['especialidades:total'],
         
     }
     return render(request, 'control_users.html', context)
 
+# Búsqueda de usuarios por prefijo (índice FTS5): ?q=...&rol=...&limite=...
+@rol_required('admin')
+def buscar_usuarios(request):
+    try:
+        limite = min(max(int(request.GET.get('limite') or 20), 1), USUARIOS_POR_PAGINA_MAX)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+
+    campos = ('id', 'nombres', 'apellidos', 'cedula', 'email', 'rol')
+    usuarios = busqueda.buscar(request.GET.get('q', ''), rol=request.GET.get('rol'), limite=limite, campos=campos)
+    return JsonResponse({'resultados': [{c: getattr(u, c) for c in campos} for u in usuarios]})
+
+# Fragmento HTML con la siguiente página de usuarios (filtros y "Cargar más" de control_users)
+@rol_required('admin')
+def control_users_usuarios(request):
+    try:
+        despues = int(request.GET.get('despues') or 0)
+        limite = min(int(request.GET.get('limite') or USUARIOS_POR_PAGINA), USUARIOS_POR_PAGINA_MAX)
+    except ValueError:
+        return HttpResponse('Parámetros inválidos', status=400)
+
+    usuarios, siguiente = _pagina_usuarios(
+        rol=request.GET.get('rol'),
+        buscar=request.GET.get('buscar', '').strip(),
+        despues=despues,
+        limite=max(limite, 1),
+    )
+    response = render(request, 'control_users_filas.html', {'usuarios': usuarios})
+    response['X-Siguiente'] = siguiente or ''
+    return response
+
 @rol_required('admin')
 def change_rol(request, user_id):
     if request.method == 'POST':
@@ -177,50 +212,129 @@ def change_rol(request, user_id):
 # Dashboard para usuarios normales
 @rol_required('usuario')
 def dashboard_usuario(request):
-    # Aquí irán las citas del usuario desde el modelo que crearemos
     # Se obtiene el paciente (usuario) que esta iniciado la sesion
-    paciente = Usuario.objects.get(id=request.session["usuario_id"])
-    citas = Cita.objects.filter(
-        paciente = paciente # Se filtra por ese usuario
-    )
+    hoy = timezone.localdate()
+
+    # Próximas citas: pocas y acotadas por el índice (paciente, fecha), con médico,
+    # especialidad y consultorio en la misma consulta
+    proximas = Cita.objects.filter(
+        paciente_id = request.identidad.id, # Se filtra por ese usuario (sin volver a cargarlo)
+        fecha__gte = hoy
+    ).select_related(
+        'medico__usuario', 'especialidad', 'consultorio'
+    ).order_by('fecha', 'hora_inicio')
+
+    # Citas pasadas: solo la primera página; el resto lo pide la lista a dashboard_usuario_pasadas
+    pasadas, siguiente = _pagina_pasadas(request.identidad.id)
 
     context = {
-        'citas': citas  # Se llenará cuando tengamos el modelo de Citas
+        'proximas': proximas,
+        'pasadas': pasadas,
+        'siguiente': siguiente,
     }
     return render(request, 'dashboard_usuario.html', context)
 
 
+PASADAS_POR_PAGINA = 10
+
+
+def _pagina_pasadas(paciente_id, antes=None, limite=PASADAS_POR_PAGINA):
+    citas = Cita.objects.filter(
+        paciente_id=paciente_id, fecha__lt=timezone.localdate()
+    ).select_related(
+        'medico__usuario', 'especialidad', 'consultorio'
+    ).order_by('-fecha', '-hora_inicio', '-id')
+
+    filas = list(_antes_de(citas, antes)[:limite + 1])
+    siguiente = _cursor_historial(filas[limite - 1]) if len(filas) > limite else None
+    return filas[:limite], siguiente
+
+
+# Fragmento HTML con la siguiente página de citas pasadas (botón "Ver citas anteriores")
+@rol_required('usuario')
+def dashboard_usuario_pasadas(request):
+    try:
+        pasadas, siguiente = _pagina_pasadas(request.identidad.id, antes=request.GET.get('antes'))
+    except (ValueError, ValidationError):
+        return HttpResponse('Cursor inválido', status=400)
+
+    response = render(request, 'dashboard_usuario_citas.html', {'citas': pasadas, 'pasada': True})
+    response['X-Siguiente'] = siguiente or ''
+    return response
+
+
 # Dashboard para médicos
 @rol_required('medico')
 def dashboard_medico(request):
     # Completamente relacionadas las citas con los medicos
-    usuario = Usuario.objects.get(id=request.session["usuario_id"]) # Obtenemos primero el usuario asignado a la sesion (medico inicio sesión)
-
-    # Obtener la instancia de Medico asociada
+    # Obtener la instancia de Medico asociada al usuario de la sesión (rol ya verificado)
     try:
-        medico = usuario.medico # Verificamos que sea medico, este registrado como medico
+        medico = Medico.objects.get(usuario_id=request.identidad.id) # Verificamos que este registrado como medico
     except Medico.DoesNotExist:
         return HttpResponse("Este usuario no está registrado como médico.")
     
     hoy = timezone.localdate()
     
-    # Citas del medico que tiene hoy
-    citas_hoy = Cita.objects.filter(
-        medico = medico,
-        fecha = hoy
-    ).order_by('hora_inicio')
+    # Citas del medico que tiene hoy: HTML en caché por (medico, fecha), se renueva al cambiar una cita
+    agenda_hoy = agenda.obtener(medico.id, hoy)
     
-    # Citas del medico en total, de forma historica
-    citas_historial = Cita.objects.filter(
-        medico=medico
-    ).order_by('-fecha', '-hora_inicio')
+    # Historial: solo la primera página; el resto lo pide la tabla a dashboard_medico_historial
+    historial, siguiente = _pagina_historial(medico.id)
     
     context = {
-        'citas_hoy': citas_hoy,       # Se llenará cuando tengamos el modelo de Citas
-        'citas_historial': citas_historial  # Se llenará cuando tengamos el modelo de Citas
+        'agenda_hoy': agenda_hoy,
+        'historial': historial,
+        'siguiente': siguiente,
     }
     return render(request, 'dashboard_medico.html', context)
 
+# Historial del médico por páginas, de la más reciente a la más antigua. El cursor
+# es (fecha, hora_inicio, id) de la última fila: "2026-02-01_08:30:00_15".
+HISTORIAL_POR_PAGINA = 25
+
+
+def _cursor_historial(cita):
+    return f"{cita.fecha.isoformat()}_{cita.hora_inicio.isoformat()}_{cita.id}"
+
+
+def _antes_de(citas, antes):
+    # Citas anteriores al cursor en el orden (-fecha, -hora_inicio, -id)
+    if not antes:
+        return citas
+    fecha, hora, cita_id = antes.split('_')
+    return citas.filter(
+        Q(fecha__lt=fecha)
+        | Q(fecha=fecha, hora_inicio__lt=hora)
+        | Q(fecha=fecha, hora_inicio=hora, id__lt=int(cita_id))
+    )
+
+
+def _pagina_historial(medico_id, antes=None, limite=HISTORIAL_POR_PAGINA):
+    citas = Cita.objects.filter(medico_id=medico_id).select_related('paciente').only(
+        'id', 'fecha', 'hora_inicio', 'paciente__nombres', 'paciente__apellidos'
+    ).order_by('-fecha', '-hora_inicio', '-id')
+
+    filas = list(_antes_de(citas, antes)[:limite + 1])
+    siguiente = _cursor_historial(filas[limite - 1]) if len(filas) > limite else None
+    return filas[:limite], siguiente
+
+
+# Fragmento HTML con la siguiente página del historial (botón "Ver citas anteriores")
+@rol_required('medico')
+def dashboard_medico_historial(request):
+    medico_id = Medico.objects.filter(usuario_id=request.identidad.id).values_list('id', flat=True).first()
+    if medico_id is None:
+        return HttpResponse("Este usuario no está registrado como médico.", status=404)
+
+    try:
+        historial, siguiente = _pagina_historial(medico_id, antes=request.GET.get('antes'))
+    except (ValueError, ValidationError):
+        return HttpResponse('Cursor inválido', status=400)
+
+    response = render(request, 'dashboard_medico_historial_filas.html', {'historial': historial})
+    response['X-Siguiente'] = siguiente or ''
+    return response
+
 # ===== CREAR MÉDICO =====
 @rol_required('admin')
 def create_medico(request):
@@ -351,11 +465,11 @@ def create_especialidad(request):
 @rol_required('admin')
 def list_horarios(request):
     """Listar horarios con filtro por médico"""
-    medicos = Medico.objects.select_related('usuario').order_by('usuario__nombres')
+    medicos = Medico.objects.select_related('usuario', 'especialidad').order_by('usuario__nombres')
     
     medico_id = request.GET.get('medico_id')
     if medico_id:
-        horarios = Horario.objects.filter(medico_id=medico_id).select_related('medico', 'medico__usuario').order_by('dia_semana', 'hora_inicio')
+        horarios = Horario.objects.filter(medico_id=medico_id).select_related('medico__usuario', 'medico__especialidad').order_by('dia_semana', 'hora_inicio')
     else:
         # Si no hay selección, no mostramos horarios (o podríamos mostrar todos)
         # Según requerimiento: "solo el seleccionado cargue sus horarios"
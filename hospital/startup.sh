@@ -1,11 +1,24 @@
 #!/bin/bash
 set -o errexit
 
-echo "Running migrations..."
-python manage.py migrate --no-input
+# Modos (primer argumento o STARTUP_MODE):
+#   auto  (defecto) inicializa si hace falta, bajo un cerrojo junto a la BD, y sirve
+#   init  solo inicializa y termina (Job de Kubernetes)
+#   serve sirve directamente; /readyz no da tráfico hasta que la BD esté migrada
+MODE="${1:-${STARTUP_MODE:-auto}}"
+export ARRANQUE_INICIO_MS="$(date +%s%3N)"
 
-echo "Seeding demo data..."
-python seed_demo_data.py
+if [ "$MODE" = "init" ] || [ "$MODE" = "auto" ]; then
+    echo "Initializing (migrate, seed, slot inventory) once per release..."
+    python manage.py inicializar
+fi
 
-echo "Starting Gunicorn..."
-exec gunicorn hospital.wsgi:application --log-file -
+if [ "$MODE" = "init" ]; then
+    exit 0
+fi
+
+echo "Boot work done in $(( $(date +%s%3N) - ARRANQUE_INICIO_MS )) ms (mode: $MODE)"
+echo "Starting Gunicorn (ASGI, uvicorn workers)..."
+# ASGI para el canal en tiempo real del tablero (/api/scheduler/stream/). Las vistas que
+# envían en streaming son asíncronas y las conexiones persistentes se desactivan (hospital/asgi.py)
+exec gunicorn hospital.asgi:application -k uvicorn_worker.UvicornWorker --log-file -